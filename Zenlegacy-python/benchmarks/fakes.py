@@ -0,0 +1,273 @@
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+
+# In-process stand-ins for AWS, OpenAI and Discord, just realistic enough for
+# the command handlers to run end to end. Every AWS request (each page of a
+# paginated call included) is counted and can be given a fixed latency.
+
+INSTANCE_TYPES = ["t3.micro", "t3.large", "m5.large", "m5.xlarge", "c5.2xlarge"]
+ZONES = ["us-east-1a", "us-east-1b", "us-east-1c"]
+ENVIRONMENTS = ["prod", "staging", "dev"]
+COST_SERVICES = ["Amazon Elastic Compute Cloud - Compute", "Amazon Simple Storage Service",
+                 "Amazon Relational Database Service", "Amazon DynamoDB", "AWS Lambda",
+                 "Amazon CloudWatch", "Amazon GuardDuty", "Amazon Virtual Private Cloud"]
+USAGE_TYPES = ["BoxUsage", "DataTransfer-Out-Bytes", "TimedStorage-ByteHrs", "Requests-Tier1"]
+
+class FakeAWS:
+    """
+    A simulated account: an EC2 fleet, one GuardDuty detector with findings,
+    CloudWatch CPU data and Cost Explorer history.
+
+    `calls` counts requests per (service, operation).
+    """
+
+    def __init__(self, fleet_size, findings=300, latency=0.0, seed=0):
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._next_id = 0
+        self.instances = {}
+        for _ in range(fleet_size):
+            self._add_instance(self._rng.choice(INSTANCE_TYPES))
+
+        now = datetime.now(timezone.utc)
+        self.findings = {}
+        for i in range(findings):
+            instance_id = self._rng.choice(list(self.instances) or ["i-none"])
+            finding_id = f"finding-{i:05d}"
+            self.findings[finding_id] = {
+                'Id': finding_id,
+                'Severity': self._rng.choice([2.0, 5.0, 8.0]),
+                'Title': f"Unusual behaviour from {instance_id}",
+                'Description': "EC2 instance is communicating with a known command and control server.",
+                'AccountId': "123456789012",
+                'Region': "us-east-1",
+                'UpdatedAt': (now - timedelta(minutes=self._rng.randint(1, 60 * 24 * 7))).isoformat(),
+                'Service': {'Action': {'ActionType': "NETWORK_CONNECTION"}, 'Archived': False},
+                'Resource': {'ResourceType': "Instance", 'InstanceDetails': {'InstanceId': instance_id}},
+            }
+
+    def _add_instance(self, instance_type, state="running"):
+        self._next_id += 1
+        instance_id = f"i-{self._next_id:017x}"
+        self.instances[instance_id] = {
+            'InstanceId': instance_id,
+            'InstanceType': instance_type,
+            'State': {'Name': state},
+            'LaunchTime': datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=self._next_id),
+            'Placement': {'AvailabilityZone': ZONES[self._next_id % len(ZONES)]},
+            'Tags': [{'Key': 'Name', 'Value': f"node-{self._next_id}"},
+                     {'Key': 'env', 'Value': ENVIRONMENTS[self._next_id % len(ENVIRONMENTS)]}],
+        }
+        return self.instances[instance_id]
+
+    def request(self, service, operation):
+        """Count one request and wait out the simulated round trip (called from worker threads)."""
+        with self._lock:
+            self.calls[(service, operation)] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def client(self, service, region=None):
+        return FakeClient(self, service, region)
+
+class FakePaginator:
+    def __init__(self, client, operation):
+        self._client = client
+        self._operation = operation
+
+    def paginate(self, **kwargs):
+        for page in getattr(self._client, f"_pages_{self._operation}")(**kwargs):
+            self._client.aws.request(self._client.service, self._operation)
+            yield page
+
+class FakeWaiter:
+    def __init__(self, client, name):
+        self._client = client
+        self._name = name
+
+    def wait(self, **kwargs):
+        self._client.aws.request(self._client.service, f"waiter:{self._name}")
+
+def _matches(instance, filters):
+    """Apply describe_instances style Filters to one raw instance."""
+    for describe_filter in filters or ():
+        name, values = describe_filter['Name'], describe_filter['Values']
+        if name == "instance-id":
+            value = instance['InstanceId']
+        elif name == "instance-type":
+            value = instance['InstanceType']
+        elif name == "instance-state-name":
+            value = instance['State']['Name']
+        elif name == "availability-zone":
+            value = instance['Placement']['AvailabilityZone']
+        elif name.startswith("tag:"):
+            value = {tag['Key']: tag['Value'] for tag in instance['Tags']}.get(name[len("tag:"):])
+        else:
+            raise ValueError(f"Filter not simulated: {name}")
+        if value not in values:
+            return False
+    return True
+
+class FakeClient:
+    """Implements the boto3 client surface the bot uses for one service."""
+
+    def __init__(self, aws, service, region=None):
+        self.aws = aws
+        self.service = service
+        self.meta = SimpleNamespace(service_model=SimpleNamespace(service_name=service), region_name=region)
+
+    def get_paginator(self, operation):
+        return FakePaginator(self, operation)
+
+    def get_waiter(self, name):
+        return FakeWaiter(self, name)
+
+    # EC2
+
+    def _pages_describe_instances(self, Filters=None, PaginationConfig=None):
+        page_size = (PaginationConfig or {}).get("PageSize", 1000)
+        if any(len(describe_filter['Values']) > 200 for describe_filter in Filters or ()):
+            raise ValueError("FilterLimitExceeded: The maximum number of filter values specified on a single call is 200")
+        matching = [instance for instance in list(self.aws.instances.values()) if _matches(instance, Filters)]
+        for offset in range(0, max(len(matching), 1), page_size):
+            yield {'Reservations': [{'Instances': matching[offset:offset + page_size]}]}
+
+    def run_instances(self, ImageId, InstanceType, MinCount, MaxCount, TagSpecifications=(), **kwargs):
+        self.aws.request("ec2", "run_instances")
+        tags = [tag for spec in TagSpecifications if spec['ResourceType'] == 'instance' for tag in spec['Tags']]
+        tag_keys = {tag['Key'] for tag in tags}
+        with self.aws._lock:
+            instances = [self.aws._add_instance(InstanceType) for _ in range(MaxCount)]
+            for instance in instances:
+                instance['Tags'] = [tag for tag in instance['Tags'] if tag['Key'] not in tag_keys] + tags
+            return {'Instances': instances}
+
+    def _set_state(self, operation, instance_ids, state):
+        self.aws.request("ec2", operation)
+        with self.aws._lock:
+            for instance_id in instance_ids:
+                instance = self.aws.instances.get(instance_id)
+                if instance is not None:
+                    instance['State'] = {'Name': state}
+        return {}
+
+    def start_instances(self, InstanceIds):
+        return self._set_state("start_instances", InstanceIds, "running")
+
+    def stop_instances(self, InstanceIds):
+        return self._set_state("stop_instances", InstanceIds, "stopped")
+
+    def terminate_instances(self, InstanceIds):
+        self.aws.request("ec2", "terminate_instances")
+        with self.aws._lock:
+            for instance_id in InstanceIds:
+                self.aws.instances.pop(instance_id, None)
+        return {}
+
+    # CloudWatch
+
+    def _pages_get_metric_data(self, MetricDataQueries, StartTime, EndTime, ScanBy=None):
+        period = MetricDataQueries[0]['MetricStat']['Period']
+        points = int((EndTime - StartTime).total_seconds()) // period
+        timestamps = [StartTime + timedelta(seconds=i * period) for i in range(points)]
+        results = []
+        for query in MetricDataQueries:
+            values = np.random.default_rng(int(query['Id'][1:])).uniform(5, 60, points)
+            if self.aws._rng.random() < 0.02:
+                values[-1] = 97.0  # occasional spike
+            results.append({'Id': query['Id'], 'Timestamps': timestamps, 'Values': values.tolist()})
+        yield {'MetricDataResults': results}
+
+    # GuardDuty
+
+    def _pages_list_detectors(self):
+        yield {'DetectorIds': ["detector-1"]}
+
+    def _pages_list_findings(self, DetectorId, FindingCriteria=None, PaginationConfig=None):
+        page_size = (PaginationConfig or {}).get("PageSize", 50)
+        since = (FindingCriteria or {}).get('Criterion', {}).get('updatedAt', {}).get('Gte', 0)
+        finding_ids = [finding_id for finding_id, finding in self.aws.findings.items()
+                       if datetime.fromisoformat(finding['UpdatedAt']).timestamp() * 1000 >= since]
+        for offset in range(0, max(len(finding_ids), 1), page_size):
+            yield {'FindingIds': finding_ids[offset:offset + page_size]}
+
+    def get_findings(self, DetectorId, FindingIds):
+        self.aws.request("guardduty", "get_findings")
+        return {'Findings': [self.aws.findings[finding_id] for finding_id in FindingIds]}
+
+    # Cost Explorer
+
+    def get_cost_and_usage(self, TimePeriod, Granularity, Metrics, GroupBy, NextPageToken=None):
+        self.aws.request("ce", "get_cost_and_usage")
+        start = datetime.strptime(TimePeriod['Start'], "%Y-%m-%d")
+        end = datetime.strptime(TimePeriod['End'], "%Y-%m-%d")
+        if Granularity == "MONTHLY":
+            groups = [{'Keys': [service], 'Metrics': {'UnblendedCost': {'Amount': str(100.0 * (i + 1)), 'Unit': "USD"}}}
+                      for i, service in enumerate(COST_SERVICES)]
+            return {'ResultsByTime': [{'TimePeriod': TimePeriod, 'Groups': groups}]}
+
+        results = []
+        for day in range((end - start).days):
+            date = start + timedelta(days=day)
+            groups = [{'Keys': [service, usage_type],
+                       'Metrics': {'UnblendedCost': {'Amount': str(round(self.aws._rng.uniform(1, 20), 4)), 'Unit': "USD"}}}
+                      for service in COST_SERVICES for usage_type in USAGE_TYPES]
+            results.append({'TimePeriod': {'Start': date.strftime("%Y-%m-%d")}, 'Groups': groups})
+        return {'ResultsByTime': results}
+
+class StubLLM:
+    """Drop-in for openai.AsyncOpenAI: answers every prompt after `latency` seconds, streaming or not."""
+
+    def __init__(self, latency=0.3, tokens=60):
+        self.latency = latency
+        self.tokens = tokens
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, model, messages, max_tokens, n, temperature, stream=False):
+        self.calls += 1
+        words = [f"step{i} " for i in range(self.tokens)]
+        if not stream:
+            await asyncio.sleep(self.latency)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="".join(words)))])
+        return self._stream(words)
+
+    async def _stream(self, words):
+        for word in words:
+            await asyncio.sleep(self.latency / len(words))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word))])
+
+class FakeUser:
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+class FakeMessage:
+    def __init__(self, ctx):
+        self._ctx = ctx
+
+    async def edit(self, **kwargs):
+        self._ctx.edits += 1
+
+class FakeContext:
+    """Stands in for a discord.py Context; records how many messages and edits a command produced."""
+
+    def __init__(self, user_name):
+        self.author = FakeUser(user_name)
+        self.messages = 0
+        self.edits = 0
+
+    async def send(self, content=None, **kwargs):
+        self.messages += 1
+        return FakeMessage(self)
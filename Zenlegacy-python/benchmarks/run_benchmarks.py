@@ -0,0 +1,269 @@
+"""
+Offline benchmark and load test for the command handlers.
+
+Runs the real handlers from commands/*.py against simulated fleets (FakeAWS),
+a stub LLM and a fake Discord ctx, and reports latency, throughput, AWS
+request counts and peak memory per command.
+
+The AWS and LLM request counts per run do not depend on the machine; they
+are compared with the committed benchmarks/baseline.json and an increase
+beyond COUNTER_TOLERANCE fails the run, as do a handler error or a missing
+baseline (exit status 1).
+Timings and memory are only compared with a baseline recorded on the same
+machine, given with --timings-baseline and kept out of git.
+
+Run from the Zenlegacy-python directory:
+
+    python -m benchmarks.run_benchmarks                      # compare with the baseline
+    python -m benchmarks.run_benchmarks --update-baseline    # record a new baseline
+    python -m benchmarks.run_benchmarks --timings-baseline /tmp/timings.json --update-baseline
+    python -m benchmarks.run_benchmarks --fleets 10,1000 --users 1,50 --scenarios monitor_threats
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.fakes import FakeAWS, FakeContext, StubLLM
+from commands.autoscaling import scale_ec2
+from commands.aws_services import manage_service
+from commands.cost_monitoring import optimize_costs, cost_anomalies
+from commands.gen_ai import gen_ai_command
+from commands.incident_response import incident_resolution
+from commands.threat_monitoring import monitor_threats
+from utils import aws_helpers, gen_ai_helpers
+from utils.inventory import inventory
+from utils.targets import resolve_targets
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+FAKE_SERVICES = ("ec2", "cloudwatch", "guardduty", "ce", "rds", "dynamodb", "iam", "s3")
+
+# name: (handler call for (ctx, user, round), whether the result depends on fleet size)
+SCENARIOS = {
+    "describe_ec2": (lambda ctx, user, i: manage_service(ctx, "ec2", "describe"), True),
+    "scale_ec2": (lambda ctx, user, i: scale_ec2(ctx, "up" if i % 2 == 0 else "down", "m5.large", 2), True),
+    "bulk_stop_start": (lambda ctx, user, i: manage_service(ctx, "ec2", "bulk_stop" if i % 2 == 0 else "bulk_start",
+                                                            "tag:env=dev", "type=t3.micro"), True),
+    "monitor_threats": (lambda ctx, user, i: monitor_threats(ctx), True),
+    "optimize_costs": (lambda ctx, user, i: optimize_costs(ctx), False),
+    "cost_anomalies": (lambda ctx, user, i: cost_anomalies(ctx, 7), False),
+    "gen_ai": (lambda ctx, user, i: gen_ai_command(ctx, f"how do I right-size node {user}-{i}?"), False),
+    "incident_resolution": (lambda ctx, user, i: incident_resolution(ctx, f"database {user}-{i} unreachable"), False),
+}
+
+# Metric: (direction that is worse, whether the tolerance applies). Request
+# counts do not depend on the machine. Only where a scenario outlasts the cache
+# TTLs (10,000 instances, 25 users) does reuse, and so the count, vary by a
+# fraction of a percent between runs; COUNTER_TOLERANCE absorbs that, while an
+# extra request per run in any scenario still fails. Timings depend on the
+# machine and are compared with --tolerance.
+COUNTER_TOLERANCE = 0.02
+COUNTER_METRICS = {
+    "aws_calls_per_run": ("higher", True),
+    "llm_calls_per_run": ("higher", True),
+}
+TIMING_METRICS = {
+    "p50_ms": ("higher", True),
+    "p99_ms": ("higher", True),
+    "throughput_per_s": ("lower", True),
+    "peak_memory_kb": ("higher", True),
+}
+
+def install_fakes(aws, llm):
+    """Point the shared boto3 client registry and the OpenAI client at the fakes, and drop every cache."""
+    aws_helpers.clear_client_registry()
+    for service in FAKE_SERVICES:
+        for target in resolve_targets():
+            aws_helpers._clients[(service, target.region, target.role_arn)] = aws.client(service, target.region)
+    gen_ai_helpers._client = llm
+    gen_ai_helpers._cache._entries.clear()
+    aws_helpers._cost_cache.update(costs=None, expires=None)
+    inventory._snapshots.clear()
+    shutil.rmtree("data", ignore_errors=True)
+
+async def run_round(scenario, users, round_number):
+    """Run one invocation per simulated user concurrently; return (latencies, errors)."""
+    call, _ = SCENARIOS[scenario]
+
+    async def invoke(user):
+        ctx = FakeContext(f"user{user}")
+        started = time.perf_counter()
+        try:
+            await call(ctx, user, round_number)
+            return time.perf_counter() - started, None
+        except Exception as e:
+            return time.perf_counter() - started, e
+
+    results = await asyncio.gather(*(invoke(user) for user in range(users)))
+    return [latency for latency, _ in results], [error for _, error in results if error is not None]
+
+async def run_scenario(scenario, fleet, users, rounds, args):
+    """Benchmark one scenario: `rounds` timed rounds, then one more under tracemalloc for peak memory."""
+    aws = FakeAWS(fleet, findings=args.findings, latency=args.aws_latency_ms / 1000)
+    llm = StubLLM(latency=args.llm_latency_ms / 1000)
+    install_fakes(aws, llm)
+
+    latencies, errors = [], []
+    started = time.perf_counter()
+    for round_number in range(rounds):
+        round_latencies, round_errors = await run_round(scenario, users, round_number)
+        latencies += round_latencies
+        errors += round_errors
+    elapsed = time.perf_counter() - started
+    aws_calls = sum(aws.calls.values())
+    llm_calls = llm.calls
+
+    tracemalloc.start()
+    await run_round(scenario, users, rounds)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    runs = len(latencies)
+    return {
+        "runs": runs,
+        "errors": len(errors),
+        "first_error": repr(errors[0]) if errors else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 1),
+        "throughput_per_s": round(runs / elapsed, 2),
+        "aws_calls_per_run": round(aws_calls / runs, 2),
+        "llm_calls_per_run": round(llm_calls / runs, 2),
+        "peak_memory_kb": round(peak / 1024),
+        "top_aws_calls": {f"{service}.{operation}": count
+                          for (service, operation), count in aws.calls.most_common(5)},
+    }
+
+def compare(results, baseline, metrics, tolerance=0.0):
+    """Return a list of human-readable regressions of `metrics` against the baseline."""
+    regressions = []
+    for key, result in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        for metric, (worse, tolerant) in metrics.items():
+            if metric not in expected:
+                continue
+            allowed = tolerance if tolerant else 0.0
+            old, new = expected[metric], result[metric]
+            if worse == "higher" and new > old * (1 + allowed):
+                regressions.append(f"{key}: {metric} {old} -> {new}")
+            elif worse == "lower" and new < old * (1 - allowed):
+                regressions.append(f"{key}: {metric} {old} -> {new}")
+    return regressions
+
+def find_errors(results):
+    """Return a line per scenario whose handler raised in any run."""
+    return [f"{key}: {result['errors']} of {result['runs']} runs raised {result['first_error']}"
+            for key, result in results.items() if result["errors"]]
+
+def print_table(results):
+    print(f"{'scenario':<48} {'p50 ms':>9} {'p99 ms':>9} {'runs/s':>8} {'aws/run':>8} {'llm/run':>8} "
+          f"{'peak KB':>9} {'errors':>6}")
+    for key, result in results.items():
+        print(f"{key:<48} {result['p50_ms']:>9} {result['p99_ms']:>9} {result['throughput_per_s']:>8} "
+              f"{result['aws_calls_per_run']:>8} {result['llm_calls_per_run']:>8} {result['peak_memory_kb']:>9} "
+              f"{result['errors']:>6}")
+        if result["first_error"]:
+            print(f"    first error: {result['first_error']}")
+
+def _int_list(text):
+    return [int(value) for value in text.split(",") if value]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the bot's command handlers offline.")
+    parser.add_argument("--fleets", type=_int_list, default=[10, 1000, 10000], help="EC2 fleet sizes")
+    parser.add_argument("--users", type=_int_list, default=[1, 25], help="concurrent users per round")
+    parser.add_argument("--rounds", type=int, default=5, help="timed rounds per scenario")
+    parser.add_argument("--findings", type=int, default=300, help="GuardDuty findings in the simulated account")
+    parser.add_argument("--aws-latency-ms", type=float, default=10.0, help="simulated latency per AWS request")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="simulated time for a full LLM answer")
+    parser.add_argument("--scenarios", type=lambda text: text.split(","), default=list(SCENARIOS))
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed relative slowdown/memory growth against --timings-baseline (0.5 = 50%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="request counts per run (committed)")
+    parser.add_argument("--timings-baseline", help="latency, throughput and memory recorded on this machine")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline(s)")
+    return parser.parse_args(argv)
+
+async def run_all(args):
+    results = {}
+    for scenario in args.scenarios:
+        _, per_fleet = SCENARIOS[scenario]
+        for fleet in args.fleets if per_fleet else args.fleets[:1]:
+            for users in args.users:
+                key = f"{scenario}[fleet={fleet},users={users}]" if per_fleet else f"{scenario}[users={users}]"
+                print(f"running {key}...", file=sys.stderr)
+                results[key] = await run_scenario(scenario, fleet, users, args.rounds, args)
+    return results
+
+def main(argv=None):
+    args = parse_args(argv)
+    baseline_path = os.path.abspath(args.baseline)
+
+    # Handlers write their GuardDuty store, cost history and action logs relative
+    # to the working directory; keep them out of the real data/ and logs/.
+    # Process-pool workers read config/ from the working directory too.
+    workdir = tempfile.mkdtemp(prefix="zenlegacy-bench-")
+    shutil.copytree("config", os.path.join(workdir, "config"))
+    os.chdir(workdir)
+    try:
+        results = asyncio.run(run_all(args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_table(results)
+
+    errors = find_errors(results)
+    if errors:
+        print("\n" + "!" * 72)
+        print(f"HANDLER ERRORS in {len(errors)} scenario(s)")
+        for error in errors:
+            print(f"  {error}")
+        print("!" * 72)
+        if args.update_baseline:
+            print("Baseline not written.")
+        return 1
+
+    baselines = [(baseline_path, COUNTER_METRICS)]
+    if args.timings_baseline:
+        baselines.append((os.path.abspath(args.timings_baseline), TIMING_METRICS))
+
+    if args.update_baseline:
+        for path, metrics in baselines:
+            with open(path, "w") as f:
+                json.dump({key: {metric: result[metric] for metric in metrics} for key, result in results.items()},
+                          f, indent=2, sort_keys=True)
+            print(f"Baseline written to {path}")
+        return 0
+
+    regressions = []
+    for path, metrics in baselines:
+        if not os.path.exists(path):
+            print(f"No baseline at {path}; run with --update-baseline to record one.")
+            return 1
+        with open(path, "r") as f:
+            baseline = json.load(f)
+        unmatched = [key for key in results if key not in baseline]
+        if unmatched:
+            print(f"Not in {path}, so not compared: {', '.join(unmatched)}")
+        tolerance = COUNTER_TOLERANCE if metrics is COUNTER_METRICS else args.tolerance
+        regressions += compare(results, baseline, metrics, tolerance)
+    if regressions:
+        print("\n" + "!" * 72)
+        print(f"PERFORMANCE REGRESSION: {len(regressions)} metric(s) worse than the baseline")
+        for regression in regressions:
+            print(f"  {regression}")
+        print("!" * 72)
+        return 1
+    print("\nNo regressions against the baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,100 +1,229 @@
+import argparse
+import time
 import discord
 from discord.ext import commands
-import json
-from commands import autoscaling, cost_monitoring, incident_response, security, aws_services, threat_monitoring, gen_ai
+from utils.alerts import AlertConsumer, ALERTS_QUEUE_URL
+from utils.autoscaler import autoscaler, AUTOSCALING_ENABLED
+from utils.command_cache import command_cache, cache_key, SharedContext
+from utils.config import load_config
+from utils.discord_output import send_paginated
+from utils.inventory import inventory
+from utils.metrics import command_latency, command_errors, start_instrumentation, METRICS_PORT
+from utils.offload import shutdown_process_pool
+from utils.permissions import permissions, PermissionDenied
 
 # Load bot credentials
-with open("config/bot_config.json", "r") as f:
-    bot_cred = json.load(f)
+bot_cred = load_config("bot_config")
+ALERTS_CHANNEL_ID = bot_cred.get("alerts_channel_id", 0)
+
+# Command modules, loaded as discord.py extensions and reloadable at runtime
+EXTENSIONS = [
+    "commands.autoscaling",
+    "commands.cost_monitoring",
+    "commands.incident_response",
+    "commands.security",
+    "commands.aws_services",
+    "commands.threat_monitoring",
+    "commands.gen_ai",
+    "commands.stats",
+]
+
+# Sharding: with sharding.enabled the bot is an AutoShardedBot. Several
+# processes can split the shards between them: each is started with
+# --process N and takes entry N of sharding.processes, which names its
+# shard_ids (e.g. "0-7") and its own metrics_port.
+sharding = bot_cred.get("sharding", {})
+SHARDED = sharding.get("enabled", False)
+
+def parse_shard_ids(spec):
+    """Turn "0-3,6" (or a list of ints) into [0, 1, 2, 3, 6]."""
+    if isinstance(spec, list):
+        return spec
+    shard_ids = []
+    for part in str(spec).split(","):
+        first, _, last = part.partition("-")
+        shard_ids.extend(range(int(first), int(last or first) + 1))
+    return shard_ids
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the Zenlegacy Discord bot.")
+    parser.add_argument("--process", type=int, default=0,
+                        help="entry of sharding.processes in config/bot_config.json this process runs")
+    return parser.parse_args()
 
 # Set up intents
 intents = discord.Intents.default()
 intents.message_content = True  # Required to read message content
+intents.members = True  # Member and role update events keep the permission cache current
 
-# Set up bot with command prefix and help command
-bot = commands.Bot(command_prefix="!", intents=intents, help_command=commands.DefaultHelpCommand(no_category='Available Commands'))
+# Role-based permissions from config/permissions.json (utils/permissions.py)
+async def check_permissions(ctx):
+    return permissions.authorize(ctx)
 
-@bot.event
-async def on_ready():
-    print(f'🤖 Bot {bot.user.name} has connected to Discord! 🎉')
+# Per-command latency, measured from just before the handler runs until it returns or raises
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+
+async def record_command_latency(ctx):
+    started_at = getattr(ctx, "started_at", None)
+    if started_at is not None:
+        command_latency.observe(time.perf_counter() - started_at, ctx.command.qualified_name)
 
 # Custom help command
-@bot.command(name='help', help="Show all commands available")
+@commands.command(name='help', help="Show all commands available")
 async def custom_help(ctx):
     embed = discord.Embed(title="Available Commands 🛠", description="Here are the commands you can use with the bot:", color=discord.Color.blue())
-    embed.add_field(name="🚀 EC2 Autoscaling", value="!scale_ec2 [up/down] [instances] - Scale EC2 instances", inline=False)
+    embed.add_field(name="🚀 EC2 Autoscaling", value="!scale_ec2 [up/down] [instance_type] [instances] - Scale EC2 instances", inline=False)
+    embed.add_field(name="⚖️ Autoscaling Controller", value="!autoscaling - Show the autoscaling controller's decisions", inline=False)
     embed.add_field(name="💰 Cost Optimization", value="!optimize_costs - Get cost optimization suggestions", inline=False)
+    embed.add_field(name="📈 Cost Anomalies", value="!cost_anomalies [days] - Detect daily cost spikes per service", inline=False)
     embed.add_field(name="🛡 Incident Response", value="!incident_resolution [incident_id] - Resolve AWS incidents", inline=False)
     embed.add_field(name="🔐 IAM Management", value="!manage_iam [action] [role_name] - Manage IAM roles", inline=False)
     embed.add_field(name="🛠 AWS Service Management", value="!manage_service [service_name] [action] [args] - Manage AWS services (EC2, S3, RDS, DynamoDB)", inline=False)
     embed.add_field(name="🛡 Threat Monitoring", value="!monitor_threats - Monitor AWS threats", inline=False)
     embed.add_field(name="🤖 Gen AI Integration", value="!gen_ai [question] - Ask the AI for any AWS-related tasks", inline=False)
+    embed.add_field(name="📊 Stats", value="!stats - Show command, AWS and OpenAI latency stats", inline=False)
     embed.set_footer(text="Use the commands wisely! 😊")
     await ctx.send(embed=embed)
 
-# Load autoscaling command
-@bot.command(name="scale_ec2", help="🚀 Scale EC2 instances up or down")
-async def scale_ec2(ctx, direction: str, instances: int):
-    try:
-        print(f'Command scale_ec2 called with direction: {direction}, instances: {instances}')
-        await autoscaling.scale_ec2(ctx, direction, instances)
-    except Exception as e:
-        await ctx.send(f"An error occurred: {str(e)}")
-        print(f"Error in scale_ec2: {e}")
-
-# Load cost monitoring command
-@bot.command(name="optimize_costs", help="💰 Get cost optimization suggestions")
-async def optimize_costs(ctx):
-    try:
-        await cost_monitoring.optimize_costs(ctx)
-    except Exception as e:
-        await ctx.send(f"An error occurred: {str(e)}")
-        print(f"Error in optimize_costs: {e}")
-
-# Load incident response command
-@bot.command(name="incident_resolution", help="🛡 Resolve incidents in AWS")
-async def incident_resolution(ctx, incident_id: str):
-    try:
-        await incident_response.incident_resolution(ctx, incident_id)
-    except Exception as e:
-        await ctx.send(f"An error occurred: {str(e)}")
-        print(f"Error in incident_resolution: {e}")
-
-# Load IAM management command
-@bot.command(name="manage_iam", help="🔐 Manage IAM roles and permissions")
-async def manage_iam(ctx, action: str, role_name: str):
-    try:
-        await security.manage_iam(ctx, action, role_name)
-    except Exception as e:
-        await ctx.send(f"An error occurred: {str(e)}")
-        print(f"Error in manage_iam: {e}")
-
-# Load AWS service management command
-@bot.command(name="manage_service", help="🛠 Manage AWS services like EC2, S3, RDS, and DynamoDB")
-async def manage_service(ctx, service_name: str, action: str, *args):
-    try:
-        await aws_services.manage_service(ctx, service_name, action, *args)
-    except Exception as e:
-        await ctx.send(f"An error occurred: {str(e)}")
-        print(f"Error in manage_service: {e}")
-
-# Load threat monitoring command
-@bot.command(name="monitor_threats", help="🛡 Monitor AWS threats")
-async def monitor_threats(ctx):
-    try:
-        await threat_monitoring.monitor_threats(ctx)
-    except Exception as e:
-        await ctx.send(f"An error occurred: {str(e)}")
-        print(f"Error in monitor_threats: {e}")
-
-# Load Gen AI command
-@bot.command(name="gen_ai")
-async def gen_ai_command(ctx, *query):
-    try:
-        await gen_ai.gen_ai_command(ctx, ' '.join(query))
-    except Exception as e:
-        await ctx.send(f"An error occurred: {str(e)}")
-        print(f"Error in gen_ai_command: {e}")
-
-# Start the bot
-bot.run(bot_cred['discord_token'])
\ No newline at end of file
+# Hot load/unload/reload of command modules, without dropping the gateway session
+def _extension_name(name):
+    return name if name.startswith("commands.") else f"commands.{name}"
+
+@commands.command(name="load", help="♻️ Load a command module")
+@commands.is_owner()
+async def load_extension(ctx, name: str):
+    await ctx.bot.load_extension(_extension_name(name))
+    await ctx.send(f"✅ Loaded {_extension_name(name)}.")
+
+@commands.command(name="unload", help="♻️ Unload a command module")
+@commands.is_owner()
+async def unload_extension(ctx, name: str):
+    await ctx.bot.unload_extension(_extension_name(name))
+    await ctx.send(f"✅ Unloaded {_extension_name(name)}.")
+
+@commands.command(name="reload", help="♻️ Reload a command module, or all of them")
+@commands.is_owner()
+async def reload_extension(ctx, name: str = None):
+    names = [_extension_name(name)] if name else list(ctx.bot.extensions)
+    for extension in names:
+        await ctx.bot.reload_extension(extension)
+    await ctx.send(f"✅ Reloaded {', '.join(names)}.")
+
+class ZenlegacyBot(commands.AutoShardedBot if SHARDED else commands.Bot):
+    """
+    The bot run by one process, configured by entry `process_index` of sharding.processes.
+
+    Nothing is built at import time: process pool workers (utils/offload.py)
+    are spawned and re-import this script, and must not start a second bot.
+    """
+
+    def __init__(self, process_index=0):
+        processes = sharding.get("processes", [])
+        self.process_config = processes[process_index] if processes else {}
+        # Alerts and autoscaling act on shared AWS state, so only the first process runs them.
+        self.primary_process = process_index == 0
+        # Event-driven alerts from SQS; created on the first on_ready and kept across reconnects
+        self.alert_consumer = None
+        shard_options = {}
+        if SHARDED:
+            shard_ids = self.process_config.get("shard_ids")
+            shard_options = {"shard_count": sharding.get("shard_count"),
+                             "shard_ids": parse_shard_ids(shard_ids) if shard_ids is not None else None}
+        # Command prefix "!"; the custom help command replaces the default one
+        super().__init__(command_prefix="!", intents=intents, help_command=None,
+                         chunk_guilds_at_startup=False, **shard_options)
+        self.add_check(check_permissions)
+        self.before_invoke(start_command_timer)
+        self.after_invoke(record_command_latency)
+        for command in (custom_help, load_extension, unload_extension, reload_extension):
+            self.add_command(command)
+
+    async def setup_hook(self):
+        # Fail at startup, not on the first command, if permissions.json is missing or invalid.
+        permissions.load()
+        await start_instrumentation(port=self.process_config.get("metrics_port", METRICS_PORT))
+        for extension in EXTENSIONS:
+            await self.load_extension(extension)
+
+    async def close(self):
+        shutdown_process_pool()
+        await super().close()
+
+    async def get_context(self, origin, *, cls=SharedContext):
+        return await super().get_context(origin, cls=cls)
+
+    async def invoke(self, ctx):
+        # Read-only commands go through the single-flight cache (utils/command_cache.py)
+        key = cache_key(ctx)
+        if key is None:
+            await super().invoke(ctx)
+        else:
+            await command_cache.run(ctx, key, super().invoke, self._authorize)
+
+    async def _authorize(self, ctx):
+        """Run a command's checks for a caller who is sent a shared result; dispatch the error if they fail."""
+        try:
+            if not await self.can_run(ctx, call_once=True):
+                raise commands.CheckFailure("The global check once functions failed.")
+            if not await ctx.command.can_run(ctx):
+                raise commands.CheckFailure(f"The check functions for command {ctx.command.qualified_name} failed.")
+            return True
+        except commands.CommandError as exc:
+            await ctx.command.dispatch_error(ctx, exc)
+            return False
+
+    async def on_ready(self):
+        print(f'🤖 Bot {self.user.name} has connected to Discord! 🎉')
+        if not self.primary_process:
+            # Other processes refresh their inventory on demand, when a command finds it stale.
+            return
+        inventory.start_background_refresh()
+        if ALERTS_QUEUE_URL and ALERTS_CHANNEL_ID:
+            if self.alert_consumer is None:
+                self.alert_consumer = AlertConsumer(self.deliver_alerts)
+            self.alert_consumer.start()
+        if AUTOSCALING_ENABLED:
+            if ALERTS_CHANNEL_ID:
+                autoscaler.notify = self.deliver_alerts
+            autoscaler.start()
+
+    async def deliver_alerts(self, alerts):
+        """Post alerts from the SQS consumer to the configured alerts channel."""
+        channel = self.get_channel(ALERTS_CHANNEL_ID) or await self.fetch_channel(ALERTS_CHANNEL_ID)
+        await send_paginated(channel, "🚨 AWS Alerts", (f"{alert}\n" for alert in alerts))
+
+    # Member and role changes invalidate the cached permission masks
+    async def on_member_update(self, before, after):
+        if before.roles != after.roles:
+            permissions.forget_member(after)
+
+    async def on_member_remove(self, member):
+        permissions.forget_member(member)
+
+    async def on_guild_role_update(self, before, after):
+        if before.name != after.name:
+            permissions.forget_guild(after.guild)
+
+    async def on_guild_role_delete(self, role):
+        permissions.forget_guild(role.guild)
+
+    async def on_command_error(self, ctx, error):
+        if isinstance(error, commands.CommandNotFound):
+            return
+        if ctx.command is not None:
+            command_errors.inc(ctx.command.qualified_name)
+        if isinstance(error, PermissionDenied):
+            await ctx.send(str(error))
+            return
+        error = getattr(error, "original", error)
+        await ctx.send(f"An error occurred: {str(error)}")
+        print(f"Error in {ctx.command}: {error}")
+
+def main():
+    args = parse_args()
+    bot = ZenlegacyBot(args.process)
+    bot.run(bot_cred['discord_token'])
+
+if __name__ == "__main__":
+    main()
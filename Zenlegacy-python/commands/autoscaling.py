@@ -1,75 +1,99 @@
+import math
 import discord
 from discord.ext import commands
-import boto3
-import json
-from utils.aws_helpers import get_current_instance_count, update_instance_count
+from utils.autoscaler import autoscaler, launch_instances, terminate_instances
+from utils.discord_output import send_paginated
+from utils.inventory import inventory, select_victims
+from utils.targets import default_target
+from utils.config import load_config
 from utils.logger import log_action
 
+thresholds = load_config("thresholds")
 
-with open("config/aws_credentials.json", "r") as f:
-    aws_credentials = json.load(f)
-
-with open("config/thresholds.json", "r") as f:
-    thresholds = json.load(f)
-
-ec2 = boto3.client('ec2',
-                   aws_access_key_id=aws_credentials['aws_access_key'],
-                   aws_secret_access_key=aws_credentials['aws_secret_key'],
-                   region_name=aws_credentials['region'])
-
-@commands.command(name="scale_ec2")
 async def scale_ec2(ctx, action: str, instance_type: str, count: int):
     if action not in ["up", "down"]:
         await ctx.send("Please specify 'up' or 'down' to scale EC2 instances.")
         return
 
-    current_count = get_current_instance_count(instance_type)
+    # Scaling acts on the default account and region only.
+    home = default_target()
+    await inventory.ensure_fresh("ec2")
+    current_count = inventory.count("ec2", type=instance_type, state="running",
+                                    account=home.account, region=home.region)
 
     if action == "up":
+        if not await start_new_instances(ctx, instance_type, count):
+            return
         new_count = current_count + count
-        await start_new_instances(ctx, instance_type, count)
-        log_action(f"Scaled up {count} {instance_type} instances. New count: {new_count}")
-    elif action == "down":
-        if current_count > count:
-            new_count = current_count - count
-            await stop_instances(ctx, instance_type, count)
-            log_action(f"Scaled down {count} {instance_type} instances. New count: {new_count}")
-        else:
+    else:
+        if current_count <= count:
             await ctx.send(f"Cannot scale down below zero instances. Currently, there are {current_count} instances.")
             return
+        if not await stop_instances(ctx, instance_type, count):
+            return
+        new_count = current_count - count
 
-    update_instance_count(instance_type, new_count)
+    log_action(f"Scaled {action} {count} {instance_type} instances. New count: {new_count}",
+               user=str(ctx.author), command="scale_ec2", service="ec2")
     await ctx.send(f"EC2 instances have been scaled {action}. New count: {new_count}.")
 
 async def start_new_instances(ctx, instance_type, count):
     try:
-        response = ec2.run_instances(
-            ImageId="ami-0abcdef1234567890",  # Replace with your actual AMI ID
-            InstanceType=instance_type,
-            MinCount=count,
-            MaxCount=count,
-        )
-        instance_ids = [instance['InstanceId'] for instance in response['Instances']]
+        instance_ids = await launch_instances(default_target(), instance_type, count)
         await ctx.send(f"Started {count} new {instance_type} instances: {', '.join(instance_ids)}")
+        return True
     except Exception as e:
         await ctx.send(f"Error starting new instances: {str(e)}")
+        return False
 
 async def stop_instances(ctx, instance_type, count):
     try:
-        instances = ec2.describe_instances(
-            Filters=[
-                {'Name': 'instance-type', 'Values': [instance_type]},
-                {'Name': 'instance-state-name', 'Values': ['running']}
-            ]
-        )
-        running_instances = [i['InstanceId'] for r in instances['Reservations'] for i in r['Instances']]
-        
+        home = default_target()
+        running_instances = inventory.query("ec2", type=instance_type, state="running",
+                                            account=home.account, region=home.region)
+
         if len(running_instances) < count:
             await ctx.send(f"Not enough instances to stop. Only {len(running_instances)} running instances found.")
-            return
-        
-        instances_to_terminate = running_instances[:count]
-        ec2.terminate_instances(InstanceIds=instances_to_terminate)
+            return False
+
+        strategy = thresholds.get("scale_down_strategy", "oldest")
+        instances_to_terminate = [instance.id for instance in select_victims(running_instances, count, strategy)]
+        await terminate_instances(home, instances_to_terminate)
         await ctx.send(f"Terminated {count} {instance_type} instances: {', '.join(instances_to_terminate)}")
+        return True
     except Exception as e:
         await ctx.send(f"Error stopping instances: {str(e)}")
+        return False
+
+def format_autoscaling_status(decisions):
+    """One line per group from the controller's last decisions."""
+    for decision in decisions:
+        load = "n/a" if math.isnan(decision.load) else f"{decision.load:.0f}%"
+        forecast = "n/a" if math.isnan(decision.forecast) else f"{decision.forecast:.0f}%"
+        yield (f"{decision.group}: {decision.current} → {decision.desired} "
+               f"(load {load}, forecast {forecast}; {decision.reason})\n")
+
+async def autoscaling_status(ctx):
+    if not autoscaler.groups:
+        await ctx.send("No autoscaling groups are configured in config/autoscaling.json.")
+        return
+    decisions = list(autoscaler.decisions.values())
+    if not decisions:
+        decisions = [decision for decision, _, _ in (await autoscaler.evaluate()).values()]
+    await send_paginated(ctx, "⚖️ Autoscaling", format_autoscaling_status(decisions))
+
+class AutoscalingCog(commands.Cog, name="Autoscaling"):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name="scale_ec2", help="🚀 Scale EC2 instances up or down")
+    async def scale_ec2_command(self, ctx, action: str, instance_type: str, count: int):
+        await scale_ec2(ctx, action, instance_type, count)
+
+    @commands.command(name="autoscaling", help="⚖️ Show the autoscaling controller's decisions",
+                      extras={"read_only": True})
+    async def autoscaling_command(self, ctx):
+        await autoscaling_status(ctx)
+
+async def setup(bot):
+    await bot.add_cog(AutoscalingCog(bot))
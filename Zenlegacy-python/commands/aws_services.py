@@ -1,28 +1,48 @@
 import discord
 from discord.ext import commands
-import boto3
-import json
-from utils.aws_helpers import validate_service, get_service_client
+import asyncio
+import time
+from utils.aws_helpers import validate_service, get_service_client, call_aws, run_aws_call, service_key, bulk_ec2_action, bulk_rds_action, parse_query, run_query
+from utils.discord_output import send_paginated, send_streaming, as_lines
+from utils.inventory import inventory
 from utils.logger import log_action
+from utils.s3_bulk import empty_bucket, delete_bucket, prefix_usage, format_bytes
+from utils.targets import get_target
 
+# Minimum seconds between edits of a bulk action's progress message
+PROGRESS_EDIT_INTERVAL = 2
 
-with open("config/aws_credentials.json", "r") as f:
-    aws_credentials = json.load(f)
-with open("config/bot_config.json", "r") as f:
-    bot_cred = json.load(f)
+# Actions that only read, whose results identical concurrent requests can share
+READ_ONLY_ACTIONS = {"describe", "list_buckets", "bucket_usage", "describe_db_instances", "list_tables"}
 
-intents=discord.Intents.default()
-intents.messages=True
-intents.guilds=True
+# Actions whose first argument names the resource, with their usage
+RESOURCE_ACTIONS = {
+    ("ec2", "start"): "<instance_id>",
+    ("ec2", "stop"): "<instance_id>",
+    ("s3", "create_bucket"): "<bucket>",
+    ("s3", "delete_bucket"): "<bucket> [--force] [account=...]",
+    ("s3", "empty_bucket"): "<bucket> [account=...]",
+    ("s3", "bucket_usage"): "<bucket> [prefix=...] [depth=N] [account=...]",
+    ("rds", "start_db_instance"): "<db_instance_id>",
+    ("rds", "stop_db_instance"): "<db_instance_id>",
+    ("dynamodb", "create_table"): "<table>",
+    ("dynamodb", "delete_table"): "<table>",
+}
 
-bot = commands.Bot(command_prefix="!",intents=intents)
-
-@bot.command(name="manage_service")
 async def manage_service(ctx, service_name: str, action: str, *args):
     """Dynamically manage different AWS services based on user input."""
-    if not validate_service(service_name):
+    started = time.monotonic()
+    try:
+        validate_service(service_name)
+    except ValueError:
+        ctx.cacheable = False
         await ctx.send(f"Unsupported AWS service: {service_name}")
         return
+
+    usage = RESOURCE_ACTIONS.get((service_name, action))
+    if usage and (not args or "=" in args[0] or args[0].startswith("--")):
+        await send_usage(ctx, f"{service_name} {action} {usage}")
+        return
     
     service_client = get_service_client(service_name)
 
@@ -37,37 +57,184 @@ async def manage_service(ctx, service_name: str, action: str, *args):
     else:
         await ctx.send(f"Service {service_name} is not yet supported.")
     
-    log_action(f"User requested {action} on {service_name} with args: {args}")
+    log_action(f"User requested {action} on {service_name} with args: {args}",
+               user=str(ctx.author), command="manage_service", service=service_name, action=action,
+               resource_ids=list(args), duration_ms=round((time.monotonic() - started) * 1000))
+
+async def send_usage(ctx, usage):
+    ctx.cacheable = False
+    await ctx.send(f"Usage: !manage_service {usage}")
 
 async def manage_ec2(ctx, client, action, *args):
     if action == "start":
         instance_id = args[0]
-        client.start_instances(InstanceIds=[instance_id])
+        await call_aws(client, "start_instances", InstanceIds=[instance_id])
         await ctx.send(f"EC2 Instance {instance_id} started.")
     elif action == "stop":
         instance_id = args[0]
-        client.stop_instances(InstanceIds=[instance_id])
+        await call_aws(client, "stop_instances", InstanceIds=[instance_id])
         await ctx.send(f"EC2 Instance {instance_id} stopped.")
     elif action == "describe":
-        response = client.describe_instances()
-        await ctx.send(f"EC2 Instances: {response}")
+        await describe_resources(ctx, "ec2", "EC2 Instances", args)
+    elif action in ("bulk_start", "bulk_stop", "bulk_terminate"):
+        await run_bulk_action(ctx, "ec2", action[len("bulk_"):], args)
     else:
         await ctx.send(f"Invalid EC2 action: {action}")
 
+async def describe_resources(ctx, service_name, label, args):
+    """
+    List EC2/RDS instances or DynamoDB tables matching a query such as
+    `state=running type=m5.large tag:env=prod fields=id,type,ip limit=50` (see parse_query).
+    """
+    try:
+        query = parse_query(service_name, args)
+        target = get_target(query.account, query.region)
+    except ValueError as e:
+        ctx.cacheable = False
+        await ctx.send(str(e))
+        return
+    rows = await run_aws_call(service_key(service_name, target.region), run_query, service_name, query,
+                              target.region, target.role_arn)
+    lines = (" | ".join("-" if value is None else str(value) for value in row) for row in rows)
+    await send_paginated(ctx, f"{label} ({len(rows)}): {' | '.join(query.fields)}", as_lines(lines),
+                         empty_message=f"No {label} found.")
+
+async def run_bulk_action(ctx, service_name, action, args):
+    """
+    Apply an action to every EC2/RDS instance selected by args, reporting progress in one edited message.
+
+    args are instance IDs and/or selectors (type=..., state=..., zone=..., region=..., account=...,
+    tag:Key=Value); '--wait' also waits for the instances to reach the target state. Instances in
+    different accounts and regions are handled in parallel, each through its own client.
+    """
+    wait = "--wait" in args
+    groups = await inventory.resolve_grouped(service_name, [arg for arg in args if arg != "--wait"])
+    total = sum(len(instance_ids) for instance_ids in groups.values())
+    if not total:
+        await ctx.send(f"No {service_name.upper()} instances match {' '.join(args)}.")
+        return
+
+    label = f"{service_name.upper()} {action}"
+    message = await ctx.send(f"{label}: 0/{total} done")
+    last_edit = [time.monotonic()]
+    done_by_target = {}
+
+    async def progress(target, done):
+        done_by_target[target] = done
+        done = sum(done_by_target.values())
+        now = time.monotonic()
+        if done < total and now - last_edit[0] < PROGRESS_EDIT_INTERVAL:
+            return
+        last_edit[0] = now
+        await message.edit(content=f"{label}: {done}/{total} done")
+
+    bulk_action = bulk_ec2_action if service_name == "ec2" else bulk_rds_action
+
+    async def run_target(target, instance_ids):
+        async def target_progress(done, _):
+            await progress(target, done)
+
+        results = await bulk_action(action, instance_ids, progress=target_progress, wait=wait,
+                                    region=target.region, role_arn=target.role_arn)
+        await run_aws_call(service_key(service_name, target.region), inventory.refresh_ids, service_name,
+                           results[0], target)
+        return results
+
+    results = await asyncio.gather(*(run_target(target, instance_ids) for target, instance_ids in groups.items()))
+    succeeded = [instance_id for target_succeeded, _, _ in results for instance_id in target_succeeded]
+    failed = {instance_id: error for _, target_failed, _ in results for instance_id, error in target_failed.items()}
+    unconfirmed = {instance_id: error for _, _, target_unconfirmed in results
+                   for instance_id, error in target_unconfirmed.items()}
+
+    summary = f"{label}: {len(succeeded)} succeeded, {len(failed)} failed."
+    if unconfirmed:
+        summary += f" {len(unconfirmed)} not confirmed in the target state."
+    for instance_id, error in list(failed.items())[:10]:
+        summary += f"\n❌ {instance_id}: {error}"
+    for instance_id, error in list(unconfirmed.items())[:5]:
+        summary += f"\n⏳ {instance_id}: {error}"
+    await message.edit(content=summary[:2000])
+
+def _option(args, name, default=None):
+    """Value of a name=value argument, or default."""
+    for arg in args:
+        if arg.startswith(f"{name}="):
+            return arg[len(name) + 1:]
+    return default
+
+async def run_bucket_cleanup(ctx, bucket_name, delete, account=None):
+    """Empty (and optionally delete) a bucket, reporting progress in one edited message."""
+    try:
+        target = get_target(account)
+    except ValueError as e:
+        await ctx.send(str(e))
+        return
+    label = f"S3 {'delete' if delete else 'empty'} {bucket_name}"
+    message = await ctx.send(f"{label}: 0 objects deleted")
+    last_edit = [time.monotonic()]
+
+    async def progress(deleted):
+        now = time.monotonic()
+        if now - last_edit[0] < PROGRESS_EDIT_INTERVAL:
+            return
+        last_edit[0] = now
+        await message.edit(content=f"{label}: {deleted:,} objects deleted")
+
+    cleanup = delete_bucket if delete else empty_bucket
+    deleted, failed, errors = await cleanup(bucket_name, progress=progress, role_arn=target.role_arn)
+    summary = f"{label}: {deleted:,} objects deleted, {failed:,} failed."
+    if delete and not failed:
+        summary += f" Bucket {bucket_name} deleted."
+    for key, error in errors.items():
+        summary += f"\n❌ {key}: {error}"
+    await message.edit(content=summary[:2000])
+
+async def send_bucket_usage(ctx, bucket_name, prefix="", depth=1, account=None):
+    """Stream object counts and sizes per prefix as each prefix's listing finishes, then the totals."""
+    try:
+        target = get_target(account)
+    except ValueError as e:
+        ctx.cacheable = False
+        await ctx.send(str(e))
+        return
+
+    async def lines():
+        total_count = total_size = 0
+        async for part, count, size in prefix_usage(bucket_name, prefix, depth, target.role_arn):
+            total_count += count
+            total_size += size
+            yield f"\n{part or '(root)'}: {count:,} objects, {format_bytes(size)}"
+        yield f"\n**Total: {total_count:,} objects, {format_bytes(total_size)}**"
+
+    await send_streaming(ctx, f"S3 usage for {bucket_name}/{prefix}:", lines())
+
 #  logic for managing S3
 async def manage_s3(ctx, client, action, *args):
     if action == "create_bucket":
         bucket_name = args[0]
-        client.create_bucket(Bucket=bucket_name)
+        await call_aws(client, "create_bucket", Bucket=bucket_name)
         await ctx.send(f"S3 bucket {bucket_name} created.")
+    elif action == "delete_bucket" and "--force" in args:
+        await run_bucket_cleanup(ctx, args[0], delete=True, account=_option(args, "account"))
     elif action == "delete_bucket":
         bucket_name = args[0]
-        client.delete_bucket(Bucket=bucket_name)
+        await call_aws(client, "delete_bucket", Bucket=bucket_name)
         await ctx.send(f"S3 bucket {bucket_name} deleted.")
+    elif action == "empty_bucket":
+        await run_bucket_cleanup(ctx, args[0], delete=False, account=_option(args, "account"))
+    elif action == "bucket_usage":
+        depth = _option(args, "depth", "1")
+        if not depth.isdigit():
+            await send_usage(ctx, f"s3 bucket_usage {RESOURCE_ACTIONS[('s3', 'bucket_usage')]} "
+                                  f"(depth is a whole number, got: {depth})")
+            return
+        await send_bucket_usage(ctx, args[0], prefix=_option(args, "prefix", ""),
+                                depth=int(depth), account=_option(args, "account"))
     elif action == "list_buckets":
-        response = client.list_buckets()
-        buckets = [bucket["Name"] for bucket in response["Buckets"]]
-        await ctx.send(f"S3 Buckets: {buckets}")
+        response = await call_aws(client, "list_buckets")
+        buckets = (bucket["Name"] for bucket in response["Buckets"])
+        await send_paginated(ctx, f"S3 Buckets ({len(response['Buckets'])}):", as_lines(buckets),
+                             empty_message="No S3 buckets found.")
     else:
         await ctx.send(f"Invalid S3 action: {action}")
 
@@ -75,15 +242,16 @@ async def manage_s3(ctx, client, action, *args):
 async def manage_rds(ctx, client, action, *args):
     if action == "start_db_instance":
         db_instance_id = args[0]
-        client.start_db_instance(DBInstanceIdentifier=db_instance_id)
+        await call_aws(client, "start_db_instance", DBInstanceIdentifier=db_instance_id)
         await ctx.send(f"RDS Instance {db_instance_id} started.")
     elif action == "stop_db_instance":
         db_instance_id = args[0]
-        client.stop_db_instance(DBInstanceIdentifier=db_instance_id)
+        await call_aws(client, "stop_db_instance", DBInstanceIdentifier=db_instance_id)
         await ctx.send(f"RDS Instance {db_instance_id} stopped.")
     elif action == "describe_db_instances":
-        response = client.describe_db_instances()
-        await ctx.send(f"RDS Instances: {response}")
+        await describe_resources(ctx, "rds", "RDS Instances", args)
+    elif action in ("bulk_start", "bulk_stop", "bulk_delete"):
+        await run_bulk_action(ctx, "rds", action[len("bulk_"):], args)
     else:
         await ctx.send(f"Invalid RDS action: {action}")
 
@@ -97,7 +265,8 @@ async def manage_dynamodb(ctx, client, action, *args):
         key_schema = [
             {"AttributeName": "id", "KeyType": "HASH"} 
         ]
-        client.create_table(
+        await call_aws(
+            client, "create_table",
             TableName=table_name,
             AttributeDefinitions=attribute_definitions,
             KeySchema=key_schema,
@@ -106,12 +275,21 @@ async def manage_dynamodb(ctx, client, action, *args):
         await ctx.send(f"DynamoDB table {table_name} created.")
     elif action == "delete_table":
         table_name = args[0]
-        client.delete_table(TableName=table_name)
+        await call_aws(client, "delete_table", TableName=table_name)
         await ctx.send(f"DynamoDB table {table_name} deleted.")
     elif action == "list_tables":
-        response = client.list_tables()
-        await ctx.send(f"DynamoDB Tables: {response['TableNames']}")
+        await describe_resources(ctx, "dynamodb", "DynamoDB Tables", args)
     else:
         await ctx.send(f"Invalid DynamoDB action: {action}")
 
-bot.run(bot_cred['discord_token'])
+class AWSServicesCog(commands.Cog, name="AWS Services"):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name="manage_service", help="🛠 Manage AWS services like EC2, S3, RDS, and DynamoDB",
+                      extras={"read_only": lambda words: len(words) > 1 and words[1] in READ_ONLY_ACTIONS})
+    async def manage_service_command(self, ctx, service_name: str, action: str, *args):
+        await manage_service(ctx, service_name, action, *args)
+
+async def setup(bot):
+    await bot.add_cog(AWSServicesCog(bot))
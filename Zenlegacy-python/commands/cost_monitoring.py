@@ -1,38 +1,73 @@
 import discord
 from discord.ext import commands
-from utils.aws_helpers import get_cost_for_service, get_all_service_costs
-from utils.gen_ai_helpers import ask_gpt
+from utils.aws_helpers import get_all_service_costs, run_aws_call
+from utils.cost_history import update_cost_history, score_cost_anomalies, compare_cost_trends
+from utils.gen_ai_helpers import reply_with_gpt
+from utils.discord_output import send_paginated, as_lines
 from utils.logger import log_action
-import json
-with open("config/bot_config.json", "r") as f:
-    bot_cred = json.load(f)
+from utils.offload import run_cpu
 
-intents=discord.Intents.default()
-intents.messages=True
-intents.guilds=True
-
-bot = commands.Bot(command_prefix="!",intents=intents)
-
-
-@commands.command(name="optimize_costs")
 async def optimize_costs(ctx):
     """Fetch AWS cost data for all services and get cost optimization suggestions using GPT."""
     # Get cost data for all supported services
-    cost_data = get_all_service_costs()
+    cost_data = await run_aws_call("ce", get_all_service_costs)
+
+    # Month-over-month trend from the local cost history (only missing days are fetched)
+    await run_aws_call("ce", update_cost_history)
+    trends = await run_cpu(compare_cost_trends)
+    trend_data = format_cost_trends(trends[:10])
     
     # Log the cost retrieval action
-    log_action(f"User requested cost optimizations. Costs: {cost_data}")
-    print(cost_data)
+    log_action(f"User requested cost optimizations. Costs: {cost_data}",
+               user=str(ctx.author), command="optimize_costs", service="ce")
 
     # Prepare the prompt for GPT
-    prompt = f"Here is the AWS cost data: {cost_data}. Can you suggest optimizations?"
-    
-    # Get suggestions from GPT
-    suggestions = ask_gpt(prompt)
+    prompt = (f"Here is the AWS cost data: {cost_data}. "
+              f"Spend over the last 30 days compared with the 30 days before: {trend_data}. "
+              "Can you suggest optimizations?")
     
-    # Send the GPT's suggestions to the user
-    await ctx.send(f"GPT Cost Optimizations: {suggestions}")
+    # Stream GPT's suggestions to the user as they are generated
+    await reply_with_gpt(ctx, "GPT Cost Optimizations: ", prompt)
+
+async def cost_anomalies(ctx, days: int = 7):
+    """Report services whose daily spend spiked above their rolling baseline in the last few days."""
+    if days < 1:
+        ctx.cacheable = False
+        await ctx.send("Usage: !cost_anomalies [days], with days of at least 1.")
+        return
+    await run_aws_call("ce", update_cost_history)
+    anomalies = await run_cpu(score_cost_anomalies, days)
+
+    log_action(f"User requested cost anomalies for the last {days} days. Found: {len(anomalies)}",
+               user=str(ctx.author), command="cost_anomalies", service="ce")
+
+    lines = (f"{anomaly['date']} {anomaly['service']}: {anomaly['cost']:.2f} "
+             f"(baseline {anomaly['baseline']:.2f}, z={anomaly['z_score']:.1f})"
+             for anomaly in anomalies)
+    await send_paginated(ctx, "Cost Anomalies Detected:", as_lines(lines),
+                         empty_message=f"No cost anomalies detected in the last {days} days.")
+
+def format_cost_trends(trends):
+    """Format (service, current, previous, percent_change) tuples as one line of text."""
+    parts = []
+    for service, current, previous, change in trends:
+        if change is None:
+            parts.append(f"{service}: {current:.2f} (new)")
+        else:
+            parts.append(f"{service}: {current:.2f} ({change:+.0f}%)")
+    return ", ".join(parts) if parts else "no history yet"
+
+class CostMonitoringCog(commands.Cog, name="Cost Monitoring"):
+    def __init__(self, bot):
+        self.bot = bot
 
-bot.run(bot_cred['discord_token'])
+    @commands.command(name="optimize_costs", help="💰 Get cost optimization suggestions", extras={"read_only": True})
+    async def optimize_costs_command(self, ctx):
+        await optimize_costs(ctx)
 
+    @commands.command(name="cost_anomalies", help="📈 Detect daily cost spikes per service", extras={"read_only": True})
+    async def cost_anomalies_command(self, ctx, days: int = 7):
+        await cost_anomalies(ctx, days)
 
+async def setup(bot):
+    await bot.add_cog(CostMonitoringCog(bot))
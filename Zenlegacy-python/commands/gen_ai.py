@@ -1,8 +1,17 @@
 import discord
 from discord.ext import commands
-from utils.gen_ai_helpers import parse_command
+from utils.gen_ai_helpers import parse_command_prompt, reply_with_gpt
 
-@commands.command(name="gen_ai")
-async def gen_ai_command(ctx, *, user_input: str):
-    response = parse_command(user_input)
-    await ctx.send(f"GPT Response: {response}")
+async def gen_ai_command(ctx, user_input: str):
+    await reply_with_gpt(ctx, "GPT Response: ", parse_command_prompt(user_input))
+
+class GenAICog(commands.Cog, name="Gen AI"):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name="gen_ai", help="🤖 Ask the AI for any AWS-related tasks", extras={"read_only": True})
+    async def gen_ai(self, ctx, *, user_input: str):
+        await gen_ai_command(ctx, user_input)
+
+async def setup(bot):
+    await bot.add_cog(GenAICog(bot))
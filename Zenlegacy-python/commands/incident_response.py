@@ -1,9 +1,18 @@
 import discord
 from discord.ext import commands
-from utils.gen_ai_helpers import ask_gpt
+from utils.gen_ai_helpers import reply_with_gpt
 
-@commands.command(name="incident_resolution")
 async def incident_resolution(ctx, incident_description: str):
     prompt = f"An incident occurred: {incident_description}. Suggest resolution steps."
-    resolution_steps = ask_gpt(prompt)
-    await ctx.send(f"Incident Resolution Recommendations: {resolution_steps}")
+    await reply_with_gpt(ctx, "Incident Resolution Recommendations: ", prompt)
+
+class IncidentResponseCog(commands.Cog, name="Incident Response"):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name="incident_resolution", help="🛡 Resolve incidents in AWS")
+    async def incident_resolution_command(self, ctx, *, incident_description: str):
+        await incident_resolution(ctx, incident_description)
+
+async def setup(bot):
+    await bot.add_cog(IncidentResponseCog(bot))
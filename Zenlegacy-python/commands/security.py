@@ -1,28 +1,9 @@
 import discord
 from discord.ext import commands
-import boto3
 import json
-from utils.aws_helpers import log_action
+from utils.aws_helpers import call_aws, get_client
+from utils.logger import log_action
 
-# Load AWS credentials
-with open("config/aws_credentials.json", "r") as f:
-    aws_credentials = json.load(f)
-with open("config/bot_config.json", "r") as f:
-    bot_cred = json.load(f)
-
-# Initialize Boto3 IAM client
-iam_client = boto3.client('iam',
-                          aws_access_key_id=aws_credentials['aws_access_key'],
-                          aws_secret_access_key=aws_credentials['aws_secret_key'],
-                          region_name=aws_credentials['region'])
-
-intents=discord.Intents.default()
-intents.messages=True
-intents.guilds=True
-# Discord bot setup
-bot = commands.Bot(command_prefix="!",intents=intents)
-
-@commands.command(name="manage_iam")
 async def manage_iam(ctx, action: str, role_name: str, policy_arn: str = None):
     """Manage IAM roles: create, attach policy, and delete."""
     try:
@@ -38,7 +19,9 @@ async def manage_iam(ctx, action: str, role_name: str, policy_arn: str = None):
         else:
             await ctx.send(f"Invalid action: {action}. Supported actions are: create_role, attach_policy, delete_role.")
         
-        log_action(f"IAM action '{action}' performed on role '{role_name}' by user {ctx.author.name}.")
+        log_action(f"IAM action '{action}' performed on role '{role_name}' by user {ctx.author.name}.",
+                   user=str(ctx.author), command="manage_iam", service="iam", action=action,
+                   resource_ids=[role_name])
     except Exception as e:
         await ctx.send(f"Error managing IAM role: {str(e)}")
 
@@ -58,7 +41,8 @@ async def create_iam_role(ctx, role_name: str):
     }
 
     try:
-        response = iam_client.create_role(
+        response = await call_aws(
+            get_client("iam"), "create_role",
             RoleName=role_name,
             AssumeRolePolicyDocument=json.dumps(trust_policy),
             Description=f"Role for {role_name}"
@@ -70,7 +54,8 @@ async def create_iam_role(ctx, role_name: str):
 async def attach_policy(ctx, role_name: str, policy_arn: str):
     """Attach an AWS-managed or custom policy to a role."""
     try:
-        iam_client.attach_role_policy(
+        await call_aws(
+            get_client("iam"), "attach_role_policy",
             RoleName=role_name,
             PolicyArn=policy_arn
         )
@@ -81,10 +66,18 @@ async def attach_policy(ctx, role_name: str, policy_arn: str):
 async def delete_iam_role(ctx, role_name: str):
     """Delete an IAM role."""
     try:
-        iam_client.delete_role(RoleName=role_name)
+        await call_aws(get_client("iam"), "delete_role", RoleName=role_name)
         await ctx.send(f"IAM Role '{role_name}' deleted successfully.")
     except Exception as e:
         await ctx.send(f"Failed to delete IAM role: {str(e)}")
 
-bot.run(bot_cred['discord_token'])
+class SecurityCog(commands.Cog, name="Security"):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name="manage_iam", help="🔐 Manage IAM roles and permissions")
+    async def manage_iam_command(self, ctx, action: str, role_name: str, policy_arn: str = None):
+        await manage_iam(ctx, action, role_name, policy_arn)
 
+async def setup(bot):
+    await bot.add_cog(SecurityCog(bot))
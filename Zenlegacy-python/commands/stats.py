@@ -0,0 +1,65 @@
+from discord.ext import commands
+from utils.aws_helpers import get_client_registry_stats, get_scheduler_stats
+from utils.discord_output import send_paginated
+from utils import metrics
+
+STATS_TOP_N = 10
+
+def _ms(seconds):
+    if seconds is None:
+        return "-"
+    return "inf" if seconds == float("inf") else f"{seconds * 1000:.0f}ms"
+
+def _latency_lines(histogram, errors, limit=STATS_TOP_N):
+    """One line per series, slowest total time first: count, errors, mean, p50 and p99."""
+    error_counts = errors.snapshot() if errors else {}
+    series = sorted(histogram.snapshot().items(), key=lambda item: item[1][1], reverse=True)
+    lines = []
+    for labels, (_, total, count) in series[:limit]:
+        name = ".".join(labels) or "all"
+        lines.append(f"{name}: n={count} err={error_counts.get(labels, 0)} mean={_ms(total / count)} "
+                     f"p50≤{_ms(histogram.quantile(0.5, *labels))} p99≤{_ms(histogram.quantile(0.99, *labels))}")
+    return lines or ["(no data yet)"]
+
+def format_stats():
+    blocks = ["**Commands**", *_latency_lines(metrics.command_latency, metrics.command_errors),
+              "**AWS operations**", *_latency_lines(metrics.aws_call_latency, metrics.aws_call_errors),
+              "**OpenAI**", *_latency_lines(metrics.openai_latency, metrics.openai_errors),
+              "**Process pool jobs**", *_latency_lines(metrics.offload_latency, None)]
+
+    throttles = sorted(metrics.aws_throttles.snapshot().items(), key=lambda item: item[1], reverse=True)
+    waiting = {labels: depth for labels, depth in metrics.aws_queue_depth.snapshot().items() if depth}
+    scheduler_lines = [
+        *(f"throttled {service}.{operation}: {count}" for (service, operation), count in throttles[:STATS_TOP_N]),
+        *(f"slowed {name}: {rate:.1f}/{max_rate:g} req/s" for name, (rate, max_rate) in get_scheduler_stats().items()),
+        *(f"waiting for {stage} on {queue} ({priority}): {depth}" for (stage, queue, priority), depth in waiting.items()),
+    ]
+    blocks += ["**AWS scheduler**", *(scheduler_lines or ["no throttling, nothing queued"])]
+
+    cache = {}
+    for (command, outcome), count in metrics.command_cache_hits.snapshot().items():
+        cache.setdefault(command, {})[outcome] = count
+    cache_lines = [f"{command}: ran {outcomes.get('miss', 0)}, joined {outcomes.get('coalesced', 0)}, "
+                   f"reused {outcomes.get('fresh', 0)}" for command, outcomes in sorted(cache.items())]
+    blocks += ["**Shared command results**", *(cache_lines or ["(no read-only commands yet)"])]
+
+    lag = metrics.loop_lag_last.snapshot().get((), 0.0)
+    registry = get_client_registry_stats()
+    blocks += ["**Runtime**",
+               f"event loop lag: last={_ms(lag)} p99≤{_ms(metrics.loop_lag.quantile(0.99))}",
+               f"boto3 clients: {registry['clients']} live, {registry['hits']} hits, {registry['misses']} misses"]
+    return blocks
+
+async def show_stats(ctx):
+    await send_paginated(ctx, "📊 Bot Stats", format_stats())
+
+class StatsCog(commands.Cog, name="Stats"):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name="stats", help="📊 Show command, AWS and OpenAI latency stats")
+    async def stats(self, ctx):
+        await show_stats(ctx)
+
+async def setup(bot):
+    await bot.add_cog(StatsCog(bot))
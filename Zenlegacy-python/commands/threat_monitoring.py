@@ -1,96 +1,46 @@
 import discord
 from discord.ext import commands
-import boto3
-import json
-import datetime
 
+from utils.aws_helpers import iter_guardduty_findings
+from utils.logger import log_action
+from utils.discord_output import send_paginated, as_lines
+from utils.guardduty import ingest_guardduty_findings
+from utils.cloudwatch_metrics import collect_fleet_cpu_alerts
+from utils.inventory import inventory
 
-from utils.aws_helpers import log_action, format_guardduty_findings
-
-# Load AWS credentials
-with open("config/aws_credentials.json", "r") as f:
-    aws_credentials = json.load(f)
-with open("config/bot_config.json", "r") as f:
-    bot_cred = json.load(f)
-
-# Initialize Boto3 clients for GuardDuty and CloudWatch
-guardduty_client = boto3.client('guardduty',
-                                aws_access_key_id=aws_credentials['aws_access_key'],
-                                aws_secret_access_key=aws_credentials['aws_secret_key'],
-                                region_name=aws_credentials['region'])
-
-cloudwatch_client = boto3.client('cloudwatch',
-                                 aws_access_key_id=aws_credentials['aws_access_key'],
-                                 aws_secret_access_key=aws_credentials['aws_secret_key'],
-                                 region_name=aws_credentials['region'])
-
-# Discord bot setup
-intents=discord.Intents.default()
-intents.messages=True
-intents.guilds=True
-
-bot = commands.Bot(command_prefix="!",intents=intents)
-
-@commands.command(name="monitor_threats")
 async def monitor_threats(ctx):
     """Monitor AWS account for security threats using GuardDuty and CloudWatch."""
     try:
         # Check for GuardDuty threats
-        findings = check_guardduty_threats()
-        if not findings:
-            await ctx.send("No GuardDuty threats detected.")
-        else:
-            formatted_findings = format_guardduty_findings(findings)
-            await ctx.send(f"GuardDuty Threats Detected:\n{formatted_findings}")
+        changed, findings = await ingest_guardduty_findings()
+        await send_paginated(ctx, f"GuardDuty Threats Detected ({len(changed)} new or updated since last check):",
+                             iter_guardduty_findings(findings), empty_message="No GuardDuty threats detected.")
 
         # Monitor CloudWatch metrics for unusual activity (e.g., sudden CPU usage spikes)
-        metric_alerts = check_cloudwatch_metrics()
-        if not metric_alerts:
-            await ctx.send("No unusual activity detected in CloudWatch metrics.")
-        else:
-            await ctx.send(f"CloudWatch Alerts:\n{metric_alerts}")
+        metric_alerts = await check_cloudwatch_metrics()
+        await send_paginated(ctx, "CloudWatch Alerts:", as_lines(metric_alerts),
+                             empty_message="No unusual activity detected in CloudWatch metrics.")
 
-        log_action(f"Threat monitoring performed by user {ctx.author.name}.")
+        log_action(f"Threat monitoring performed by user {ctx.author.name}.",
+                   user=str(ctx.author), command="monitor_threats", service="guardduty",
+                   resource_ids=[finding['Id'] for finding in changed])
 
     except Exception as e:
+        ctx.cacheable = False
         await ctx.send(f"Error during threat monitoring: {str(e)}")
 
-def check_guardduty_threats():
-    """Fetch GuardDuty findings."""
-    detector_ids = guardduty_client.list_detectors()['DetectorIds']
-    if not detector_ids:
-        return None
-    
-    detector_id = detector_ids[0]
-    findings = guardduty_client.list_findings(DetectorId=detector_id)
-    if not findings['FindingIds']:
-        return None
-    
-    # Fetch details for each finding
-    findings_details = guardduty_client.get_findings(
-        DetectorId=detector_id,
-        FindingIds=findings['FindingIds']
-    )
-    return findings_details['Findings']
+async def check_cloudwatch_metrics():
+    """Check CloudWatch for unusual activity (e.g., sudden CPU spikes) across every running EC2 instance in every target."""
+    await inventory.ensure_fresh("ec2")
+    return await collect_fleet_cpu_alerts(inventory.query("ec2", state="running"))
 
-def check_cloudwatch_metrics():
-    """Check CloudWatch for unusual activity (e.g., sudden CPU spikes)."""
-    # Example: Monitoring EC2 CPU Utilization for spikes
-    metrics = cloudwatch_client.get_metric_statistics(
-        Namespace='AWS/EC2',
-        MetricName='CPUUtilization',
-        StartTime=datetime.utcnow() ,
-        EndTime=datetime.utcnow(),
-        Period=300,
-        Statistics=['Average'],
-        Dimensions=[{'Name': 'InstanceId', 'Value': 'i-1234567890abcdef0'}]
-    )
+class ThreatMonitoringCog(commands.Cog, name="Threat Monitoring"):
+    def __init__(self, bot):
+        self.bot = bot
 
-    alerts = []
-    for data_point in metrics['Datapoints']:
-        if data_point['Average'] > 80.0:  # Threshold for high CPU utilization
-            alerts.append(f"High CPU Utilization: {data_point['Average']}% at {data_point['Timestamp']}")
-    
-    return alerts
+    @commands.command(name="monitor_threats", help="🛡 Monitor AWS threats", extras={"read_only": True})
+    async def monitor_threats_command(self, ctx):
+        await monitor_threats(ctx)
 
-bot.run(bot_cred['discord_token'])
+async def setup(bot):
+    await bot.add_cog(ThreatMonitoringCog(bot))
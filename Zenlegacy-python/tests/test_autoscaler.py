@@ -0,0 +1,57 @@
+import math
+
+import numpy as np
+import pytest
+
+from utils import autoscaler
+from utils.autoscaler import desired_capacity, forecast_load, group_series
+
+GROUP = {"name": "web", "instance_type": "m5.large", "min": 2, "max": 20}
+LONG_AGO = float("inf")
+
+@pytest.fixture(autouse=True)
+def policy(monkeypatch):
+    monkeypatch.setattr(autoscaler, "SCALE_OUT_THRESHOLD", 80)
+    monkeypatch.setattr(autoscaler, "SCALE_IN_THRESHOLD", 30)
+    monkeypatch.setattr(autoscaler, "TARGET_UTILIZATION", 60)
+    monkeypatch.setattr(autoscaler, "SCALE_OUT_COOLDOWN", 300)
+    monkeypatch.setattr(autoscaler, "SCALE_IN_COOLDOWN", 900)
+    monkeypatch.setattr(autoscaler, "MAX_STEP", 10)
+
+def test_group_series_skips_missing_data():
+    matrix = np.array([[10.0, np.nan, 30.0], [20.0, np.nan, np.nan]])
+    assert group_series(matrix).tolist() == [15.0, 30.0]
+
+def test_forecast_load_modes():
+    series = np.array([10.0, 20.0, 30.0, 40.0])
+    assert forecast_load(series, mode="off", window=4, horizon=2) == 40.0
+    assert forecast_load(series, mode="moving_average", window=4, horizon=2) == 25.0
+    assert forecast_load(series, mode="linear", window=4, horizon=2) == pytest.approx(60.0)
+    assert forecast_load(series, mode="linear", window=1, horizon=2) == 40.0
+    assert math.isnan(forecast_load(np.array([]), mode="linear"))
+    with pytest.raises(ValueError):
+        forecast_load(series, mode="exponential")
+
+def test_capacity_is_brought_inside_bounds_first():
+    assert desired_capacity(GROUP, 1, 10.0, 0, 0) == (2, "below minimum 2")
+    assert desired_capacity(GROUP, 25, 95.0, 0, 0) == (20, "above maximum 20")
+
+def test_scale_out_is_proportional_and_capped():
+    assert desired_capacity(GROUP, 4, 90.0, LONG_AGO, LONG_AGO)[0] == 6  # ceil(4 * 90 / 60)
+    assert desired_capacity(GROUP, 10, 99.0, LONG_AGO, LONG_AGO)[0] == 17
+    assert desired_capacity(dict(GROUP, max=100), 40, 99.0, LONG_AGO, LONG_AGO)[0] == 50  # MAX_STEP
+    assert desired_capacity(GROUP, 15, 99.0, LONG_AGO, LONG_AGO)[0] == 20  # max
+
+def test_scale_in_respects_step_and_minimum():
+    assert desired_capacity(GROUP, 10, 12.0, LONG_AGO, LONG_AGO)[0] == 2
+    assert desired_capacity(dict(GROUP, min=0, max=100), 60, 1.0, LONG_AGO, LONG_AGO)[0] == 50
+
+def test_hysteresis_band_and_missing_data_hold_capacity():
+    assert desired_capacity(GROUP, 10, 50.0, LONG_AGO, LONG_AGO) == (10, "within band")
+    assert desired_capacity(GROUP, 10, float("nan"), LONG_AGO, LONG_AGO) == (10, "no metric data")
+
+def test_cooldowns():
+    assert desired_capacity(GROUP, 4, 90.0, 100, LONG_AGO) == (4, "scale-out cooldown")
+    # A recent scale-out also holds off scaling in.
+    assert desired_capacity(GROUP, 10, 12.0, 600, LONG_AGO) == (10, "scale-in cooldown")
+    assert desired_capacity(GROUP, 10, 12.0, LONG_AGO, 600) == (10, "scale-in cooldown")
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from commands import aws_services
+
+class Ctx:
+    author = "tester"
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+
+@pytest.fixture(autouse=True)
+def no_aws(monkeypatch):
+    monkeypatch.setattr(aws_services, "get_service_client", lambda service_name: None)
+
+@pytest.mark.parametrize("service_name, action, args", [
+    ("s3", "bucket_usage", ()),
+    ("s3", "bucket_usage", ("depth=2",)),
+    ("s3", "empty_bucket", ("--force",)),
+    ("ec2", "stop", ()),
+    ("dynamodb", "delete_table", ()),
+])
+def test_missing_resource_replies_with_usage(service_name, action, args):
+    ctx = Ctx()
+    asyncio.run(aws_services.manage_service(ctx, service_name, action, *args))
+    assert len(ctx.sent) == 1
+    assert ctx.sent[0].startswith(f"Usage: !manage_service {service_name} {action} <")
+    assert ctx.cacheable is False
+
+def test_bucket_usage_rejects_a_non_numeric_depth():
+    ctx = Ctx()
+    asyncio.run(aws_services.manage_service(ctx, "s3", "bucket_usage", "my-bucket", "depth=abc"))
+    assert len(ctx.sent) == 1
+    assert ctx.sent[0].startswith("Usage: !manage_service s3 bucket_usage <bucket>")
+    assert "got: abc" in ctx.sent[0]
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from utils import cost_history
+
+@pytest.fixture
+def history_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(cost_history, "COST_HISTORY_DIR", str(tmp_path))
+    monkeypatch.setattr(cost_history, "COST_HISTORY_INDEX", str(tmp_path / "index.json"))
+    monkeypatch.setattr(cost_history, "COST_HISTORY_MATRIX", str(tmp_path / "costs.npy"))
+    return tmp_path
+
+def test_rolling_z_scores_flags_a_spike():
+    costs = np.array([[10.0, 12.0, 10.0, 12.0, 40.0], [5.0, 5.0, 5.0, 5.0, 5.0]])
+    scores = cost_history.rolling_z_scores(costs, window=4)
+    assert np.isnan(scores[:, :4]).all()
+    # Baseline 11 with deviation 1, so 40 is 29 deviations above it.
+    assert scores[0, 4] == pytest.approx(29.0)
+    assert scores[1, 4] == 0.0
+
+def test_rolling_z_scores_flat_baseline_uses_floor():
+    scores = cost_history.rolling_z_scores(np.array([[2.0, 2.0, 2.0, 3.0]]), window=3)
+    # No deviation: the floor is 1% of the 2.00 baseline.
+    assert scores[0, 3] == pytest.approx(50.0)
+
+def test_score_cost_anomalies_rejects_days_below_one():
+    with pytest.raises(ValueError):
+        cost_history.score_cost_anomalies(days=0)
+    with pytest.raises(ValueError):
+        cost_history.score_cost_anomalies(days=-3)
+
+def test_score_cost_anomalies_reports_recent_spikes_only():
+    costs = np.full((2, 30), 10.0, dtype=np.float32)
+    costs[0, 20] = 100.0
+    costs[1, 29] = 100.0
+    start = datetime(2026, 1, 1).date()
+    history = {"start": start, "keys": [["EC2", "BoxUsage"], ["S3", "Requests"]], "currency": "USD",
+               "costs": costs}
+    anomalies = cost_history.score_cost_anomalies(days=3, window=14, z_threshold=3.0, min_cost=1.0,
+                                                  history=history)
+    assert [(anomaly["service"], anomaly["date"]) for anomaly in anomalies] == [("S3", start + timedelta(days=29))]
+
+def test_update_cost_history_drops_expired_days_and_rows(history_dir, monkeypatch):
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=200)
+    costs = np.zeros((2, 199), dtype=np.float32)
+    costs[0, :] = 1.0  # still billed
+    costs[1, :10] = 5.0  # only billed in days that expire
+    cost_history._save_cost_history(start, [["EC2", "BoxUsage"], ["S3", "Requests"]], "USD", costs)
+
+    yesterday = today - timedelta(days=1)
+    monkeypatch.setattr(cost_history, "fetch_daily_usage_costs",
+                        lambda start_date, end_date: ({("EC2", "BoxUsage"): {yesterday: 2.0}}, "USD"))
+    history = cost_history.update_cost_history(history_days=180)
+
+    assert history["start"] == today - timedelta(days=180)
+    assert history["keys"] == [["EC2", "BoxUsage"]]
+    assert history["costs"].shape == (1, 180)
+    assert history["costs"][0, -1] == 2.0
@@ -0,0 +1,32 @@
+from utils.discord_output import pack_chunks, as_lines, LazyPages
+
+def test_pack_chunks_keeps_blocks_whole():
+    chunks = list(pack_chunks(["aaaa\n", "bbbb\n", "cccc\n"], limit=10))
+    assert chunks == ["aaaa\nbbbb\n", "cccc\n"]
+
+def test_pack_chunks_splits_an_oversized_block():
+    chunks = list(pack_chunks(["ab", "x" * 25, "cd"], limit=10))
+    assert chunks == ["ab", "x" * 10, "x" * 10, "x" * 5 + "cd"]
+    assert all(len(chunk) <= 10 for chunk in chunks)
+
+def test_pack_chunks_of_nothing_is_empty():
+    assert list(pack_chunks([])) == []
+
+def test_pack_chunks_is_lazy():
+    pulled = []
+
+    def blocks():
+        for i in range(100):
+            pulled.append(i)
+            yield f"{i:03d}\n"
+
+    chunks = pack_chunks(blocks(), limit=8)
+    assert next(chunks) == "000\n001\n"
+    assert len(pulled) == 3
+
+def test_lazy_pages_formats_only_what_is_asked():
+    pages = LazyPages(pack_chunks(as_lines(range(10)), limit=4))
+    assert pages.get(1) == "2\n3\n"
+    assert len(pages.pages) == 2 and not pages.exhausted
+    assert pages.get(9) is None
+    assert pages.exhausted and len(pages.pages) == 5
@@ -0,0 +1,62 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from utils import gen_ai_helpers
+from utils.gen_ai_helpers import TTLCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(gen_ai_helpers.time, "monotonic", clock)
+    return clock
+
+def test_ttl_cache_evicts_least_recently_used(clock):
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+def test_ttl_cache_entries_expire(clock):
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    clock.now += 60
+    assert cache.get("a") == 1
+    clock.now += 1
+    assert cache.get("a") is None
+    assert "a" not in cache._entries
+
+class CountingLLM:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=" answer "))])
+
+def test_ask_gpt_coalesces_and_caches(monkeypatch):
+    llm = CountingLLM()
+    monkeypatch.setattr(gen_ai_helpers, "_client", llm)
+    monkeypatch.setattr(gen_ai_helpers, "_semaphore", None)
+    monkeypatch.setattr(gen_ai_helpers, "_cache", TTLCache(8, 60))
+
+    async def main():
+        answers = await asyncio.gather(*(gen_ai_helpers.ask_gpt("why  is it slow?") for _ in range(5)))
+        answers.append(await gen_ai_helpers.ask_gpt("why is it slow?"))
+        return answers
+
+    assert asyncio.run(main()) == ["answer"] * 6
+    assert llm.calls == 1
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+from discord.ext.commands.view import StringView
+
+from utils.permissions import PermissionEngine, PermissionDenied
+
+RULES = {
+    "admin": ["manage_iam", "manage_service:bulk_terminate", "manage_service:delete_bucket"],
+    "user": ["optimize_costs"],
+}
+
+def make_ctx(text, roles=(), member_id=1):
+    """A context positioned just after the command name, as it is when global checks run."""
+    view = StringView(text)
+    view.skip_string("!")
+    name = view.get_word()
+    guild = SimpleNamespace(id=1)
+    author = SimpleNamespace(id=member_id, guild=guild, roles=[SimpleNamespace(name=role) for role in roles])
+    return SimpleNamespace(command=SimpleNamespace(qualified_name=name), message=SimpleNamespace(content=text),
+                           view=view, author=author, guild=guild)
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = PermissionEngine()
+    engine.compile(RULES)
+    monkeypatch.setattr(engine, "reload_if_changed", lambda: None)
+    return engine
+
+def test_unlisted_command_is_open(engine):
+    assert engine.authorize(make_ctx("!monitor_threats"))
+
+def test_command_entry_needs_role(engine):
+    with pytest.raises(PermissionDenied):
+        engine.authorize(make_ctx("!manage_iam create_role r"))
+    assert engine.authorize(make_ctx("!manage_iam create_role r", roles=["Admin"], member_id=2))
+
+@pytest.mark.parametrize("text", [
+    "!manage_service ec2 bulk_terminate all",
+    '!manage_service ec2 "bulk_terminate" all',
+    "!manage_service  ec2  \u201cbulk_terminate\u201d",
+    '!manage_service s3 "delete_bucket" x --force',
+    '!manage_service "s3" delete_bucket x --force',
+])
+def test_action_entry_matches_parsed_arguments(engine, text):
+    with pytest.raises(PermissionDenied):
+        engine.authorize(make_ctx(text))
+    assert engine.authorize(make_ctx(text, roles=["admin"], member_id=2))
+
+def test_other_actions_stay_open(engine):
+    assert engine.authorize(make_ctx('!manage_service ec2 "describe" state=running'))
+
+def test_missing_file_fails_at_startup_and_keeps_rules_later(monkeypatch, tmp_path):
+    monkeypatch.setattr("utils.permissions.PERMISSIONS_FILE", str(tmp_path / "permissions.json"))
+    engine = PermissionEngine()
+    with pytest.raises(FileNotFoundError):
+        engine.load()
+
+    engine.compile(RULES)
+    engine._mtime = 1  # loaded from a file that has since been deleted
+    engine.reload_if_changed()
+    with pytest.raises(PermissionDenied):
+        engine.authorize(make_ctx("!manage_iam create_role r"))
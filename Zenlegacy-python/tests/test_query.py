@@ -0,0 +1,53 @@
+import pytest
+
+from utils import aws_helpers
+from utils.aws_helpers import parse_query, run_query
+
+def test_server_side_filters_and_defaults():
+    query = parse_query("ec2", ["state=running", "type=m5.large,m5.xlarge", "tag:env=prod"])
+    assert query.filters == [{'Name': "instance-state-name", 'Values': ["running"]},
+                             {'Name': "instance-type", 'Values': ["m5.large", "m5.xlarge"]},
+                             {'Name': "tag:env", 'Values': ["prod"]}]
+    assert query.predicates == []
+    assert query.fields == aws_helpers.DEFAULT_QUERY_FIELDS["ec2"]
+    assert query.limit is None
+
+def test_fields_limit_and_target():
+    query = parse_query("rds", ["fields=id,engine,tag:team", "limit=5", "region=eu-west-1", "account=prod"])
+    assert query.fields == ["id", "engine", "tag:team"]
+    assert len(query.getters) == 3
+    assert (query.limit, query.region, query.account) == (5, "eu-west-1", "prod")
+
+def test_fields_without_a_filter_become_predicates():
+    query = parse_query("rds", ["state=available"])
+    assert query.filters == []
+    assert len(query.predicates) == 1 and query.predicates[0][1] == {"available"}
+
+@pytest.mark.parametrize("args", [
+    ["running"],
+    ["limit=0"],
+    ["limit=-1"],
+    ["limit=ten"],
+    ["fields="],
+    ["fields=id,bogus"],
+    ["bogus=1"],
+])
+def test_invalid_arguments_are_rejected(args):
+    with pytest.raises(ValueError):
+        parse_query("ec2", args)
+
+def test_run_query_projects_filters_and_stops_at_limit(monkeypatch):
+    pages = [[{'DBInstanceIdentifier': f"db-{i}", 'DBInstanceStatus': "available" if i % 2 else "stopped",
+               'Engine': "postgres"} for i in range(page * 10, page * 10 + 10)] for page in range(3)]
+    fetched = []
+
+    def iter_pages(service_name, filters, region=None, role_arn=None):
+        for page in pages:
+            fetched.append(page)
+            yield page
+
+    monkeypatch.setattr(aws_helpers, "_iter_pages", iter_pages)
+    query = parse_query("rds", ["state=available", "fields=id,engine", "limit=7"])
+    rows = run_query("rds", query)
+    assert rows == [(f"db-{i}", "postgres") for i in (1, 3, 5, 7, 9, 11, 13)]
+    assert len(fetched) == 2
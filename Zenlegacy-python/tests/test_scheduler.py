@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.aws_helpers import (TokenBucket, PrioritySemaphore, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND,
+                               RATE_DECREASE_FACTOR, RATE_INCREASE_STEP)
+
+def test_token_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket("test", rate=20)
+    started = time.monotonic()
+    for _ in range(20):
+        bucket.acquire()
+    assert time.monotonic() - started < 0.05
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.04
+
+def test_token_bucket_gives_up_at_the_deadline():
+    bucket = TokenBucket("test", rate=1)
+    bucket.acquire()
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        bucket.acquire(deadline=started + 0.1)
+    assert 0.1 <= time.monotonic() - started < 0.5
+    assert bucket._waiters == []
+
+def test_token_bucket_serves_interactive_waiters_first():
+    bucket = TokenBucket("test", rate=4)
+    for _ in range(4):
+        bucket.acquire()
+    order = []
+    threads = []
+    # The background waiter queues first; the interactive one still goes ahead once both wait.
+    with bucket._cond:
+        for priority in (PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE):
+            thread = threading.Thread(target=lambda p=priority: (bucket.acquire(p), order.append(p)))
+            thread.start()
+            threads.append(thread)
+            while len(bucket._waiters) < len(threads):
+                bucket._cond.wait(0.01)
+    for thread in threads:
+        thread.join(2)
+    assert order == [PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND]
+
+def test_token_bucket_aimd():
+    bucket = TokenBucket("test", rate=10)
+    bucket.throttled()
+    bucket.throttled()  # within RATE_DECREASE_INTERVAL: a single cut
+    assert bucket.rate == 10 * RATE_DECREASE_FACTOR
+    bucket.succeeded()
+    assert bucket.rate == pytest.approx(10 * RATE_DECREASE_FACTOR + 10 * RATE_INCREASE_STEP)
+    for _ in range(100):
+        bucket.succeeded()
+    assert bucket.rate == 10
+
+def test_priority_semaphore_hands_slots_by_priority():
+    async def main():
+        semaphore = PrioritySemaphore("test", 1)
+        await semaphore.acquire()
+        order = []
+
+        async def take(priority):
+            await semaphore.acquire(priority)
+            order.append(priority)
+            semaphore.release()
+
+        tasks = [asyncio.create_task(take(priority))
+                 for priority in (PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND)]
+        await asyncio.sleep(0)
+        semaphore.release()
+        await asyncio.gather(*tasks)
+        return order, semaphore._value
+
+    assert asyncio.run(main()) == ([PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND, PRIORITY_BACKGROUND], 1)
+
+def test_priority_semaphore_cancelled_waiter_keeps_no_slot():
+    async def main():
+        semaphore = PrioritySemaphore("test", 1)
+        await semaphore.acquire()
+        waiter = asyncio.create_task(semaphore.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        semaphore.release()
+        await asyncio.wait_for(semaphore.acquire(), 1)
+        return semaphore._value
+
+    assert asyncio.run(main()) == 0
@@ -0,0 +1,142 @@
+import asyncio
+import json
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from utils.aws_helpers import get_client, run_aws_call, service_key, aws_settings, aws_priority, PRIORITY_BACKGROUND
+from utils.logger import log_action
+
+# Event-driven alerts: EventBridge rules route GuardDuty findings and CloudWatch
+# alarm state changes into an SQS queue, and one long-polling consumer turns
+# them into channel messages as they arrive. Polling costs one ReceiveMessage
+# per ALERTS_WAIT_SECONDS while the queue is idle.
+ALERTS_QUEUE_URL = aws_settings.get("alerts_queue_url", "")
+ALERTS_WAIT_SECONDS = aws_settings.get("alerts_wait_seconds", 20)
+ALERTS_BATCH_SIZE = 10  # SQS maximum for ReceiveMessage and DeleteMessageBatch
+ALERTS_DEDUP_SIZE = 10000
+ALERTS_MAX_BACKOFF = 60
+
+def queue_region(queue_url):
+    """Region of an AWS queue URL (https://sqs.<region>.amazonaws.com/...), or None for a local stand-in."""
+    host = urlparse(queue_url).hostname or ""
+    parts = host.split(".")
+    return parts[1] if parts[0] == "sqs" and len(parts) > 2 else None
+
+def parse_event(body):
+    """Return the EventBridge event in a message body, unwrapping an SNS envelope if there is one."""
+    event = json.loads(body)
+    if event.get("Type") == "Notification" and "Message" in event:
+        event = json.loads(event["Message"])
+    return event
+
+def event_key(event):
+    """
+    Identify an alert for de-duplication.
+
+    SQS may deliver a message twice and GuardDuty re-publishes unchanged
+    findings, so GuardDuty findings are keyed by (id, updatedAt) and alarms by
+    (name, state, timestamp); anything else by its EventBridge event id.
+    """
+    detail = event.get("detail", {})
+    if event.get("detail-type") == "GuardDuty Finding":
+        return ("guardduty", detail.get("id"), detail.get("updatedAt"))
+    if event.get("detail-type") == "CloudWatch Alarm State Change":
+        state = detail.get("state", {})
+        return ("alarm", detail.get("alarmName"), state.get("value"), state.get("timestamp"))
+    return ("event", event.get("id"))
+
+def format_event(event):
+    """One alert message for an EventBridge event."""
+    detail = event.get("detail", {})
+    where = f"{event.get('account', 'n/a')}/{event.get('region', 'n/a')}"
+    if event.get("detail-type") == "GuardDuty Finding":
+        return (f"🛡 GuardDuty [{detail.get('severity')}] {detail.get('title')} ({where})\n"
+                f"{detail.get('description', '')}")
+    if event.get("detail-type") == "CloudWatch Alarm State Change":
+        state = detail.get("state", {})
+        previous = detail.get("previousState", {}).get("value", "?")
+        return (f"🚨 CloudWatch alarm {detail.get('alarmName')}: {previous} → {state.get('value')} ({where})\n"
+                f"{state.get('reason', '')}")
+    return f"📣 {event.get('detail-type', 'Event')} from {event.get('source', 'n/a')} ({where})"
+
+class AlertConsumer:
+    """
+    Long-poll an SQS queue and hand new alerts to `deliver`, a coroutine function taking a list of strings.
+
+    Messages are deleted only after delivery succeeds (duplicates are dropped
+    and deleted straight away), so an alert is never lost to a failed send.
+    """
+
+    def __init__(self, deliver, queue_url=ALERTS_QUEUE_URL, wait_seconds=ALERTS_WAIT_SECONDS, client=None):
+        self.deliver = deliver
+        self.queue_url = queue_url
+        self.wait_seconds = wait_seconds
+        self.client = client or get_client("sqs", queue_region(queue_url))
+        self._key = service_key("sqs", self.client.meta.region_name)
+        self._seen = OrderedDict()
+        self._task = None
+
+    def _remember(self, key):
+        self._seen[key] = None
+        self._seen.move_to_end(key)
+        while len(self._seen) > ALERTS_DEDUP_SIZE:
+            self._seen.popitem(last=False)
+
+    def start(self):
+        """Start consuming on the running event loop, once."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def poll_once(self):
+        """Receive up to one batch, deliver what is new, delete the batch. Returns the number of alerts delivered."""
+        response = await run_aws_call(self._key, self.client.receive_message, QueueUrl=self.queue_url,
+                                      MaxNumberOfMessages=ALERTS_BATCH_SIZE, WaitTimeSeconds=self.wait_seconds,
+                                      timeout=self.wait_seconds + 10)
+        messages = response.get("Messages", [])
+        if not messages:
+            return 0
+
+        alerts, keys = [], []
+        for message in messages:
+            try:
+                event = parse_event(message["Body"])
+            except (ValueError, KeyError) as e:
+                print(f"Dropping unreadable alert message {message.get('MessageId')}: {e}")
+                continue
+            key = event_key(event)
+            if key in self._seen or key in keys:
+                continue
+            alerts.append(format_event(event))
+            keys.append(key)
+
+        if alerts:
+            await self.deliver(alerts)
+            for key in keys:
+                self._remember(key)
+            for alert in alerts:
+                log_action(alert, command="alert_consumer", service="sqs")
+
+        entries = [{"Id": str(i), "ReceiptHandle": message["ReceiptHandle"]} for i, message in enumerate(messages)]
+        result = await run_aws_call(self._key, self.client.delete_message_batch, QueueUrl=self.queue_url,
+                                    Entries=entries)
+        for failure in result.get("Failed", []):
+            print(f"Failed to delete alert message {failure['Id']}: {failure.get('Message')}")
+        return len(alerts)
+
+    async def _run(self):
+        aws_priority.set(PRIORITY_BACKGROUND)
+        backoff = 1
+        while True:
+            try:
+                await self.poll_once()
+                backoff = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Alert consumer error, retrying in {backoff}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, ALERTS_MAX_BACKOFF)
@@ -0,0 +1,256 @@
+import asyncio
+import math
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from utils.aws_helpers import get_client, run_aws_call, call_aws, service_key, aws_priority, PRIORITY_BACKGROUND
+from utils.cloudwatch_metrics import fetch_fleet_metric
+from utils.config import load_config
+from utils.inventory import inventory, select_victims
+from utils.logger import log_action
+from utils.targets import get_target
+
+# Autoscaling controller: every AUTOSCALING_INTERVAL seconds, read the metric of
+# every group member in bulk, decide a desired capacity per instance group and
+# launch or terminate only the difference. Groups are configured in
+# config/autoscaling.json as {"name", "instance_type", "min", "max"} plus an
+# optional "tag" ("Key=Value"), "metric", "image_id", "account" and "region".
+autoscaling = load_config("autoscaling")
+thresholds = load_config("thresholds")
+
+AUTOSCALING_ENABLED = autoscaling.get("enabled", False)
+AUTOSCALING_INTERVAL = autoscaling.get("interval", 60)
+AUTOSCALING_GROUPS = autoscaling.get("groups", [])
+IMAGE_ID = autoscaling.get("image_id", "ami-0abcdef1234567890")
+METRIC_PERIOD = autoscaling.get("period", 300)
+
+# Hysteresis: scale out above scaling_threshold, scale in below
+# scale_in_threshold, and in both cases aim for target_utilization.
+SCALE_OUT_THRESHOLD = thresholds.get("scaling_threshold", 80)
+SCALE_IN_THRESHOLD = autoscaling.get("scale_in_threshold", 30)
+TARGET_UTILIZATION = autoscaling.get("target_utilization", 60)
+SCALE_OUT_COOLDOWN = autoscaling.get("scale_out_cooldown", 300)
+SCALE_IN_COOLDOWN = autoscaling.get("scale_in_cooldown", 900)
+MAX_STEP = autoscaling.get("max_step", 10)
+
+# Forecast: "off", "moving_average" or "linear" (least-squares trend over the
+# last FORECAST_WINDOW periods, extrapolated FORECAST_HORIZON periods ahead).
+FORECAST_MODE = autoscaling.get("forecast", "linear")
+FORECAST_WINDOW = autoscaling.get("forecast_window", 6)
+FORECAST_HORIZON = autoscaling.get("forecast_horizon", 2)
+
+TERMINATE_BATCH_SIZE = 1000
+
+ScalingDecision = namedtuple("ScalingDecision", ["group", "current", "desired", "load", "forecast", "reason"])
+
+def group_series(matrix):
+    """Average a (members, periods) metric matrix into one value per period, skipping periods with no data."""
+    valid = ~np.isnan(matrix)
+    counts = valid.sum(axis=0)
+    sums = np.where(valid, matrix, 0.0).sum(axis=0)
+    return sums[counts > 0] / counts[counts > 0]
+
+def forecast_load(series, mode=FORECAST_MODE, window=FORECAST_WINDOW, horizon=FORECAST_HORIZON):
+    """Predict the load `horizon` periods ahead from a group series, or NaN without data."""
+    recent = series[-window:]
+    if len(recent) == 0:
+        return float("nan")
+    if mode == "off" or len(recent) < 2:
+        return float(recent[-1])
+    if mode == "moving_average":
+        return float(recent.mean())
+    if mode == "linear":
+        slope, intercept = np.polyfit(np.arange(len(recent)), recent, 1)
+        return float(intercept + slope * (len(recent) - 1 + horizon))
+    raise ValueError(f"Unsupported forecast mode: {mode}")
+
+def desired_capacity(group, current, load, since_scale_out, since_scale_in):
+    """
+    Return (desired, reason) for one group.
+
+    Capacity is first brought inside [min, max]. Otherwise it only changes when
+    the load leaves the hysteresis band, at most MAX_STEP instances at a time,
+    and not within the cooldown of the previous change.
+    """
+    low, high = group.get("min", 0), group.get("max", current)
+    if current < low:
+        return low, f"below minimum {low}"
+    if current > high:
+        return high, f"above maximum {high}"
+    if math.isnan(load) or current == 0:
+        return current, "no metric data"
+
+    proportional = math.ceil(current * load / TARGET_UTILIZATION)
+    if load > SCALE_OUT_THRESHOLD:
+        if since_scale_out < SCALE_OUT_COOLDOWN:
+            return current, "scale-out cooldown"
+        return min(proportional, current + MAX_STEP, high), f"load {load:.0f}% > {SCALE_OUT_THRESHOLD}%"
+    if load < SCALE_IN_THRESHOLD:
+        if min(since_scale_out, since_scale_in) < SCALE_IN_COOLDOWN:
+            return current, "scale-in cooldown"
+        return max(proportional, current - MAX_STEP, low), f"load {load:.0f}% < {SCALE_IN_THRESHOLD}%"
+    return current, "within band"
+
+async def _refresh_inventory(target, instance_ids):
+    """Re-describe instances the bot just changed; the background refresh catches up if this fails."""
+    # The launch or termination already happened, so a failed refresh must not report it as failed.
+    try:
+        await run_aws_call(service_key("ec2", target.region), inventory.refresh_ids, "ec2", instance_ids, target)
+    except Exception as e:
+        print(f"Inventory refresh after scaling failed in {target.account}/{target.region}: {e}")
+
+async def launch_instances(target, instance_type, count, image_id=IMAGE_ID, tags=None):
+    """Launch `count` instances in one RunInstances call and add them to the inventory; returns their IDs."""
+    request = dict(ImageId=image_id, InstanceType=instance_type, MinCount=count, MaxCount=count)
+    if tags:
+        request["TagSpecifications"] = [{'ResourceType': 'instance',
+                                         'Tags': [{'Key': key, 'Value': value} for key, value in tags.items()]}]
+    response = await call_aws(get_client("ec2", target.region, target.role_arn), "run_instances", **request)
+    instance_ids = [instance['InstanceId'] for instance in response['Instances']]
+    await _refresh_inventory(target, instance_ids)
+    return instance_ids
+
+async def terminate_instances(target, instance_ids):
+    """Terminate instances, TERMINATE_BATCH_SIZE per call, and update the inventory."""
+    client = get_client("ec2", target.region, target.role_arn)
+    for offset in range(0, len(instance_ids), TERMINATE_BATCH_SIZE):
+        await call_aws(client, "terminate_instances", InstanceIds=instance_ids[offset:offset + TERMINATE_BATCH_SIZE])
+    await _refresh_inventory(target, instance_ids)
+
+def _group_tags(group):
+    if "tag" not in group:
+        return {}
+    key, value = group["tag"].split("=", 1)
+    return {key: value}
+
+class AutoscalingController:
+    """
+    Reconcile each configured instance group towards its desired capacity.
+
+    `notify`, if set, is a coroutine function taking a list of strings and is
+    told about every scaling action.
+    """
+
+    def __init__(self, groups=AUTOSCALING_GROUPS, notify=None):
+        self.groups = groups
+        self.notify = notify
+        self.decisions = {}
+        self._last_scale_out = {}
+        self._last_scale_in = {}
+        self._task = None
+
+    def _members(self, group):
+        """Return (target, running, pending) for a group, from the inventory."""
+        target = get_target(group.get("account"), group.get("region"))
+        criteria = dict(type=group["instance_type"], account=target.account, region=target.region)
+        tags = _group_tags(group)
+        if tags:
+            criteria["tag"] = next(iter(tags.items()))
+        return (target, inventory.query("ec2", state="running", **criteria),
+                inventory.query("ec2", state="pending", **criteria))
+
+    async def evaluate(self):
+        """
+        Decide every group's capacity; returns {name: (ScalingDecision, target, running)}.
+
+        Metrics are read with one fetch_fleet_metric per (target, metric)
+        covering all groups in it. Pending instances count towards capacity
+        so a launch is not repeated while they boot.
+        """
+        await inventory.ensure_fresh("ec2")
+        members = {group["name"]: self._members(group) for group in self.groups}
+
+        batches, slices = {}, {}
+        for group in self.groups:
+            target, running, _ = members[group["name"]]
+            ids = batches.setdefault((target, group.get("metric", "CPUUtilization")), [])
+            slices[group["name"]] = (len(ids), len(ids) + len(running))
+            ids.extend(record.id for record in running)
+
+        keys = [key for key, ids in batches.items() if ids]
+        lookback_minutes = METRIC_PERIOD * (FORECAST_WINDOW + 2) // 60
+        fetched = await asyncio.gather(*(
+            fetch_fleet_metric(batches[key], metric_name=key[1], lookback_minutes=lookback_minutes,
+                               period=METRIC_PERIOD, region=key[0].region, role_arn=key[0].role_arn)
+            for key in keys))
+        matrices = {key: matrix for key, (_, matrix) in zip(keys, fetched)}
+
+        now = time.monotonic()
+        evaluated = {}
+        for group in self.groups:
+            name = group["name"]
+            target, running, pending = members[name]
+            matrix = matrices.get((target, group.get("metric", "CPUUtilization")))
+            series = group_series(matrix[slice(*slices[name])]) if matrix is not None else np.array([])
+            latest = float(series[-1]) if len(series) else float("nan")
+            forecast = forecast_load(series)
+            # React to whichever is higher, so a rising trend scales out early
+            # and a falling one does not scale in before the load has dropped.
+            load = latest if math.isnan(forecast) else max(latest, forecast)
+            current = len(running) + len(pending)
+            desired, reason = desired_capacity(group, current, load,
+                                               now - self._last_scale_out.get(name, -math.inf),
+                                               now - self._last_scale_in.get(name, -math.inf))
+            evaluated[name] = (ScalingDecision(name, current, desired, latest, forecast, reason), target, running)
+        return evaluated
+
+    async def _apply(self, group, decision, target, running):
+        """Launch or terminate the difference for one group; returns the affected IDs, or None if unchanged."""
+        difference = decision.desired - decision.current
+        if difference > 0:
+            try:
+                return await launch_instances(target, group["instance_type"], difference,
+                                              group.get("image_id", IMAGE_ID), _group_tags(group))
+            finally:
+                # Also after a failure: a timed-out RunInstances may still have launched the instances.
+                self._last_scale_out[decision.group] = time.monotonic()
+        if difference < 0:
+            strategy = thresholds.get("scale_down_strategy", "oldest")
+            instance_ids = [record.id for record in select_victims(running, -difference, strategy)]
+            try:
+                await terminate_instances(target, instance_ids)
+            finally:
+                self._last_scale_in[decision.group] = time.monotonic()
+            return instance_ids
+        return None
+
+    async def reconcile(self):
+        """Evaluate every group and apply the differences; returns the list of ScalingDecisions."""
+        evaluated = await self.evaluate()
+        messages = []
+        for group in self.groups:
+            decision, target, running = evaluated[group["name"]]
+            self.decisions[decision.group] = decision
+            try:
+                instance_ids = await self._apply(group, decision, target, running)
+            except Exception as e:
+                # One failing group must not keep the others from scaling.
+                message = f"Autoscaling {decision.group}: {decision.current} → {decision.desired} failed: {e}"
+            else:
+                if instance_ids is None:
+                    continue
+                message = (f"Autoscaling {decision.group}: {decision.current} → {decision.desired} "
+                           f"{group['instance_type']} ({decision.reason}): {', '.join(instance_ids)}")
+            log_action(message, command="autoscaler", service="ec2")
+            messages.append(message)
+        if messages and self.notify is not None:
+            await self.notify(messages)
+        return [decision for decision, _, _ in evaluated.values()]
+
+    def start(self, interval=AUTOSCALING_INTERVAL):
+        """Start the control loop on the running event loop, once."""
+        if self.groups and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run(interval))
+
+    async def _run(self, interval):
+        aws_priority.set(PRIORITY_BACKGROUND)
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                print(f"Autoscaling reconcile failed: {e}")
+            await asyncio.sleep(interval)
+
+autoscaler = AutoscalingController()
@@ -1,156 +1,851 @@
 import boto3
-import json
+from botocore.config import Config
+from botocore.credentials import RefreshableCredentials
+from botocore.exceptions import WaiterError
+from botocore.session import get_session as get_botocore_session
 from datetime import datetime, timedelta
-import logging
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-with open("config/aws_credentials.json", "r") as f:
-    aws_credentials = json.load(f)
+from utils.config import load_config
+from utils.metrics import instrument_client, aws_queue_depth, aws_throttles, aws_rate_limit
+
+aws_credentials = load_config("aws_credentials")
+aws_settings = load_config("aws_settings")
 
 SUPPORTED_SERVICES = ["ec2", "s3", "rds", "dynamodb", "cost_explorer"]
 
+# Async execution layer: boto3 is blocking, so every AWS call made from a
+# command handler is pushed onto a bounded thread pool instead of the event loop.
+AWS_MAX_WORKERS = aws_settings.get("max_workers", 32)
+AWS_CALL_TIMEOUT = aws_settings.get("call_timeout", 30)
+SERVICE_CONCURRENCY = aws_settings.get("service_concurrency", {})
+DEFAULT_SERVICE_CONCURRENCY = SERVICE_CONCURRENCY.get("default", 8)
+
+_aws_executor = None
+_service_semaphores = {}
+
+# Client registry: boto3 clients are thread-safe and expensive to build, so one
+# client per (service, region, role) is created lazily and shared process-wide,
+# keeping its HTTPS connection pool warm between commands.
+DEFAULT_REGION = aws_credentials.get("region") or None
+# Per-service endpoint overrides, e.g. {"sqs": "http://localhost:9324"} for a local stand-in.
+ENDPOINT_URLS = aws_settings.get("endpoint_urls", {})
+CLIENT_CONFIG = Config(
+    max_pool_connections=aws_settings.get("max_pool_connections", 50),
+    tcp_keepalive=aws_settings.get("tcp_keepalive", True),
+    connect_timeout=aws_settings.get("connect_timeout", 5),
+    read_timeout=aws_settings.get("read_timeout", 60),
+    retries={
+        "mode": aws_settings.get("retry_mode", "standard"),
+        "max_attempts": aws_settings.get("max_attempts", 10),
+    },
+)
+
+# Cost Explorer names for the services the bot manages.
+COST_EXPLORER_SERVICE_NAMES = {
+    "ec2": "Amazon Elastic Compute Cloud - Compute",
+    "s3": "Amazon Simple Storage Service",
+    "rds": "Amazon Relational Database Service",
+    "dynamodb": "Amazon DynamoDB",
+}
+
+_cost_cache = {"costs": None, "expires": None}
+_cost_cache_lock = threading.Lock()
+
+# Assumed-role sessions refresh their STS credentials shortly before they expire.
+ASSUME_ROLE_DURATION = aws_settings.get("assume_role_duration", 3600)
+
+_sessions = {}
+_clients = {}
+_registry_lock = threading.Lock()
+client_registry_stats = {"hits": 0, "misses": 0}
+
+# Request scheduler: every HTTP attempt a client makes first takes a token from
+# the bucket for its (account, region, service, operation). Throttle responses
+# halve that bucket's rate and successes raise it back towards the configured
+# limit (AIMD), so bursts queue up here instead of being retried against AWS.
+# Waiters, both for a token and for a service concurrency slot, are served in
+# priority order: interactive commands go ahead of background refresh jobs.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background"}
+
+# Priority of the AWS calls made by the current task; background loops set it once at their start.
+aws_priority = contextvars.ContextVar("aws_priority", default=PRIORITY_INTERACTIVE)
+# time.monotonic() after which the caller of run_aws_call has given up; a request
+# still waiting for its token by then is never sent.
+aws_deadline = contextvars.ContextVar("aws_deadline", default=None)
+
+RATE_LIMITS = aws_settings.get("rate_limits", {})
+DEFAULT_RATE_LIMIT = RATE_LIMITS.get("default", 25)
+MIN_RATE = 0.2
+RATE_DECREASE_FACTOR = 0.5
+RATE_DECREASE_INTERVAL = 1.0  # one cut per second, however many throttles a burst returns
+RATE_INCREASE_STEP = 0.05  # fraction of the configured limit regained per successful request
+
+THROTTLE_ERROR_CODES = {
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottledException",
+    "TooManyRequestsException", "ProvisionedThroughputExceededException", "RequestLimitExceeded",
+    "RequestThrottled", "SlowDown", "EC2ThrottledException",
+}
+
+def _depth_by_priority(waiters):
+    depth = dict.fromkeys(PRIORITY_NAMES, 0)
+    for entry in waiters:
+        depth[entry[0]] += 1
+    return depth
+
+class TokenBucket:
+    """Thread-safe token bucket with AIMD rate adjustment; blocked threads are served by priority, then FIFO."""
+
+    def __init__(self, name, rate):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._last_decrease = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        aws_rate_limit.set(rate, name)
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _report_depth(self):
+        for priority, depth in _depth_by_priority(self._waiters).items():
+            aws_queue_depth.set(depth, "token", self.name, PRIORITY_NAMES[priority])
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE, deadline=None):
+        """
+        Block until a token is available and this thread is first in line.
+
+        Raises TimeoutError if time.monotonic() passes deadline first.
+        """
+        with self._cond:
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiters, entry)
+            self._report_depth()
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    first = self._waiters[0] == entry
+                    if first and self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    if deadline is not None and now >= deadline:
+                        raise TimeoutError(f"Gave up waiting for a {self.name} request token")
+                    # Only the head waits on the clock; the others wait for it to move on.
+                    wait = (1 - self._tokens) / self.rate if first else None
+                    if deadline is not None:
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._report_depth()
+                self._cond.notify_all()
+
+    def throttled(self):
+        """Multiplicative decrease, at most once per RATE_DECREASE_INTERVAL."""
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease >= RATE_DECREASE_INTERVAL:
+                self._refill(now)
+                self.rate = max(MIN_RATE, self.rate * RATE_DECREASE_FACTOR)
+                self._tokens = min(self._tokens, 0.0)
+                self._last_decrease = now
+                aws_rate_limit.set(self.rate, self.name)
+
+    def succeeded(self):
+        """Additive increase back towards the configured limit."""
+        if self.rate >= self.max_rate:
+            return
+        with self._cond:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_INCREASE_STEP)
+            aws_rate_limit.set(self.rate, self.name)
+
+class PrioritySemaphore:
+    """asyncio semaphore that hands free slots to the highest-priority waiter first."""
+
+    def __init__(self, name, value):
+        self.name = name
+        self._value = value
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def _report_depth(self):
+        waiting = [entry for entry in self._waiters if not entry[2].done()]
+        for priority, depth in _depth_by_priority(waiting).items():
+            aws_queue_depth.set(depth, "slot", self.name, PRIORITY_NAMES[priority])
+
+    async def acquire(self, priority=PRIORITY_INTERACTIVE):
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self._report_depth()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                self.release()  # a slot was handed over just as we were cancelled
+            raise
+        finally:
+            self._report_depth()
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def _rate_limit_for(service_name, operation):
+    return RATE_LIMITS.get(f"{service_name}:{operation}", RATE_LIMITS.get(service_name, DEFAULT_RATE_LIMIT))
+
+def get_token_bucket(service_name, operation, region=None, role_arn=None):
+    """Return the token bucket for one API operation in one account and region."""
+    name = f"{service_key(service_name, region)}:{operation}"
+    if role_arn:
+        name = f"{role_arn.split(':')[4]}/{name}"
+    bucket = _buckets.get(name)
+    if bucket is None:
+        with _buckets_lock:
+            bucket = _buckets.get(name)
+            if bucket is None:
+                bucket = _buckets[name] = TokenBucket(name, _rate_limit_for(service_name, operation))
+    return bucket
+
+def get_scheduler_stats():
+    """Return {bucket name: (current rate, configured rate)} for buckets currently slowed down."""
+    return {name: (bucket.rate, bucket.max_rate) for name, bucket in list(_buckets.items())
+            if bucket.rate < bucket.max_rate}
+
+def _schedule_client(client, service_name, region, role_arn):
+    """Make every HTTP attempt of a client wait for its token bucket, and feed throttles back into it."""
+    def bucket_for(event_name):
+        return get_token_bucket(service_name, event_name.rsplit(".", 1)[-1], region, role_arn)
+
+    def before_send(event_name, **kwargs):
+        bucket_for(event_name).acquire(aws_priority.get(), aws_deadline.get())
+
+    def needs_retry(event_name, response=None, **kwargs):
+        if response is None:
+            return  # connection error; nothing to learn about the rate
+        http_response, parsed = response
+        operation = event_name.rsplit(".", 1)[-1]
+        if http_response.status_code == 429 or parsed.get('Error', {}).get('Code') in THROTTLE_ERROR_CODES:
+            aws_throttles.inc(service_name, operation)
+            bucket_for(event_name).throttled()
+        elif http_response.status_code < 400:
+            bucket_for(event_name).succeeded()
+
+    client.meta.events.register("before-send.*.*", before_send)
+    client.meta.events.register("needs-retry.*.*", needs_retry)
+    return client
+
 def validate_service(service_name):
     """Validate if the service is supported."""
     if service_name not in SUPPORTED_SERVICES:
         raise ValueError(f"Unsupported service: {service_name}")
 
+def _assume_role_credentials(sts, role_arn):
+    """Call AssumeRole and return the credentials in botocore's refreshable-credentials format."""
+    credentials = sts.assume_role(RoleArn=role_arn, RoleSessionName="zenlegacy-bot",
+                                  DurationSeconds=ASSUME_ROLE_DURATION)['Credentials']
+    return {
+        "access_key": credentials['AccessKeyId'],
+        "secret_key": credentials['SecretAccessKey'],
+        "token": credentials['SessionToken'],
+        "expiry_time": credentials['Expiration'].isoformat(),
+    }
+
+def _create_session(role_arn=None):
+    """
+    Build a boto3 session from the configured keys, assuming role_arn if given.
+
+    Assumed-role credentials are cached with the session and renewed
+    automatically before they expire, so long-lived clients keep working.
+    """
+    base_session = boto3.Session(aws_access_key_id=aws_credentials['aws_access_key'] or None,
+                                 aws_secret_access_key=aws_credentials['aws_secret_key'] or None,
+                                 region_name=DEFAULT_REGION)
+    if role_arn is None:
+        return base_session
+
+    sts = instrument_client(base_session.client("sts", config=CLIENT_CONFIG))
+    refresh = functools.partial(_assume_role_credentials, sts, role_arn)
+    botocore_session = get_botocore_session()
+    botocore_session._credentials = RefreshableCredentials.create_from_metadata(
+        metadata=refresh(), refresh_using=refresh, method="sts-assume-role")
+    return boto3.Session(botocore_session=botocore_session, region_name=DEFAULT_REGION)
+
+def get_client(service_name, region=None, role_arn=None):
+    """
+    Return the shared boto3 client for a service, creating it on first use.
+
+    Parameters:
+    - service_name (str): The boto3 service name (e.g., 'ec2', 'ce', 'guardduty').
+    - region (str, optional): AWS region. Defaults to the region in aws_credentials.json.
+    - role_arn (str, optional): IAM role to assume for cross-account access.
+    """
+    key = (service_name, region or DEFAULT_REGION, role_arn)
+    client = _clients.get(key)
+    if client is not None:
+        client_registry_stats["hits"] += 1
+        return client
+
+    with _registry_lock:
+        client = _clients.get(key)
+        if client is None:
+            client_registry_stats["misses"] += 1
+            session = _sessions.get(role_arn)
+            if session is None:
+                session = _sessions[role_arn] = _create_session(role_arn)
+            client = session.client(service_name, region_name=key[1], config=CLIENT_CONFIG,
+                                    endpoint_url=ENDPOINT_URLS.get(service_name))
+            _clients[key] = _schedule_client(instrument_client(client), service_name, key[1], role_arn)
+        else:
+            client_registry_stats["hits"] += 1
+    return client
+
+def get_client_registry_stats():
+    """Return client reuse counters: cache hits, misses and number of live clients."""
+    return dict(client_registry_stats, clients=len(_clients))
+
+def clear_client_registry():
+    """Drop all cached sessions and clients, e.g. after rotating credentials."""
+    with _registry_lock:
+        _clients.clear()
+        _sessions.clear()
+
 def get_service_client(service_name):
     """Get a Boto3 client for the specified AWS service."""
     validate_service(service_name)
-    
-    return boto3.client(service_name,
-                        aws_access_key_id=aws_credentials['aws_access_key'],
-                        aws_secret_access_key=aws_credentials['aws_secret_key'],
-                        region_name=aws_credentials['region'])
+    return get_client(service_name)
+
+def get_aws_executor():
+    """Return the shared thread pool used for blocking AWS calls, creating it on first use."""
+    global _aws_executor
+    if _aws_executor is None:
+        _aws_executor = ThreadPoolExecutor(max_workers=AWS_MAX_WORKERS, thread_name_prefix="aws")
+    return _aws_executor
+
+def service_key(service_name, region=None):
+    """
+    Name the concurrency bucket for a service endpoint.
+
+    Calls to the default region share the plain service bucket; every other
+    region gets its own ('ec2:eu-west-1'), so fanning out to many regions is
+    not throttled by the limit meant for one endpoint.
+    """
+    if region is None or region == DEFAULT_REGION:
+        return service_name
+    return f"{service_name}:{region}"
+
+def _get_service_semaphore(service_name):
+    """Return the semaphore limiting concurrent calls to one AWS service endpoint (see service_key)."""
+    semaphore = _service_semaphores.get(service_name)
+    if semaphore is None:
+        limit = SERVICE_CONCURRENCY.get(service_name.split(":")[0], DEFAULT_SERVICE_CONCURRENCY)
+        semaphore = PrioritySemaphore(service_name, limit)
+        _service_semaphores[service_name] = semaphore
+    return semaphore
+
+async def run_aws_call(service_name, func, *args, timeout=None, **kwargs):
+    """
+    Run a blocking AWS function on the AWS thread pool and await its result.
+
+    Parameters:
+    - service_name (str): Service the call belongs to, used for the concurrency limit (e.g., 'ec2', 'ce',
+      or service_key('ec2', region) for another region).
+    - func (callable): The blocking function, usually a boto3 client method or a helper from this module.
+    - timeout (float, optional): Seconds to wait before giving up. Defaults to AWS_CALL_TIMEOUT.
+
+    The call runs with the caller's aws_priority, both for the concurrency slot
+    and for the token buckets its requests wait on. If the awaiting command is
+    cancelled or times out, the result is discarded; the worker thread
+    finishes the in-flight HTTP request on its own, but sends no request that
+    is still waiting for a token.
+    """
+    if timeout is None:
+        timeout = AWS_CALL_TIMEOUT
+    loop = asyncio.get_running_loop()
+    semaphore = _get_service_semaphore(service_name)
+    await semaphore.acquire(aws_priority.get())
+    try:
+        # Run inside a copy of the caller's context so the worker thread sees aws_priority and the deadline.
+        context = contextvars.copy_context()
+        context.run(aws_deadline.set, time.monotonic() + timeout)
+        call = functools.partial(context.run, func, *args, **kwargs)
+        future = loop.run_in_executor(get_aws_executor(), call)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"AWS {service_name} call timed out after {timeout} seconds")
+    finally:
+        semaphore.release()
+
+async def call_aws(client, operation_name, timeout=None, **kwargs):
+    """Await a single boto3 client operation, e.g. call_aws(ec2, "describe_instances")."""
+    key = service_key(client.meta.service_model.service_name, client.meta.region_name)
+    return await run_aws_call(key, getattr(client, operation_name), timeout=timeout, **kwargs)
+
+def fetch_costs_by_service(start_date, end_date):
+    """
+    Fetch the cost of every AWS service between two dates with one grouped Cost Explorer query.
+
+    Returns a dict mapping the Cost Explorer service name to an (amount, currency) tuple.
+    """
+    client = get_client("ce")  # Cost Explorer service
+    request = {
+        'TimePeriod': {'Start': start_date, 'End': end_date},
+        'Granularity': 'MONTHLY',
+        'Metrics': ['UnblendedCost'],
+        'GroupBy': [{'Type': 'DIMENSION', 'Key': 'SERVICE'}],
+    }
+
+    costs = {}
+    while True:
+        response = client.get_cost_and_usage(**request)
+        for result in response.get('ResultsByTime', []):
+            for group in result.get('Groups', []):
+                service = group['Keys'][0]
+                cost = group['Metrics']['UnblendedCost']
+                amount, _ = costs.get(service, (0.0, cost['Unit']))
+                costs[service] = (amount + float(cost['Amount']), cost['Unit'])
+
+        token = response.get('NextPageToken')
+        if not token:
+            return costs
+        request['NextPageToken'] = token
+
+def get_monthly_costs():
+    """
+    Return last 30 days of cost per service, cached until Cost Explorer's next daily refresh.
+
+    Cost Explorer bills every request and only updates once per billing day (UTC),
+    so repeated calls on the same day are served from memory.
+    """
+    now = datetime.utcnow()
+    with _cost_cache_lock:
+        if _cost_cache["costs"] is not None and now < _cost_cache["expires"]:
+            return _cost_cache["costs"]
+
+        # Define the time period for the cost query (last 30 days)
+        end_date = now.date()
+        start_date = end_date - timedelta(days=30)
+        costs = fetch_costs_by_service(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+
+        _cost_cache["costs"] = costs
+        _cost_cache["expires"] = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        return costs
 
 def get_cost_for_service(service_name):
     """Retrieve the cost associated with a specific AWS service."""
-    client = get_service_client("ce")  # Cost Explorer service
-
-    # Define the time period for the cost query (last 30 days)
-    end_date = datetime.now().date()
-    start_date = (end_date - timedelta(days=30)).strftime('%Y-%m-%d')
-    end_date = end_date.strftime('%Y-%m-%d')
-
-    response = client.get_cost_and_usage(
-        TimePeriod={
-            'Start': start_date,
-            'End': end_date
-        },
-        Granularity='MONTHLY',
-        Metrics=['UnblendedCost'],
-        Filter={
-            'Dimensions': {
-                'Key': 'SERVICE',
-                'Values': [service_name.capitalize()]
-            }
-        }
-    )
-
-    if 'ResultsByTime' in response and response['ResultsByTime']:
-        amount = response['ResultsByTime'][0]['Total']['UnblendedCost']['Amount']
-        currency = response['ResultsByTime'][0]['Total']['UnblendedCost']['Unit']
-        return f"{service_name}: {amount} {currency}"
-    else:
+    costs = get_monthly_costs()
+    cost = costs.get(COST_EXPLORER_SERVICE_NAMES.get(service_name, service_name))
+    if cost is None:
         return f"{service_name}: No cost data found."
+    amount, currency = cost
+    return f"{service_name}: {amount:.2f} {currency}"
 
-def format_guardduty_findings(findings):
-    """Format GuardDuty findings for easier readability."""
-    formatted_findings = ""
+def _finding_resource_id(resource):
+    """Best-effort identifier of the resource a GuardDuty finding is about."""
+    if 'InstanceDetails' in resource:
+        return resource['InstanceDetails'].get('InstanceId', 'n/a')
+    if 'AccessKeyDetails' in resource:
+        return resource['AccessKeyDetails'].get('AccessKeyId', 'n/a')
+    if resource.get('S3BucketDetails'):
+        return resource['S3BucketDetails'][0].get('Name', 'n/a')
+    return resource.get('Id', 'n/a')
+
+def iter_guardduty_findings(findings):
+    """Yield one formatted text block per GuardDuty finding."""
     for finding in findings:
-        formatted_findings += (f"[{finding['Severity']}]: {finding['Title']} - {finding['Description']}\n"
-                               f"Account: {finding['AccountId']}, Region: {finding['Region']}\n"
-                               f"Threat: {finding['Service']['Action']['ActionType']}\n"
-                               f"Resource: {finding['Resource']['ResourceType']} - {finding['Resource']['Id']}\n"
-                               "------------------------------------------\n")
-    return formatted_findings
+        yield (f"[{finding['Severity']}]: {finding['Title']} - {finding['Description']}\n"
+               f"Account: {finding['AccountId']}, Region: {finding['Region']}\n"
+               f"Threat: {finding['Service'].get('Action', {}).get('ActionType', 'n/a')}\n"
+               f"Resource: {finding['Resource']['ResourceType']} - {_finding_resource_id(finding['Resource'])}\n"
+               "------------------------------------------\n")
 
+def format_guardduty_findings(findings):
+    """Format GuardDuty findings for easier readability."""
+    return "".join(iter_guardduty_findings(findings))
 
 def get_all_service_costs():
-    """Retrieve the costs for all supported AWS services."""
-    costs = []
-    for service in SUPPORTED_SERVICES[:-1]:  # Skip "cost_explorer"
-        cost = get_cost_for_service(service)
-        costs.append(cost)
-    return ", ".join(costs)
+    """Retrieve the costs for every AWS service with spend, most expensive first."""
+    costs = get_monthly_costs()
+    if not costs:
+        return "No cost data found."
+    ranked = sorted(costs.items(), key=lambda item: item[1][0], reverse=True)
+    return ", ".join(f"{service}: {amount:.2f} {currency}" for service, (amount, currency) in ranked)
 
 # New Functions for EC2, RDS, and DynamoDB instance management
 
-def get_current_instance_count(service_name):
-    """Get the current instance count for EC2, RDS, or DynamoDB."""
-    validate_service(service_name)  # Validate before proceeding
-    client = get_service_client(service_name)
-    
+class ResourceRecord:
+    """
+    Compact view of an EC2 instance, RDS instance or DynamoDB table, keeping only the fields the bot uses.
+
+    region and account name the target the record was listed from (see utils/targets.py).
+    """
+    __slots__ = ("service", "id", "type", "state", "launch_time", "zone", "tags", "region", "account")
+
+    def __init__(self, service, id, type=None, state=None, launch_time=None, zone=None, tags=None,
+                 region=None, account=None):
+        self.service = service
+        self.id = id
+        self.type = type
+        self.state = state
+        self.launch_time = launch_time
+        self.zone = zone
+        self.tags = tags or {}
+        self.region = region
+        self.account = account
+
+    def __repr__(self):
+        return f"{self.id} ({self.type}, {self.state})" if self.type else self.id
+
+def _tags_to_dict(tags):
+    """Turn an AWS [{'Key': ..., 'Value': ...}] tag list into a dict."""
+    return {tag['Key']: tag['Value'] for tag in tags or ()}
+
+# Paginator operation and page size per service.
+RESOURCE_PAGINATORS = {
+    "ec2": ("describe_instances", 1000),
+    "rds": ("describe_db_instances", 100),
+    "dynamodb": ("list_tables", 100),
+}
+
+def _page_items(service_name, page):
+    """Return the raw resources on one describe/list page."""
     if service_name == "ec2":
-        response = client.describe_instances()
-        instances = [instance for reservation in response['Reservations'] for instance in reservation['Instances']]
-        return len(instances), instances
-    elif service_name == "rds":
-        response = client.describe_db_instances()
-        instances = response['DBInstances']
-        return len(instances), instances
-    elif service_name == "dynamodb":
-        response = client.list_tables()
-        tables = response['TableNames']
-        return len(tables), tables
-    else:
-        raise ValueError(f"Unsupported service for instance count: {service_name}")
+        return [instance for reservation in page['Reservations'] for instance in reservation['Instances']]
+    if service_name == "rds":
+        return page['DBInstances']
+    return page['TableNames']
 
-def update_instance_count(service_name, action, instance_identifier=None):
-    """Update the instance count by starting, stopping, or terminating instances."""
-    validate_service(service_name)  # Validate before proceeding
-    client = get_service_client(service_name)
-    
+def _to_record(service_name, item):
+    """Build a ResourceRecord from one raw resource on a describe/list page."""
     if service_name == "ec2":
-        if action == "start":
-            client.start_instances(InstanceIds=[instance_identifier])
-            return f"Started EC2 instance: {instance_identifier}"
-        elif action == "stop":
-            client.stop_instances(InstanceIds=[instance_identifier])
-            return f"Stopped EC2 instance: {instance_identifier}"
-        elif action == "terminate":
-            client.terminate_instances(InstanceIds=[instance_identifier])
-            return f"Terminated EC2 instance: {instance_identifier}"
-        else:
-            raise ValueError(f"Unsupported EC2 action: {action}")
-
-    elif service_name == "rds":
-        if action == "start":
-            client.start_db_instance(DBInstanceIdentifier=instance_identifier)
-            return f"Started RDS instance: {instance_identifier}"
-        elif action == "stop":
-            client.stop_db_instance(DBInstanceIdentifier=instance_identifier)
-            return f"Stopped RDS instance: {instance_identifier}"
-        elif action == "delete":
-            client.delete_db_instance(DBInstanceIdentifier=instance_identifier, SkipFinalSnapshot=True)
-            return f"Deleted RDS instance: {instance_identifier}"
-        else:
-            raise ValueError(f"Unsupported RDS action: {action}")
+        return ResourceRecord("ec2", item['InstanceId'], item.get('InstanceType'), item['State']['Name'],
+                              item.get('LaunchTime'), item.get('Placement', {}).get('AvailabilityZone'),
+                              _tags_to_dict(item.get('Tags')))
+    if service_name == "rds":
+        return ResourceRecord("rds", item['DBInstanceIdentifier'], item.get('DBInstanceClass'),
+                              item.get('DBInstanceStatus'), item.get('InstanceCreateTime'),
+                              item.get('AvailabilityZone'), _tags_to_dict(item.get('TagList')))
+    return ResourceRecord("dynamodb", item)
 
-    elif service_name == "dynamodb":
-        if action == "delete":
-            client.delete_table(TableName=instance_identifier)
-            return f"Deleted DynamoDB table: {instance_identifier}"
+def _iter_pages(service_name, filters=None, region=None, role_arn=None):
+    """Yield the raw resources of every page for a service, one page at a time."""
+    if service_name not in RESOURCE_PAGINATORS:
+        raise ValueError(f"Unsupported service for instance count: {service_name}")
+    operation, page_size = RESOURCE_PAGINATORS[service_name]
+    paginator = get_client(service_name, region, role_arn).get_paginator(operation)
+    kwargs = {"PaginationConfig": {"PageSize": page_size}}
+    if filters:
+        kwargs["Filters"] = filters
+    for page in paginator.paginate(**kwargs):
+        yield _page_items(service_name, page)
+
+def iter_resources(service_name, filters=None, region=None, role_arn=None):
+    """
+    Stream compact ResourceRecords for EC2 instances, RDS instances or DynamoDB tables.
+
+    Pages are requested lazily and each raw page is dropped once its records
+    have been yielded, so memory stays flat regardless of fleet size.
+    region and role_arn select another region or account (defaults: the configured ones).
+    """
+    validate_service(service_name)
+    for items in _iter_pages(service_name, filters, region, role_arn):
+        for item in items:
+            yield _to_record(service_name, item)
+
+# Describe queries: "key=value" selectors become server-side Filters where the
+# API supports them (QUERY_FILTERS) and client-side predicates otherwise, and
+# each raw resource is cut down to the requested fields as its page arrives.
+def _format_time(value):
+    return value.strftime("%Y-%m-%d %H:%M") if value else None
+
+QUERY_FIELDS = {
+    "ec2": {
+        "id": lambda item: item['InstanceId'],
+        "type": lambda item: item.get('InstanceType'),
+        "state": lambda item: item['State']['Name'],
+        "zone": lambda item: item.get('Placement', {}).get('AvailabilityZone'),
+        "launched": lambda item: _format_time(item.get('LaunchTime')),
+        "name": lambda item: _tags_to_dict(item.get('Tags')).get('Name'),
+        "ip": lambda item: item.get('PrivateIpAddress'),
+        "public_ip": lambda item: item.get('PublicIpAddress'),
+        "vpc": lambda item: item.get('VpcId'),
+        "subnet": lambda item: item.get('SubnetId'),
+        "image": lambda item: item.get('ImageId'),
+    },
+    "rds": {
+        "id": lambda item: item['DBInstanceIdentifier'],
+        "type": lambda item: item.get('DBInstanceClass'),
+        "state": lambda item: item.get('DBInstanceStatus'),
+        "zone": lambda item: item.get('AvailabilityZone'),
+        "launched": lambda item: _format_time(item.get('InstanceCreateTime')),
+        "engine": lambda item: item.get('Engine'),
+        "endpoint": lambda item: item.get('Endpoint', {}).get('Address'),
+        "storage": lambda item: item.get('AllocatedStorage'),
+    },
+    "dynamodb": {
+        "name": lambda item: item,
+    },
+}
+
+# Query keys each describe API can filter on server-side, mapped to its filter name.
+QUERY_FILTERS = {
+    "ec2": {"id": "instance-id", "type": "instance-type", "state": "instance-state-name",
+            "zone": "availability-zone", "ip": "private-ip-address", "public_ip": "ip-address",
+            "vpc": "vpc-id", "subnet": "subnet-id", "image": "image-id"},
+    "rds": {"id": "db-instance-id", "engine": "engine"},
+    "dynamodb": {},
+}
+
+DEFAULT_QUERY_FIELDS = {
+    "ec2": ["id", "type", "state", "zone", "launched", "name"],
+    "rds": ["id", "type", "state", "zone", "launched", "engine"],
+    "dynamodb": ["name"],
+}
+
+# Where each service keeps tags on a raw resource (EC2 tags are also filterable server-side).
+TAG_LISTS = {"ec2": "Tags", "rds": "TagList"}
+
+class ResourceQuery:
+    """
+    A parsed describe query.
+
+    - filters: server-side Filters for the describe call.
+    - predicates: (getter, values) pairs checked on each raw resource.
+    - fields: field names to keep; getters: the matching extractors.
+    - limit: stop paging after this many matches (None for all).
+    - region, account: the target to query (None for the defaults).
+    """
+    __slots__ = ("filters", "predicates", "fields", "getters", "limit", "region", "account")
+
+    def __init__(self):
+        self.filters = []
+        self.predicates = []
+        self.fields = []
+        self.getters = []
+        self.limit = None
+        self.region = None
+        self.account = None
+
+def _query_getter(service_name, field):
+    """Return the extractor for a field name, including 'tag:Key' where the service has tags."""
+    if field.startswith("tag:") and service_name in TAG_LISTS:
+        key, tag_list = field[len("tag:"):], TAG_LISTS[service_name]
+        return lambda item: _tags_to_dict(item.get(tag_list)).get(key)
+    getter = QUERY_FIELDS[service_name].get(field)
+    if getter is None:
+        raise ValueError(f"Unknown {service_name} field: {field} "
+                         f"(known: {', '.join(QUERY_FIELDS[service_name])}, tag:Key)")
+    return getter
+
+def parse_query(service_name, args):
+    """
+    Parse describe arguments such as `state=running type=m5.large tag:env=prod fields=id,type,ip limit=50`.
+
+    Comma-separated values match any of them. region= and account= pick the
+    target; everything else must be a field of the service.
+    """
+    query = ResourceQuery()
+    fields = DEFAULT_QUERY_FIELDS[service_name]
+    for arg in args:
+        if "=" not in arg:
+            raise ValueError(f"Expected key=value, got: {arg}")
+        key, value = arg.split("=", 1)
+        values = [part for part in value.split(",") if part]
+        if key == "fields":
+            if not values:
+                raise ValueError("fields= needs at least one field")
+            fields = values
+        elif key == "limit":
+            if not value.isdigit() or int(value) < 1:
+                raise ValueError(f"limit must be a positive number, got: {value}")
+            query.limit = int(value)
+        elif key == "region":
+            query.region = value
+        elif key == "account":
+            query.account = value
+        elif key in QUERY_FILTERS[service_name]:
+            query.filters.append({'Name': QUERY_FILTERS[service_name][key], 'Values': values})
+        elif key.startswith("tag:") and service_name == "ec2":
+            query.filters.append({'Name': key, 'Values': values})
         else:
-            raise ValueError(f"Unsupported DynamoDB action: {action}")
+            query.predicates.append((_query_getter(service_name, key), set(values)))
+    query.fields = fields
+    query.getters = [_query_getter(service_name, field) for field in fields]
+    return query
+
+def run_query(service_name, query, region=None, role_arn=None):
+    """
+    Run a ResourceQuery and return one tuple of field values per match (blocking).
+
+    Raw pages are dropped as soon as their matches are projected, and paging
+    stops once `limit` matches are found.
+    """
+    rows = []
+    for items in _iter_pages(service_name, query.filters, region, role_arn):
+        for item in items:
+            if all(str(getter(item)) in values for getter, values in query.predicates):
+                rows.append(tuple(getter(item) for getter in query.getters))
+                if query.limit is not None and len(rows) >= query.limit:
+                    return rows
+    return rows
+
+def count_resources(service_name, filters=None):
+    """Count EC2 instances, RDS instances or DynamoDB tables without building records."""
+    validate_service(service_name)
+    return sum(len(items) for items in _iter_pages(service_name, filters))
+
+# Bulk lifecycle operations: many instances per command, chunked for EC2 and
+# fanned out with bounded concurrency for RDS, which has no batch API.
+
+EC2_MAX_IDS_PER_CALL = 1000
+RDS_BULK_CONCURRENCY = aws_settings.get("rds_bulk_concurrency", 5)
+WAITER_TIMEOUT = aws_settings.get("waiter_timeout", 900)
+WAITER_POLL_INTERVAL = aws_settings.get("waiter_poll_interval", 15)
+
+EC2_BULK_ACTIONS = {
+    "start": ("start_instances", "instance_running"),
+    "stop": ("stop_instances", "instance_stopped"),
+    "terminate": ("terminate_instances", "instance_terminated"),
+}
+
+RDS_BULK_ACTIONS = {
+    "start": ("start_db_instance", "db_instance_available"),
+    "stop": ("stop_db_instance", None),  # RDS has no "stopped" waiter
+    "delete": ("delete_db_instance", "db_instance_deleted"),
+}
 
-    else:
-        raise ValueError(f"Unsupported service for instance management: {service_name}")
+def chunked(items, size):
+    """Split a list into consecutive lists of at most `size` items."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
 
-def log_action(action, service_name, details=None):
+async def _report(progress, done, total):
+    if progress is not None:
+        await progress(done, total)
+
+async def wait_until(client, waiter_name, timeout=WAITER_TIMEOUT, **kwargs):
+    """
+    Await a boto3 waiter's target state, checking every WAITER_POLL_INTERVAL seconds.
+
+    Each check is a single waiter attempt through run_aws_call, so no service
+    slot or AWS thread is held between checks. Returns False if the state is
+    not reached within `timeout` seconds; a terminal failure state raises WaiterError.
     """
-    Log an action performed with a service.
-    
+    key = service_key(client.meta.service_model.service_name, client.meta.region_name)
+    waiter = client.get_waiter(waiter_name)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await run_aws_call(key, waiter.wait, WaiterConfig={"MaxAttempts": 1}, **kwargs)
+            return True
+        except WaiterError as e:
+            if not e.kwargs.get("reason", "").startswith("Max attempts exceeded"):
+                raise
+        if time.monotonic() + WAITER_POLL_INTERVAL > deadline:
+            return False
+        await asyncio.sleep(WAITER_POLL_INTERVAL)
+
+async def _confirm(wait_errors, ids, client, waiter_name, **kwargs):
+    """Wait for ids whose action succeeded; record in wait_errors those whose target state was not confirmed."""
+    try:
+        if await wait_until(client, waiter_name, **kwargs):
+            return
+        error = f"action succeeded; target state not reached within {WAITER_TIMEOUT}s"
+    except WaiterError as e:
+        error = f"action succeeded; {e}"
+    wait_errors.update((resource_id, error) for resource_id in ids)
+
+async def bulk_ec2_action(action, instance_ids, progress=None, wait=False, region=None, role_arn=None):
+    """
+    Start, stop or terminate many EC2 instances, EC2_MAX_IDS_PER_CALL per API call.
+
     Parameters:
-    - action (str): The action performed (e.g., 'start', 'stop', 'terminate').
-    - service_name (str): The name of the AWS service (e.g., 'ec2', 'rds').
-    - details (str, optional): Additional information about the action (e.g., instance ID).
+    - action (str): 'start', 'stop' or 'terminate'.
+    - instance_ids (list): EC2 instance IDs.
+    - progress (coroutine function, optional): awaited as progress(done, total) after each step.
+    - wait (bool): Also wait, concurrently per chunk, for the instances to reach the target state.
+    - region, role_arn (str, optional): Region and account role the instances live in.
+
+    Returns (succeeded_ids, {failed_id: error message}, {id: wait error}); the last
+    holds succeeded instances whose target state could not be confirmed.
     """
-    if details:
-        log_message = f"Action: {action} on Service: {service_name}, Details: {details}"
-    else:
-        log_message = f"Action: {action} on Service: {service_name}"
+    if action not in EC2_BULK_ACTIONS:
+        raise ValueError(f"Unsupported EC2 action: {action}")
+    operation, waiter_name = EC2_BULK_ACTIONS[action]
+    client = get_client("ec2", region, role_arn)
+    total = len(instance_ids)
+    succeeded, failed, wait_errors = [], {}, {}
 
-    # Log to both console and file
-    logging.info(log_message)
-    print(log_message)
+    async def run_chunk(chunk):
+        try:
+            await call_aws(client, operation, InstanceIds=chunk)
+        except Exception as e:
+            failed.update((instance_id, str(e)) for instance_id in chunk)
+        else:
+            if wait:
+                await _confirm(wait_errors, chunk, client, waiter_name, InstanceIds=chunk)
+            succeeded.extend(chunk)
+        await _report(progress, len(succeeded) + len(failed), total)
+
+    await asyncio.gather(*(run_chunk(chunk) for chunk in chunked(list(instance_ids), EC2_MAX_IDS_PER_CALL)))
+    return succeeded, failed, wait_errors
+
+async def bulk_rds_action(action, db_instance_ids, progress=None, wait=False, concurrency=RDS_BULK_CONCURRENCY,
+                          region=None, role_arn=None):
+    """
+    Start, stop or delete many RDS instances, at most `concurrency` at a time.
+
+    Same parameters and return value as bulk_ec2_action, with 'delete' instead of 'terminate'.
+    """
+    if action not in RDS_BULK_ACTIONS:
+        raise ValueError(f"Unsupported RDS action: {action}")
+    operation, waiter_name = RDS_BULK_ACTIONS[action]
+    client = get_client("rds", region, role_arn)
+    total = len(db_instance_ids)
+    succeeded, failed, wait_errors = [], {}, {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(db_instance_id):
+        kwargs = {"DBInstanceIdentifier": db_instance_id}
+        if action == "delete":
+            kwargs["SkipFinalSnapshot"] = True
+        try:
+            async with semaphore:
+                await call_aws(client, operation, **kwargs)
+        except Exception as e:
+            failed[db_instance_id] = str(e)
+        else:
+            if wait and waiter_name:
+                await _confirm(wait_errors, [db_instance_id], client, waiter_name, DBInstanceIdentifier=db_instance_id)
+            succeeded.append(db_instance_id)
+        await _report(progress, len(succeeded) + len(failed), total)
 
+    await asyncio.gather(*(run_one(db_instance_id) for db_instance_id in db_instance_ids))
+    return succeeded, failed, wait_errors
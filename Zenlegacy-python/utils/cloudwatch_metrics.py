@@ -0,0 +1,159 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from utils.aws_helpers import get_client, run_aws_call, service_key
+from utils.config import load_config
+from utils.offload import run_cpu
+from utils.targets import fan_out, group_by_target
+
+# Fleet-wide CloudWatch collection: one GetMetricData query per instance,
+# METRIC_QUERIES_PER_CALL queries per request, results laid out as a
+# (instances, periods) NumPy matrix with NaN where there is no datapoint.
+METRIC_QUERIES_PER_CALL = 500
+
+thresholds = load_config("thresholds")
+
+METRIC_PERIOD = thresholds.get("metric_period", 300)
+METRIC_LOOKBACK_MINUTES = thresholds.get("metric_lookback_minutes", 180)
+METRIC_Z_WINDOW = thresholds.get("metric_z_window", 12)
+METRIC_Z_SCORE = thresholds.get("metric_z_score", 3.0)
+METRIC_RATE_OF_CHANGE = thresholds.get("metric_rate_of_change", 30)
+
+def _metric_window(lookback_minutes, period):
+    """Return (start, end) aligned to the period, ending at the last complete period."""
+    now = datetime.now(timezone.utc)
+    end = datetime.fromtimestamp(int(now.timestamp()) // period * period, timezone.utc)
+    return end - timedelta(minutes=lookback_minutes), end
+
+def _build_queries(instance_ids, offset, metric_name, stat, period):
+    return [{
+        'Id': f"m{offset + i}",
+        'MetricStat': {
+            'Metric': {
+                'Namespace': 'AWS/EC2',
+                'MetricName': metric_name,
+                'Dimensions': [{'Name': 'InstanceId', 'Value': instance_id}],
+            },
+            'Period': period,
+            'Stat': stat,
+        },
+        'ReturnData': True,
+    } for i, instance_id in enumerate(instance_ids)]
+
+def _fetch_chunk(queries, start, end, matrix, period, region=None, role_arn=None):
+    """Run one GetMetricData request (all pages) and write its datapoints into the matrix (blocking)."""
+    paginator = get_client("cloudwatch", region, role_arn).get_paginator("get_metric_data")
+    for page in paginator.paginate(MetricDataQueries=queries, StartTime=start, EndTime=end,
+                                   ScanBy='TimestampAscending'):
+        for result in page['MetricDataResults']:
+            row = int(result['Id'][1:])
+            for timestamp, value in zip(result['Timestamps'], result['Values']):
+                column = int((timestamp - start).total_seconds()) // period
+                if 0 <= column < matrix.shape[1]:
+                    matrix[row, column] = value
+
+async def fetch_fleet_metric(instance_ids, metric_name="CPUUtilization", stat="Average",
+                             lookback_minutes=METRIC_LOOKBACK_MINUTES, period=METRIC_PERIOD, region=None, role_arn=None):
+    """
+    Fetch one EC2 metric for every instance with as few GetMetricData calls as possible.
+
+    The instances must all live in one region and account (region, role_arn).
+    Returns (start, matrix): matrix has one row per instance id, in order, and
+    one column per period from start; missing datapoints are NaN.
+    """
+    start, end = _metric_window(lookback_minutes, period)
+    periods = int((end - start).total_seconds()) // period
+    matrix = np.full((len(instance_ids), periods), np.nan)
+
+    requests = []
+    for offset in range(0, len(instance_ids), METRIC_QUERIES_PER_CALL):
+        chunk = instance_ids[offset:offset + METRIC_QUERIES_PER_CALL]
+        queries = _build_queries(chunk, offset, metric_name, stat, period)
+        requests.append(run_aws_call(service_key("cloudwatch", region), _fetch_chunk, queries, start, end, matrix,
+                                     period, region, role_arn))
+    await asyncio.gather(*requests)
+    return start, matrix
+
+def score_metric_matrix(matrix, threshold, window=METRIC_Z_WINDOW, z_threshold=METRIC_Z_SCORE,
+                        rate_threshold=METRIC_RATE_OF_CHANGE):
+    """
+    Score the latest datapoint of every row at once.
+
+    Returns a dict of per-row arrays: 'latest', 'z_score' (against the
+    previous `window` datapoints), 'change' (since the previous period) and
+    boolean 'over_threshold', 'spike', 'jump' and 'alert'.
+    """
+    rows, periods = matrix.shape
+    valid = ~np.isnan(matrix)
+    has_data = valid.any(axis=1)
+    last = periods - 1 - np.argmax(valid[:, ::-1], axis=1)
+    latest = np.where(has_data, matrix[np.arange(rows), last], np.nan)
+
+    # Gather the `window` periods before each row's latest datapoint.
+    offsets = last[:, None] - np.arange(window, 0, -1)[None, :]
+    history = np.where(offsets >= 0, matrix[np.arange(rows)[:, None], np.clip(offsets, 0, None)], np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        with_history = (~np.isnan(history)).sum(axis=1) >= 2
+        baseline = np.nanmean(np.where(with_history[:, None], history, 0), axis=1)
+        deviation = np.nanstd(np.where(with_history[:, None], history, 0), axis=1)
+        # Floor the deviation at one unit so a perfectly flat baseline does not flag noise.
+        z_score = np.where(with_history, (latest - baseline) / np.maximum(deviation, 1.0), np.nan)
+
+        previous = np.where(last > 0, matrix[np.arange(rows), np.maximum(last - 1, 0)], np.nan)
+        change = latest - previous
+
+        over_threshold = latest > threshold
+        spike = z_score > z_threshold
+        jump = change > rate_threshold
+    return {
+        "latest": latest,
+        "z_score": z_score,
+        "change": change,
+        "over_threshold": over_threshold,
+        "spike": spike,
+        "jump": jump,
+        "alert": over_threshold | spike | jump,
+    }
+
+async def collect_cpu_alerts(instance_ids, region=None, role_arn=None):
+    """Fetch CPU for the whole fleet and describe every instance that needs attention."""
+    if not instance_ids:
+        return []
+    threshold = thresholds.get("scaling_threshold", 80)
+    start, matrix = await fetch_fleet_metric(instance_ids, region=region, role_arn=role_arn)
+    scores = await run_cpu(score_metric_matrix, matrix, threshold)
+
+    alerts = []
+    for row in np.flatnonzero(scores["alert"]):
+        reasons = []
+        if scores["over_threshold"][row]:
+            reasons.append(f"above {threshold}%")
+        if scores["spike"][row]:
+            reasons.append(f"z={scores['z_score'][row]:.1f}")
+        if scores["jump"][row]:
+            reasons.append(f"+{scores['change'][row]:.0f} pts in {METRIC_PERIOD // 60} min")
+        alerts.append(f"High CPU Utilization on {instance_ids[row]}: {scores['latest'][row]:.1f}% "
+                      f"({', '.join(reasons)})")
+    return alerts
+
+async def collect_fleet_cpu_alerts(records):
+    """
+    Check CPU for EC2 ResourceRecords from any number of targets, all targets in parallel.
+
+    With more than one target, each alert is prefixed with its account and region.
+    """
+    groups = group_by_target(records)
+
+    async def collect(target):
+        return await collect_cpu_alerts([record.id for record in groups[target]], target.region, target.role_arn)
+
+    results, errors = await fan_out(collect, list(groups))
+    alerts = []
+    for target, target_alerts in results.items():
+        prefix = f"[{target.account}/{target.region}] " if len(groups) > 1 else ""
+        alerts.extend(prefix + alert for alert in target_alerts)
+    for target, error in errors.items():
+        alerts.append(f"Could not read CloudWatch metrics in {target.account}/{target.region}: {error}")
+    return alerts
@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+from discord.ext import commands
+
+from utils.config import load_config
+from utils.metrics import command_cache_hits
+
+# Single-flight for read-only commands: identical invocations (same command and
+# arguments) arriving while one is running wait for it and receive a replay of
+# what it sent, and a finished result is replayed for COMMAND_CACHE_TTL seconds.
+# A command opts in with extras={"read_only": True}, or a function of its
+# argument words for commands that only read for some actions. A handler that
+# reports an error as a normal reply sets ctx.cacheable = False, so the error
+# is neither fanned out nor replayed.
+bot_cred = load_config("bot_config")
+
+COMMAND_CACHE_TTL = bot_cred.get("command_cache_ttl", 30)
+COMMAND_CACHE_SIZE = 256
+
+class RecordedMessage:
+    """A sent message whose edits are also applied to its recording, so replays show the final state."""
+
+    def __init__(self, message, entry):
+        self._message = message
+        self._entry = entry
+
+    async def edit(self, **kwargs):
+        self._entry.update(kwargs)
+        return await self._message.edit(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._message, name)
+
+class SharedContext(commands.Context):
+    """Context that records every message it sends while `recording` is a list."""
+
+    recording = None
+    cacheable = True
+
+    async def send(self, content=None, **kwargs):
+        message = await super().send(content, **kwargs)
+        if self.recording is None:
+            return message
+        entry = dict(kwargs, content=content)
+        self.recording.append(entry)
+        return RecordedMessage(message, entry)
+
+def cache_key(ctx):
+    """(command, argument words) for a read-only invocation, or None if the command must always run."""
+    if ctx.command is None:
+        return None
+    read_only = ctx.command.extras.get("read_only")
+    words = tuple(ctx.message.content[ctx.view.index:].split())
+    if callable(read_only):
+        read_only = read_only(words)
+    return (ctx.command.qualified_name, words) if read_only else None
+
+async def replay(ctx, recording):
+    """Send a recorded result to another caller; paginated views get their own page position."""
+    for entry in recording:
+        kwargs = dict(entry)
+        view = kwargs.get("view")
+        if view is not None and hasattr(view, "clone"):
+            view = kwargs["view"] = view.clone()
+        message = await ctx.send(**kwargs)
+        if view is not None:
+            view.message = message
+
+class CommandCache:
+    """In-flight and recently finished read-only command results, keyed by cache_key()."""
+
+    def __init__(self, ttl=COMMAND_CACHE_TTL, max_size=COMMAND_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._inflight = {}
+        self._results = {}
+
+    def _store(self, key, recording):
+        now = time.monotonic()
+        for stale in [key for key, (expires, _) in self._results.items() if expires <= now]:
+            del self._results[stale]
+        if len(self._results) >= self.max_size:
+            del self._results[min(self._results, key=lambda key: self._results[key][0])]
+        self._results[key] = (now + self.ttl, recording)
+
+    async def run(self, ctx, key, invoke, authorize):
+        """
+        Run `invoke(ctx)` for the first caller with a given key; replay its output to the others.
+
+        Followers are first checked with `authorize(ctx)`, which must dispatch
+        the error itself and return False if they may not run the command.
+        A failed run, or one that set ctx.cacheable = False, is not shared:
+        waiting callers then run it themselves.
+        """
+        name = key[0]
+        cached = self._results.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            if await authorize(ctx):
+                command_cache_hits.inc(name, "fresh")
+                await replay(ctx, cached[1])
+            return
+
+        future = self._inflight.get(key)
+        if future is not None:
+            if not await authorize(ctx):
+                return
+            recording = await asyncio.shield(future)
+            if recording is not None:
+                command_cache_hits.inc(name, "coalesced")
+                await replay(ctx, recording)
+                return
+            command_cache_hits.inc(name, "miss")
+            await invoke(ctx)
+            return
+
+        command_cache_hits.inc(name, "miss")
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        ctx.recording = []
+        succeeded = False
+        try:
+            await invoke(ctx)
+            succeeded = not ctx.command_failed and ctx.cacheable
+        finally:
+            del self._inflight[key]
+            recording = ctx.recording if succeeded else None
+            ctx.recording = None
+            if recording is not None and self.ttl > 0:
+                self._store(key, recording)
+            future.set_result(recording)
+
+command_cache = CommandCache()
@@ -0,0 +1,23 @@
+import json
+import os
+
+CONFIG_DIR = "config"
+
+# Every module reads its settings through here, so each config file is parsed
+# once per process no matter how many modules (or reloaded cogs) ask for it.
+_configs = {}
+
+def load_config(name):
+    """Return the parsed contents of config/<name>.json, read on first use."""
+    config = _configs.get(name)
+    if config is None:
+        with open(os.path.join(CONFIG_DIR, f"{name}.json"), "r") as f:
+            config = _configs[name] = json.load(f)
+    return config
+
+def reload_config(name=None):
+    """Forget cached config so it is read again on next use (all files if name is None)."""
+    if name is None:
+        _configs.clear()
+    else:
+        _configs.pop(name, None)
@@ -0,0 +1,241 @@
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from utils.aws_helpers import get_client, aws_settings
+from utils.config import load_config
+
+# Daily cost history, one row per (service, usage type) and one column per day.
+# The matrix lives in a .npy file that is memory-mapped on read; the row keys and
+# the first date live next to it in a small JSON index.
+COST_HISTORY_DIR = "data/cost_history"
+COST_HISTORY_INDEX = os.path.join(COST_HISTORY_DIR, "index.json")
+COST_HISTORY_MATRIX = os.path.join(COST_HISTORY_DIR, "costs.npy")
+COST_HISTORY_DAYS = aws_settings.get("cost_history_days", 180)
+
+# Cost Explorer keeps adjusting the most recent days, so they are fetched again.
+RESTATEMENT_DAYS = 2
+DATE_FORMAT = '%Y-%m-%d'
+
+thresholds = load_config("thresholds")
+
+_history_lock = threading.Lock()
+
+def load_cost_history():
+    """
+    Load the stored cost history, or None if nothing has been stored yet.
+
+    Returns a dict with 'start' (date of the first column), 'keys' (list of
+    [service, usage_type] pairs, one per row), 'currency' and 'costs'
+    (read-only memory-mapped float32 array of shape (len(keys), days)).
+    """
+    if not os.path.exists(COST_HISTORY_INDEX) or not os.path.exists(COST_HISTORY_MATRIX):
+        return None
+    with open(COST_HISTORY_INDEX, "r") as f:
+        index = json.load(f)
+    return {
+        "start": datetime.strptime(index["start"], DATE_FORMAT).date(),
+        "keys": index["keys"],
+        "currency": index["currency"],
+        "costs": np.load(COST_HISTORY_MATRIX, mmap_mode="r"),
+    }
+
+def _save_cost_history(start, keys, currency, costs):
+    """Write the history atomically so readers never see a half-written matrix."""
+    os.makedirs(COST_HISTORY_DIR, exist_ok=True)
+    # Temporary files of its own, so concurrent writers never share one.
+    matrix_fd, tmp_matrix = tempfile.mkstemp(dir=COST_HISTORY_DIR, suffix=".tmp.npy")
+    index_fd, tmp_index = tempfile.mkstemp(dir=COST_HISTORY_DIR, suffix=".tmp")
+    with os.fdopen(matrix_fd, "wb") as f:
+        np.save(f, costs)
+    with os.fdopen(index_fd, "w") as f:
+        json.dump({"start": start.strftime(DATE_FORMAT), "keys": keys, "currency": currency}, f)
+    os.replace(tmp_matrix, COST_HISTORY_MATRIX)
+    os.replace(tmp_index, COST_HISTORY_INDEX)
+
+def fetch_daily_usage_costs(start_date, end_date):
+    """
+    Fetch DAILY cost per service and usage type for [start_date, end_date).
+
+    Returns ({(service, usage_type): {date: amount}}, currency).
+    """
+    client = get_client("ce")
+    request = {
+        'TimePeriod': {'Start': start_date.strftime(DATE_FORMAT), 'End': end_date.strftime(DATE_FORMAT)},
+        'Granularity': 'DAILY',
+        'Metrics': ['UnblendedCost'],
+        'GroupBy': [{'Type': 'DIMENSION', 'Key': 'SERVICE'}, {'Type': 'DIMENSION', 'Key': 'USAGE_TYPE'}],
+    }
+
+    series = {}
+    currency = "USD"
+    while True:
+        response = client.get_cost_and_usage(**request)
+        for result in response.get('ResultsByTime', []):
+            day = datetime.strptime(result['TimePeriod']['Start'], DATE_FORMAT).date()
+            for group in result.get('Groups', []):
+                cost = group['Metrics']['UnblendedCost']
+                currency = cost['Unit']
+                series.setdefault(tuple(group['Keys']), {})[day] = float(cost['Amount'])
+
+        token = response.get('NextPageToken')
+        if not token:
+            return series, currency
+        request['NextPageToken'] = token
+
+def update_cost_history(history_days=COST_HISTORY_DAYS):
+    """
+    Bring the stored history up to yesterday, fetching only the days that are missing.
+
+    Returns the refreshed history (see load_cost_history). Once the history is
+    current for the day, no Cost Explorer request is made. Days older than
+    `history_days` are dropped, along with the rows left without any cost.
+    """
+    with _history_lock:
+        history = load_cost_history()
+        today = datetime.utcnow().date()
+
+        if history is None:
+            start = today - timedelta(days=history_days)
+            fetch_start = start
+            keys, costs = [], np.zeros((0, 0), dtype=np.float32)
+        else:
+            start, keys, costs = history["start"], history["keys"], history["costs"]
+            end = start + timedelta(days=costs.shape[1])
+            if end >= today:
+                return history
+            fetch_start = max(start, end - timedelta(days=RESTATEMENT_DAYS))
+
+        fetched, currency = fetch_daily_usage_costs(fetch_start, today)
+
+        row_of = {tuple(key): row for row, key in enumerate(keys)}
+        keys = [list(key) for key in keys]
+        for key in fetched:
+            if key not in row_of:
+                row_of[key] = len(keys)
+                keys.append(list(key))
+
+        days = (today - start).days
+        updated = np.zeros((len(keys), days), dtype=np.float32)
+        updated[:costs.shape[0], :costs.shape[1]] = costs
+        for key, amounts in fetched.items():
+            row = row_of[key]
+            for day, amount in amounts.items():
+                updated[row, (day - start).days] = amount
+
+        expired = (today - timedelta(days=history_days) - start).days
+        if expired > 0:
+            start += timedelta(days=expired)
+            updated = updated[:, expired:]
+            kept = updated.any(axis=1)
+            keys = [key for key, keep in zip(keys, kept) if keep]
+            updated = updated[kept]
+
+        _save_cost_history(start, keys, currency, updated)
+        return load_cost_history()
+
+def get_service_costs(history):
+    """Sum the usage-type rows of a history into one row per service."""
+    services, rows = np.unique([key[0] for key in history["keys"]], return_inverse=True)
+    totals = np.zeros((len(services), history["costs"].shape[1]), dtype=np.float64)
+    np.add.at(totals, rows, history["costs"])
+    return [str(service) for service in services], totals
+
+def rolling_z_scores(costs, window):
+    """
+    Score every day of every series against the mean and deviation of the preceding `window` days.
+
+    costs is a (series, days) array; the result has the same shape, with NaN
+    for the first `window` days, which have no baseline.
+    """
+    costs = np.asarray(costs, dtype=np.float64)
+    padded = np.pad(costs, ((0, 0), (1, 0)))
+    sums = np.cumsum(padded, axis=1)
+    squares = np.cumsum(padded ** 2, axis=1)
+
+    baseline = (sums[:, window:-1] - sums[:, :-window - 1]) / window
+    variance = (squares[:, window:-1] - squares[:, :-window - 1]) / window - baseline ** 2
+    deviation = np.sqrt(np.clip(variance, 0, None))
+
+    scores = np.full(costs.shape, np.nan)
+    # A flat baseline still flags a jump: fall back to 1% of the mean, or one cent.
+    floor = np.maximum(baseline * 0.01, 0.01)
+    scores[:, window:] = (costs[:, window:] - baseline) / np.maximum(deviation, floor)
+    return scores
+
+def find_cost_anomalies(days=7, window=None, z_threshold=None, min_cost=None):
+    """
+    Update the history and list per-service daily spend spikes in the last `days` days.
+
+    Returns a list of dicts (service, date, cost, baseline, z_score), largest z-score first.
+    """
+    return score_cost_anomalies(days, window, z_threshold, min_cost, update_cost_history())
+
+def score_cost_anomalies(days=7, window=None, z_threshold=None, min_cost=None, history=None):
+    """
+    The analysis half of find_cost_anomalies, on the stored history (read from disk if not given).
+
+    Makes no AWS request, so it can run in the process pool (utils/offload.py).
+    Raises ValueError if days is below 1.
+    """
+    if days < 1:
+        raise ValueError(f"days must be at least 1, got: {days}")
+    window = window or thresholds.get("cost_anomaly_window", 14)
+    z_threshold = z_threshold or thresholds.get("cost_anomaly_z_score", 3.0)
+    min_cost = thresholds.get("cost_anomaly_min_cost", 1.0) if min_cost is None else min_cost
+
+    history = history or load_cost_history()
+    if history is None:
+        return []
+    services, costs = get_service_costs(history)
+    if costs.shape[1] <= window:
+        return []
+
+    scores = rolling_z_scores(costs, window)[:, -days:]
+    recent = costs[:, -days:]
+    rows, cols = np.nonzero((scores > z_threshold) & (recent >= min_cost))
+
+    first_day = history["start"] + timedelta(days=costs.shape[1] - recent.shape[1])
+    anomalies = []
+    for row, col in zip(rows, cols):
+        day_index = costs.shape[1] - recent.shape[1] + col
+        anomalies.append({
+            "service": services[row],
+            "date": first_day + timedelta(days=int(col)),
+            "cost": float(recent[row, col]),
+            "baseline": float(costs[row, day_index - window:day_index].mean()),
+            "z_score": float(scores[row, col]),
+        })
+    return sorted(anomalies, key=lambda anomaly: anomaly["z_score"], reverse=True)
+
+def summarize_cost_trends(period_days=30):
+    """
+    Update the history and compare each service's spend in the last period with the one before.
+
+    Returns a list of (service, current, previous, percent_change) tuples, largest spend first.
+    percent_change is None when there was no spend in the previous period.
+    """
+    return compare_cost_trends(period_days, update_cost_history())
+
+def compare_cost_trends(period_days=30, history=None):
+    """
+    The analysis half of summarize_cost_trends, on the stored history (read from disk if not given).
+
+    Makes no AWS request, so it can run in the process pool (utils/offload.py).
+    """
+    history = history or load_cost_history()
+    if history is None:
+        return []
+    services, costs = get_service_costs(history)
+    current = costs[:, -period_days:].sum(axis=1)
+    previous = costs[:, -2 * period_days:-period_days].sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(previous > 0, (current - previous) / previous * 100, np.nan)
+
+    order = np.argsort(-current)
+    return [(services[i], float(current[i]), float(previous[i]), None if np.isnan(change[i]) else float(change[i]))
+            for i in order if current[i] > 0 or previous[i] > 0]
@@ -0,0 +1,171 @@
+import time
+
+import discord
+
+# Discord limits: 2000 characters per message, 4096 per embed description.
+MESSAGE_LIMIT = 2000
+EMBED_DESCRIPTION_LIMIT = 4096
+
+# Channels allow a burst of about 5 messages per 5 seconds. Results needing more
+# than INLINE_MESSAGES messages are shown as one embed with page buttons instead,
+# so a large result never queues behind the rate limit.
+INLINE_MESSAGES = 3
+PAGINATOR_TIMEOUT = 300
+
+# Minimum seconds between edits of a streaming message (edits share the channel rate limit).
+STREAM_EDIT_INTERVAL = 1.0
+
+def pack_chunks(blocks, limit=MESSAGE_LIMIT):
+    """
+    Lazily pack text blocks into chunks of at most `limit` characters.
+
+    Blocks are kept whole where possible; a single block longer than the limit
+    is split across chunks. Nothing is formatted beyond the chunk being built.
+    """
+    parts, size = [], 0
+    for block in blocks:
+        while len(block) > limit:
+            if parts:
+                yield "".join(parts)
+                parts, size = [], 0
+            yield block[:limit]
+            block = block[limit:]
+        if size + len(block) > limit:
+            yield "".join(parts)
+            parts, size = [], 0
+        parts.append(block)
+        size += len(block)
+    if parts:
+        yield "".join(parts)
+
+def as_lines(items):
+    """Turn any iterable into newline-terminated text blocks."""
+    return (f"{item}\n" for item in items)
+
+class LazyPages:
+    """Pages pulled from a chunk generator on demand and remembered for going back."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.pages = []
+        self.exhausted = False
+
+    def get(self, index):
+        """Return page `index`, formatting further pages only as far as needed, or None past the end."""
+        while len(self.pages) <= index and not self.exhausted:
+            try:
+                self.pages.append(next(self._chunks))
+            except StopIteration:
+                self.exhausted = True
+        return self.pages[index] if index < len(self.pages) else None
+
+class PaginatorView(discord.ui.View):
+    """Previous/next buttons flipping through LazyPages in a single embed."""
+
+    def __init__(self, title, pages, timeout=PAGINATOR_TIMEOUT):
+        super().__init__(timeout=timeout)
+        self.title = title
+        self.pages = pages
+        self.index = 0
+        self.message = None
+
+    def clone(self):
+        """A view on the same pages with its own position, for sending the same result again."""
+        return PaginatorView(self.title, self.pages, self.timeout)
+
+    def render(self):
+        embed = discord.Embed(title=self.title, description=self.pages.get(self.index), color=discord.Color.blue())
+        total = f" of {len(self.pages.pages)}" if self.pages.exhausted else ""
+        embed.set_footer(text=f"Page {self.index + 1}{total}")
+        self.previous_page.disabled = self.index == 0
+        self.next_page.disabled = self.pages.get(self.index + 1) is None
+        return embed
+
+    @discord.ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        self.index -= 1
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        self.index += 1
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    async def on_timeout(self):
+        if self.message is not None:
+            await self.message.edit(view=None)
+
+async def send_paginated(ctx, title, blocks, empty_message=None):
+    """
+    Send text blocks (any iterable, ideally a generator) within Discord's limits.
+
+    Short results are sent as up to INLINE_MESSAGES plain messages; anything
+    longer becomes one embed whose pages are formatted only when viewed.
+    """
+    chunks = pack_chunks(blocks, MESSAGE_LIMIT - len(title) - 2)
+    head = []
+    for chunk in chunks:
+        head.append(chunk)
+        if len(head) > INLINE_MESSAGES:
+            break
+    if not head:
+        if empty_message:
+            await ctx.send(empty_message)
+        return
+
+    if len(head) <= INLINE_MESSAGES:
+        await ctx.send(f"{title}\n{head[0]}")
+        for chunk in head[1:]:
+            await ctx.send(chunk)
+        return
+
+    # Too long to send inline: repack what was already formatted plus the rest for embeds.
+    def remaining_blocks():
+        yield from head
+        yield from chunks
+
+    view = PaginatorView(title, LazyPages(pack_chunks(remaining_blocks(), EMBED_DESCRIPTION_LIMIT)))
+    view.message = await ctx.send(embed=view.render(), view=view)
+
+def _split_at_limit(text, limit):
+    """Split text at the last newline or space before `limit`, or hard at the limit."""
+    cut = max(text.rfind("\n", 0, limit), text.rfind(" ", 0, limit))
+    if cut <= 0:
+        cut = limit
+    return text[:cut], text[cut:].lstrip(" ")
+
+async def send_streaming(ctx, prefix, pieces, edit_interval=STREAM_EDIT_INTERVAL):
+    """
+    Render an async stream of text pieces into Discord as it arrives.
+
+    The first piece is sent immediately; after that the same message is edited
+    at most once per `edit_interval` seconds. When the text outgrows the message
+    limit, the full part is finalised and the rest continues in a new message.
+    """
+    message, shown, text = None, "", prefix
+    last_edit = 0.0
+
+    async for piece in pieces:
+        text += piece
+        while len(text) > MESSAGE_LIMIT:
+            head, text = _split_at_limit(text, MESSAGE_LIMIT)
+            if message is None:
+                await ctx.send(head)
+            else:
+                await message.edit(content=head)
+            message, shown = None, ""
+
+        if not text.strip():
+            continue
+        now = time.monotonic()
+        if message is None:
+            message, shown, last_edit = await ctx.send(text), text, now
+        elif now - last_edit >= edit_interval and text != shown:
+            await message.edit(content=text)
+            shown, last_edit = text, now
+
+    if message is None:
+        if text.strip():
+            await ctx.send(text)
+    elif text != shown:
+        await message.edit(content=text)
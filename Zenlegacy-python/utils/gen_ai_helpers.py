@@ -1,22 +1,238 @@
 import openai
-import json
-with open("config/bot_config.json", "r") as f:
-    bot_cred = json.load(f)
-
-openai.api_key = bot_cred["openai_api_key"]
-
-def ask_gpt(prompt):
-    response = openai.Completion.create(
-        engine="gpt-4",
-        prompt=prompt,
-        max_tokens=150,
-        n=1,
-        stop=None,
-        temperature=0.5
-    )
-    message = response.choices[0].text.strip()
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from utils.discord_output import send_streaming
+from utils.config import load_config
+from utils.metrics import openai_latency, openai_errors
+
+bot_cred = load_config("bot_config")
+
+# Async LLM layer: completions are awaited instead of blocking the event loop,
+# at most OPENAI_MAX_CONCURRENCY at a time, with identical prompts served from
+# an LRU+TTL cache or coalesced onto the request already in flight.
+OPENAI_MODEL = bot_cred.get("openai_model", "gpt-4")
+OPENAI_BASE_URL = bot_cred.get("openai_base_url") or None  # e.g. a local stub server
+OPENAI_TIMEOUT = bot_cred.get("openai_timeout", 30)
+OPENAI_MAX_RETRIES = bot_cred.get("openai_max_retries", 3)
+OPENAI_MAX_CONCURRENCY = bot_cred.get("openai_max_concurrency", 4)
+OPENAI_CACHE_SIZE = bot_cred.get("openai_cache_size", 256)
+OPENAI_CACHE_TTL = bot_cred.get("openai_cache_ttl", 600)
+OPENAI_STREAM = bot_cred.get("openai_stream", True)
+OPENAI_STREAM_TIMEOUT = bot_cred.get("openai_stream_timeout", 120)  # seconds for a whole streamed answer
+
+# Errors worth retrying with exponential backoff
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                    openai.InternalServerError, asyncio.TimeoutError)
+
+class TTLCache:
+    """Least-recently-used cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if time.monotonic() > expires:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+_client = None
+_semaphore = None
+_cache = TTLCache(OPENAI_CACHE_SIZE, OPENAI_CACHE_TTL)
+_in_flight = {}
+_streams = {}
+
+def get_llm_client():
+    """Return the shared async OpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        # Retries are handled below so that backoff also covers our own timeout.
+        _client = openai.AsyncOpenAI(api_key=bot_cred["openai_api_key"], base_url=OPENAI_BASE_URL,
+                                     timeout=OPENAI_TIMEOUT, max_retries=0)
+    return _client
+
+def _cache_key(prompt, max_tokens, temperature):
+    """Prompts differing only in whitespace share a cache entry."""
+    return (" ".join(prompt.split()), OPENAI_MODEL, max_tokens, temperature)
+
+async def _create_completion(prompt, max_tokens, temperature, stream=False):
+    """Create a chat completion, retrying transient errors with exponential backoff."""
+    kind = "stream_open" if stream else "completion"
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(get_llm_client().chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                n=1,
+                temperature=temperature,
+                stream=stream
+            ), OPENAI_TIMEOUT)
+            openai_latency.observe(time.perf_counter() - started, kind)
+            return response
+        except Exception as e:
+            openai_latency.observe(time.perf_counter() - started, kind)
+            openai_errors.inc(kind)
+            if not isinstance(e, RETRYABLE_ERRORS) or attempt == OPENAI_MAX_RETRIES:
+                raise
+            await asyncio.sleep(2 ** attempt + random.random())
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+    return _semaphore
+
+async def _request_completion(key, prompt, max_tokens, temperature):
+    """Call the API under the concurrency limit and cache the answer."""
+    async with _get_semaphore():
+        response = await _create_completion(prompt, max_tokens, temperature)
+
+    message = (response.choices[0].message.content or "").strip()
+    _cache.set(key, message)
     return message
 
-def parse_command(user_input):
-    prompt = f"Convert this command into an actionable task: '{user_input}'"
-    return ask_gpt(prompt)
+def _finish_in_flight(key, task):
+    _in_flight.pop(key, None)
+    _streams.pop(key, None)
+    if not task.cancelled():
+        task.exception()  # mark as retrieved even if every caller has gone
+
+async def ask_gpt(prompt, max_tokens=150, temperature=0.5):
+    """Ask the model for a completion without blocking the event loop."""
+    key = _cache_key(prompt, max_tokens, temperature)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_request_completion(key, prompt, max_tokens, temperature))
+        _in_flight[key] = task
+        task.add_done_callback(lambda done: _finish_in_flight(key, done))
+    # Shielded so one caller giving up does not cancel the answer for the others.
+    return await asyncio.shield(task)
+
+class StreamFanout:
+    """The pieces of one streamed answer so far, replayed to every subscriber from the start."""
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def publish(self, piece):
+        self.parts.append(piece)
+        self._notify()
+
+    def finish(self, error=None):
+        self.done, self.error = True, error
+        self._notify()
+
+    async def subscribe(self):
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.parts):
+                yield self.parts[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+async def _request_stream(key, prompt, max_tokens, temperature, fanout):
+    """Stream one answer into the fanout under the concurrency limit, cache it and return the full text."""
+    started = time.perf_counter()
+    deadline = started + OPENAI_STREAM_TIMEOUT
+    stream = None
+    try:
+        async with _get_semaphore():
+            stream = (await _create_completion(prompt, max_tokens, temperature, stream=True)).__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), max(deadline - time.perf_counter(), 0))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"OpenAI stream timed out after {OPENAI_STREAM_TIMEOUT} seconds")
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if not fanout.parts:
+                        openai_latency.observe(time.perf_counter() - started, "first_token")
+                    fanout.publish(delta)
+    except Exception as e:
+        if stream is not None:
+            openai_errors.inc("stream")  # failures to open are counted by _create_completion
+        fanout.finish(e)
+        raise
+    openai_latency.observe(time.perf_counter() - started, "stream")
+    message = "".join(fanout.parts).strip()
+    _cache.set(key, message)
+    fanout.finish()
+    return message
+
+async def stream_gpt(prompt, max_tokens=150, temperature=0.5):
+    """
+    Yield the completion text piece by piece as the model produces it.
+
+    Identical prompts share one streamed request: a later caller gets the
+    pieces so far, then follows along. The request runs in its own task, so a
+    slow reader (e.g. rate-limited Discord edits) never holds a concurrency
+    slot. Cached answers, and prompts already being answered by ask_gpt, are
+    yielded whole. Streamed answers are cached once complete.
+    """
+    key = _cache_key(prompt, max_tokens, temperature)
+    cached = _cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    fanout = _streams.get(key)
+    if fanout is None:
+        task = _in_flight.get(key)
+        if task is not None:
+            yield await asyncio.shield(task)
+            return
+        fanout = _streams[key] = StreamFanout()
+        task = asyncio.ensure_future(_request_stream(key, prompt, max_tokens, temperature, fanout))
+        _in_flight[key] = task
+        task.add_done_callback(lambda done: _finish_in_flight(key, done))
+    async for piece in fanout.subscribe():
+        yield piece
+
+async def _answer_whole(prompt):
+    yield await ask_gpt(prompt)
+
+async def reply_with_gpt(ctx, prefix, prompt):
+    """Answer a prompt in the channel, streaming tokens into the message when openai_stream is on."""
+    pieces = stream_gpt(prompt) if OPENAI_STREAM else _answer_whole(prompt)
+    await send_streaming(ctx, prefix, pieces)
+
+def parse_command_prompt(user_input):
+    return f"Convert this command into an actionable task: '{user_input}'"
+
+async def parse_command(user_input):
+    return await ask_gpt(parse_command_prompt(user_input))
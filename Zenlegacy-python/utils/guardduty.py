@@ -0,0 +1,134 @@
+import asyncio
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from utils.aws_helpers import get_client, run_aws_call, service_key, chunked, aws_settings
+from utils.offload import run_cpu
+from utils.targets import fan_out, get_targets, get_target
+
+# GuardDuty ingestion: findings from every detector in every target account and
+# region are merged into a local store, and a per-detector UpdatedAt high-water
+# mark means each run only lists findings that are new or changed since the last one.
+# The mark is inclusive, so findings updated at that exact millisecond are
+# listed again; they only count as changed if their UpdatedAt differs from the
+# stored copy.
+GUARDDUTY_STORE_DIR = "data/guardduty"
+GUARDDUTY_STORE = os.path.join(GUARDDUTY_STORE_DIR, "findings.json")
+GUARDDUTY_REGIONS = aws_settings.get("guardduty_regions", [])  # empty: every target region
+GUARDDUTY_LOOKBACK_DAYS = aws_settings.get("guardduty_lookback_days", 30)
+GET_FINDINGS_MAX_IDS = 50
+
+_ingest_lock = None
+
+def _updated_at_ms(finding):
+    """Return a finding's UpdatedAt as epoch milliseconds, the unit list_findings filters on."""
+    updated = datetime.fromisoformat(finding['UpdatedAt'].replace('Z', '+00:00'))
+    return int(updated.timestamp() * 1000)
+
+def load_guardduty_store():
+    """Load {'cursors': {region/detector: ms}, 'findings': {id: finding}} from disk."""
+    if not os.path.exists(GUARDDUTY_STORE):
+        return {"cursors": {}, "findings": {}}
+    with open(GUARDDUTY_STORE, "r") as f:
+        return json.load(f)
+
+def save_guardduty_store(store):
+    """Write the store atomically."""
+    os.makedirs(GUARDDUTY_STORE_DIR, exist_ok=True)
+    # A temporary file of its own, so concurrent writers never share one.
+    fd, tmp_path = tempfile.mkstemp(dir=GUARDDUTY_STORE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(store, f, default=str)
+    os.replace(tmp_path, GUARDDUTY_STORE)
+
+def list_detector_ids(region, role_arn=None):
+    """List every GuardDuty detector in a region (blocking)."""
+    paginator = get_client("guardduty", region, role_arn).get_paginator("list_detectors")
+    return [detector_id for page in paginator.paginate() for detector_id in page['DetectorIds']]
+
+def list_finding_ids(region, detector_id, updated_since_ms, role_arn=None):
+    """List the IDs of findings updated at or after updated_since_ms, across all pages (blocking)."""
+    paginator = get_client("guardduty", region, role_arn).get_paginator("list_findings")
+    criteria = {'Criterion': {'updatedAt': {'Gte': updated_since_ms}}}
+    return [finding_id
+            for page in paginator.paginate(DetectorId=detector_id, FindingCriteria=criteria,
+                                           PaginationConfig={"PageSize": 50})
+            for finding_id in page['FindingIds']]
+
+async def _ingest_detector(target, detector_id, store, lookback_ms):
+    """
+    Fetch a detector's findings updated since its cursor, GET_FINDINGS_MAX_IDS per request, concurrently.
+
+    Returns the ones that are new or changed compared with the store.
+    """
+    cursor_key = f"{target.account}/{target.region}/{detector_id}"
+    since_ms = store["cursors"].get(cursor_key, lookback_ms)
+    key = service_key("guardduty", target.region)
+    finding_ids = await run_aws_call(key, list_finding_ids, target.region, detector_id, since_ms, target.role_arn)
+    if not finding_ids:
+        return []
+
+    client = get_client("guardduty", target.region, target.role_arn)
+    responses = await asyncio.gather(*(
+        run_aws_call(key, client.get_findings, DetectorId=detector_id, FindingIds=chunk)
+        for chunk in chunked(finding_ids, GET_FINDINGS_MAX_IDS)))
+    findings = [finding for response in responses for finding in response['Findings']]
+
+    changed = []
+    for finding in findings:
+        previous = store["findings"].get(finding['Id'])
+        if previous is None or previous['UpdatedAt'] != finding['UpdatedAt']:
+            changed.append(finding)
+        store["findings"][finding['Id']] = finding
+    if findings:
+        store["cursors"][cursor_key] = max(since_ms, max(_updated_at_ms(finding) for finding in findings))
+    return changed
+
+async def _ingest_target(target, store, lookback_ms):
+    detector_ids = await run_aws_call(service_key("guardduty", target.region), list_detector_ids,
+                                      target.region, target.role_arn)
+    results = await asyncio.gather(*(_ingest_detector(target, detector_id, store, lookback_ms)
+                                     for detector_id in detector_ids))
+    return [finding for findings in results for finding in findings]
+
+async def ingest_guardduty_findings(regions=None):
+    """
+    Pull new and updated findings from every detector in every target into the local store.
+
+    All targets are queried in parallel; a target that fails is reported and
+    skipped, and picks up where it left off on the next run. regions (or the
+    guardduty_regions setting) replaces the target regions for every account.
+
+    Returns (changed, active): the findings that are new or updated since the last run, and every
+    unarchived finding updated within the lookback window, most severe first.
+    """
+    global _ingest_lock
+    if _ingest_lock is None:
+        _ingest_lock = asyncio.Lock()
+
+    # Concurrent callers queue up here; the second one only sees what changed in between.
+    async with _ingest_lock:
+        store = await run_cpu(load_guardduty_store)
+        lookback = datetime.now(timezone.utc) - timedelta(days=GUARDDUTY_LOOKBACK_DAYS)
+        lookback_ms = int(lookback.timestamp() * 1000)
+
+        targets = await get_targets()
+        regions = regions or GUARDDUTY_REGIONS
+        if regions:
+            accounts = dict.fromkeys(target.account for target in targets)
+            targets = [get_target(account, region) for account in accounts for region in regions]
+        results, errors = await fan_out(lambda target: _ingest_target(target, store, lookback_ms), targets)
+        for target, error in errors.items():
+            print(f"GuardDuty ingestion failed for {target.account}/{target.region}: {error}")
+        changed = [finding for findings in results.values() for finding in findings]
+
+        store["findings"] = {finding_id: finding for finding_id, finding in store["findings"].items()
+                             if _updated_at_ms(finding) >= lookback_ms}
+        await run_cpu(save_guardduty_store, store)
+
+    active = [finding for finding in store["findings"].values()
+              if not finding.get('Service', {}).get('Archived')]
+    active.sort(key=lambda finding: finding['Severity'], reverse=True)
+    return changed, active
@@ -0,0 +1,232 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from utils.aws_helpers import iter_resources, run_aws_call, service_key, aws_settings, aws_priority, PRIORITY_BACKGROUND, chunked
+from utils.targets import fan_out, default_target, get_target
+
+INVENTORY_SERVICES = ("ec2", "rds", "dynamodb")
+INVENTORY_TTL = aws_settings.get("inventory_ttl", 60)
+INVENTORY_REFRESH_INTERVAL = aws_settings.get("inventory_refresh_interval", 60)
+
+# Describe filter selecting resources by id, for targeted refreshes.
+ID_FILTERS = {"ec2": "instance-id", "rds": "db-instance-id"}
+# Most values one describe filter accepts (EC2 rejects more than 200 with FilterLimitExceeded).
+ID_FILTER_LIMITS = {"ec2": 200, "rds": 100}
+
+# Fields with a secondary index; tags are indexed by (key, value) pairs.
+INDEXED_FIELDS = ("type", "state", "zone", "region", "account")
+
+_NEVER_LAUNCHED = datetime.max.replace(tzinfo=timezone.utc)
+
+def _record_key(record):
+    """Records are keyed by (account, region, id): RDS and DynamoDB names repeat across regions."""
+    return (record.account, record.region, record.id)
+
+def _build_indexes(records):
+    """Build {field: {value: set(keys)}} indexes over a {key: record} mapping."""
+    indexes = {field: defaultdict(set) for field in INDEXED_FIELDS + ("tag",)}
+    for key, record in records.items():
+        for field in INDEXED_FIELDS:
+            indexes[field][getattr(record, field)].add(key)
+        for tag in record.tags.items():
+            indexes["tag"][tag].add(key)
+    return indexes
+
+class ResourceInventory:
+    """
+    In-memory inventory of EC2 instances, RDS instances and DynamoDB tables
+    across every target account and region (see utils/targets.py).
+
+    Each service snapshot is a (records, indexes, refreshed_at) tuple that is
+    rebuilt off the event loop and swapped in whole, so readers never see a
+    half-updated index.
+    """
+
+    def __init__(self, services=INVENTORY_SERVICES, ttl=INVENTORY_TTL):
+        self.services = services
+        self.ttl = ttl
+        self._snapshots = {}
+        self._refresh_task = None
+
+    def scan(self, service_name, target, filters=None):
+        """List one service in one target, stamping every record with the target (blocking)."""
+        records = []
+        for record in iter_resources(service_name, filters, region=target.region, role_arn=target.role_arn):
+            record.region, record.account = target.region, target.account
+            records.append(record)
+        return records
+
+    async def refresh(self, service_name):
+        """
+        Rescan one service in every target in parallel and replace its snapshot.
+
+        A target that fails keeps its previous records, so one unreachable
+        region does not empty the inventory; if every target fails, the first
+        error is raised.
+        """
+        async def scan_target(target):
+            return await run_aws_call(service_key(service_name, target.region), self.scan, service_name, target)
+
+        results, errors = await fan_out(scan_target)
+        if errors and not results:
+            raise next(iter(errors.values()))
+
+        previous, _, _ = self._snapshots.get(service_name, ({}, None, 0))
+        records = {}
+        for target, error in errors.items():
+            print(f"Inventory refresh failed for {service_name} in {target.account}/{target.region}: {error}")
+            records.update((key, record) for key, record in previous.items()
+                           if (record.account, record.region) == (target.account, target.region))
+        for target_records in results.values():
+            records.update((_record_key(record), record) for record in target_records)
+        self._snapshots[service_name] = (records, _build_indexes(records), time.monotonic())
+
+    def refresh_ids(self, service_name, ids, target=None):
+        """
+        Re-describe only the given EC2/RDS instances, e.g. right after the bot changed their state (blocking).
+
+        The IDs are described ID_FILTER_LIMITS[service_name] at a time.
+        """
+        if not ids:
+            return
+        target = target or default_target()
+        records, _, refreshed_at = self._snapshots.get(service_name, ({}, None, 0))
+        records = dict(records)
+        for record_id in ids:
+            records.pop((target.account, target.region, record_id), None)
+        for chunk in chunked(list(ids), ID_FILTER_LIMITS[service_name]):
+            for record in self.scan(service_name, target, [{'Name': ID_FILTERS[service_name], 'Values': chunk}]):
+                records[_record_key(record)] = record
+        self._snapshots[service_name] = (records, _build_indexes(records), refreshed_at)
+
+    def is_stale(self, service_name):
+        """Whether the service has never been loaded or is older than the TTL."""
+        snapshot = self._snapshots.get(service_name)
+        return snapshot is None or time.monotonic() - snapshot[2] > self.ttl
+
+    async def ensure_fresh(self, service_name):
+        """Refresh the service on the AWS thread pool if its snapshot is stale."""
+        if self.is_stale(service_name):
+            await self.refresh(service_name)
+
+    def query(self, service_name, type=None, state=None, zone=None, tag=None, region=None, account=None):
+        """
+        Return the records matching every given criterion, answered from the indexes.
+
+        tag is a (key, value) pair. With no criteria, every record of the service is returned.
+        """
+        records, indexes, _ = self._snapshots.get(service_name, ({}, None, 0))
+        if indexes is None:
+            return []
+
+        criteria = [("type", type), ("state", state), ("zone", zone), ("tag", tag),
+                    ("region", region), ("account", account)]
+        matches = None
+        for field, value in criteria:
+            if value is None:
+                continue
+            ids = indexes[field].get(value, set())
+            matches = ids if matches is None else matches & ids
+            if not matches:
+                return []
+        if matches is None:
+            return list(records.values())
+        return [records[key] for key in matches]
+
+    def count(self, service_name, **criteria):
+        """Count the records matching the criteria of query()."""
+        return len(self.query(service_name, **criteria))
+
+    async def resolve(self, service_name, selectors):
+        """
+        Turn command arguments into a list of resource IDs.
+
+        Plain arguments are IDs. 'type=...', 'state=...', 'zone=...', 'region=...',
+        'account=...' and 'tag:Key=Value' select resources from the inventory;
+        all selectors must match.
+        """
+        groups = await self.resolve_grouped(service_name, selectors)
+        return list(dict.fromkeys(record_id for ids in groups.values() for record_id in ids))
+
+    async def resolve_grouped(self, service_name, selectors):
+        """
+        Like resolve(), but return {Target: [ids]} so actions can be sent to the right account and region.
+
+        Plain IDs go to the target the inventory last saw them in, or the default target.
+        """
+        ids = [selector for selector in selectors if "=" not in selector]
+        criteria = {}
+        for selector in selectors:
+            if "=" not in selector:
+                continue
+            field, value = selector.split("=", 1)
+            if field.startswith("tag:"):
+                criteria["tag"] = (field[4:], value)
+            elif field in INDEXED_FIELDS:
+                criteria[field] = value
+            else:
+                raise ValueError(f"Unsupported selector: {selector}")
+
+        groups = {}
+        if ids:
+            records, _, _ = self._snapshots.get(service_name, ({}, None, 0))
+            seen_in = {}
+            for record in records.values():
+                seen_in.setdefault(record.id, record)
+            for record_id in ids:
+                record = seen_in.get(record_id)
+                target = get_target(record.account, record.region) if record else default_target()
+                groups.setdefault(target, []).append(record_id)
+        if criteria:
+            await self.ensure_fresh(service_name)
+            for record in self.query(service_name, **criteria):
+                groups.setdefault(get_target(record.account, record.region), []).append(record.id)
+        return {target: list(dict.fromkeys(target_ids)) for target, target_ids in groups.items()}
+
+    def start_background_refresh(self, interval=INVENTORY_REFRESH_INTERVAL):
+        """Start the periodic refresh task on the running event loop, once."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_loop(interval))
+
+    async def _refresh_loop(self, interval):
+        # Periodic rescans yield to interactive commands in the AWS scheduler.
+        aws_priority.set(PRIORITY_BACKGROUND)
+        while True:
+            for service_name in self.services:
+                try:
+                    await self.refresh(service_name)
+                except Exception as e:
+                    print(f"Inventory refresh failed for {service_name}: {e}")
+            await asyncio.sleep(interval)
+
+def select_victims(records, count, strategy="oldest"):
+    """
+    Pick `count` records to stop or terminate.
+
+    - "oldest": the longest-running instances first.
+    - "spread": one at a time from whichever availability zone currently has
+      the most instances (oldest first within a zone), keeping zones balanced.
+    """
+    by_age = sorted(records, key=lambda record: record.launch_time or _NEVER_LAUNCHED)
+    if strategy == "oldest":
+        return by_age[:count]
+    if strategy != "spread":
+        raise ValueError(f"Unsupported selection strategy: {strategy}")
+
+    zones = defaultdict(list)
+    for record in by_age:
+        zones[record.zone].append(record)
+    for zone_records in zones.values():
+        zone_records.reverse()  # oldest at the end, so pop() takes it
+
+    victims = []
+    while len(victims) < count and zones:
+        zone = max(zones, key=lambda name: len(zones[name]))
+        victims.append(zones[zone].pop())
+        if not zones[zone]:
+            del zones[zone]
+    return victims
+
+inventory = ResourceInventory()
@@ -1,16 +1,106 @@
 import os
+import json
+import glob
+import gzip
+import time
+import queue
+import atexit
+import shutil
+import threading
 from datetime import datetime
 
-LOG_FILE_PATH = "logs/action_logs.txt"
+LOG_FILE_PATH = "logs/action_logs.jsonl"
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_ROTATE_SECONDS = 24 * 60 * 60
+LOG_BACKUP_COUNT = 14
+LOG_BATCH_SIZE = 500
 
-def log_action(action_message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"[{timestamp}] {action_message}\n"
+# The hot path only enqueues a dict; a background thread serializes records
+# in batches, appends them to the JSONL file and rotates/compresses it.
+_queue = queue.SimpleQueue()
+_writer = None
+_writer_lock = threading.Lock()
 
-    # Ensure the logs directory exists
-    if not os.path.exists("logs"):
-        os.makedirs("logs")
+def log_action(action_message, **fields):
+    """
+    Record an action without blocking the caller.
 
-    # Append the log entry to the action log file
-    with open(LOG_FILE_PATH, "a") as log_file:
-        log_file.write(log_entry)
+    Extra keyword fields (e.g. user, command, service, resource_ids, duration_ms)
+    are stored alongside the message in the structured log record.
+    """
+    record = {"timestamp": datetime.now().isoformat(timespec="milliseconds"), "message": action_message}
+    record.update(fields)
+    _queue.put_nowait(record)
+    if _writer is None:
+        _start_writer()
+
+def flush_logs(timeout=5):
+    """Block until every record logged so far has been written."""
+    if _writer is None:
+        return
+    done = threading.Event()
+    _queue.put_nowait(done)
+    done.wait(timeout)
+
+def _start_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_loop, name="action-log-writer", daemon=True)
+            _writer.start()
+            atexit.register(flush_logs)
+
+def _next_batch():
+    """Wait for one record, then take whatever else is already queued, up to LOG_BATCH_SIZE."""
+    batch = [_queue.get()]
+    while len(batch) < LOG_BATCH_SIZE:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+def _rotate(log_file):
+    """Close the current file, compress it under a timestamped name and prune old archives."""
+    log_file.close()
+    archive = f"{LOG_FILE_PATH}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.gz"
+    with open(LOG_FILE_PATH, "rb") as source, gzip.open(archive, "wb") as target:
+        shutil.copyfileobj(source, target)
+    os.remove(LOG_FILE_PATH)
+
+    archives = sorted(glob.glob(f"{LOG_FILE_PATH}.*.gz"))
+    for old_archive in archives[:-LOG_BACKUP_COUNT]:
+        os.remove(old_archive)
+
+def _open_log():
+    os.makedirs(os.path.dirname(LOG_FILE_PATH), exist_ok=True)
+    return open(LOG_FILE_PATH, "a")
+
+def _write_loop():
+    # Any failure (a full disk, a rotation that fails after closing the file,
+    # an unserializable record) loses at most that batch: the file is reopened
+    # on the next one, so the thread keeps running.
+    log_file = None
+    opened_at = time.monotonic()
+
+    while True:
+        batch = _next_batch()
+        try:
+            if log_file is None or log_file.closed:
+                log_file = _open_log()
+                opened_at = time.monotonic()
+            lines = [json.dumps(record, default=str) + "\n" for record in batch if isinstance(record, dict)]
+            if lines:
+                log_file.write("".join(lines))
+                log_file.flush()
+            size = log_file.tell()
+            if size >= LOG_MAX_BYTES or (size and time.monotonic() - opened_at >= LOG_ROTATE_SECONDS):
+                _rotate(log_file)
+                log_file = _open_log()
+                opened_at = time.monotonic()
+        except Exception as e:
+            print(f"Failed to write action log: {e}")
+        finally:
+            for record in batch:
+                if isinstance(record, threading.Event):
+                    record.set()
@@ -0,0 +1,199 @@
+import asyncio
+import bisect
+import threading
+import time
+
+from utils.config import load_config
+
+bot_cred = load_config("bot_config")
+
+METRICS_HOST = bot_cred.get("metrics_host", "127.0.0.1")
+METRICS_PORT = bot_cred.get("metrics_port", 9108)
+LOOP_LAG_INTERVAL = 0.5
+
+# Latency buckets in seconds, shared by every histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Histogram:
+    """Prometheus-style cumulative histogram, one series per label tuple. Safe to observe from any thread."""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """Return {labels: (bucket_counts, sum, count)} with non-cumulative bucket counts."""
+        with self._lock:
+            return {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+
+    def quantile(self, q, *labels):
+        """Estimate a quantile from the buckets (upper bound of the bucket holding it)."""
+        series = self.snapshot().get(labels)
+        if not series or not series[2]:
+            return None
+        counts, _, count = series
+        rank, seen = q * count, 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+class Counter:
+    """Monotonic counter, one series per label tuple."""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._series)
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._series[labels] = value
+
+command_latency = Histogram("zen_command_latency_seconds", "Discord command latency", ("command",))
+command_errors = Counter("zen_command_errors_total", "Discord commands that raised", ("command",))
+aws_call_latency = Histogram("zen_aws_call_latency_seconds", "AWS API call latency", ("service", "operation"))
+aws_call_errors = Counter("zen_aws_call_errors_total", "AWS API calls that failed", ("service", "operation"))
+openai_latency = Histogram("zen_openai_latency_seconds", "OpenAI request latency", ("kind",))
+openai_errors = Counter("zen_openai_errors_total", "OpenAI requests that failed", ("kind",))
+aws_throttles = Counter("zen_aws_throttles_total", "AWS requests rejected with a throttling error",
+                        ("service", "operation"))
+aws_queue_depth = Gauge("zen_aws_queue_depth", "AWS calls waiting for a concurrency slot or a rate-limit token",
+                        ("stage", "queue", "priority"))
+aws_rate_limit = Gauge("zen_aws_rate_limit", "Current requests per second allowed per AWS operation", ("bucket",))
+command_cache_hits = Counter("zen_command_cache_total", "Read-only command invocations by outcome: "
+                             "miss (ran), coalesced (joined a running one), fresh (reused a recent result)",
+                             ("command", "outcome"))
+offload_latency = Histogram("zen_offload_latency_seconds", "CPU-bound jobs run in the process pool", ("job",))
+loop_lag = Histogram("zen_event_loop_lag_seconds", "Event loop scheduling delay", (),
+                     buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+loop_lag_last = Gauge("zen_event_loop_lag_last_seconds", "Most recent event loop delay", ())
+
+METRICS = [command_latency, command_errors, aws_call_latency, aws_call_errors, aws_throttles, aws_queue_depth,
+           aws_rate_limit, openai_latency, openai_errors, command_cache_hits, offload_latency,
+           loop_lag, loop_lag_last]
+
+# AWS instrumentation, attached to every client through botocore events
+
+def _before_aws_call(model, context, **kwargs):
+    # after-call-error does not carry the operation model, so remember it here
+    context["zen_call"] = (model.service_model.service_name, model.name, time.perf_counter())
+
+def _after_aws_call(http_response, context, **kwargs):
+    call = context.pop("zen_call", None)
+    if call is None:
+        return
+    service, operation, started = call
+    aws_call_latency.observe(time.perf_counter() - started, service, operation)
+    if http_response.status_code >= 400:
+        aws_call_errors.inc(service, operation)
+
+def _after_aws_call_error(context, **kwargs):
+    call = context.pop("zen_call", None)
+    if call is None:
+        return
+    service, operation, started = call
+    aws_call_latency.observe(time.perf_counter() - started, service, operation)
+    aws_call_errors.inc(service, operation)
+
+def instrument_client(client):
+    """Time every API call made through a boto3 client (retries included) and count failures."""
+    events = client.meta.events
+    events.register("before-call.*.*", _before_aws_call)
+    events.register("after-call.*.*", _after_aws_call)
+    events.register("after-call-error.*.*", _after_aws_call_error)
+    return client
+
+# Event loop lag
+
+async def _measure_loop_lag(interval):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        loop_lag.observe(lag)
+        loop_lag_last.set(lag)
+
+# Prometheus text endpoint
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def render_prometheus():
+    """Render every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        kind = "histogram" if isinstance(metric, Histogram) else "gauge" if isinstance(metric, Gauge) else "counter"
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {kind}")
+        for labels, value in metric.snapshot().items():
+            if kind != "histogram":
+                lines.append(f"{metric.name}{_format_labels(metric.label_names, labels)} {value}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(metric.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(metric.label_names, labels, 'le="%s"' % bound)
+                lines.append(f"{metric.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{metric.name}_sum{_format_labels(metric.label_names, labels)} {total}")
+            lines.append(f"{metric.name}_count{_format_labels(metric.label_names, labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+async def _handle_metrics_request(reader, writer):
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass  # skip headers
+        if request_line.split(b" ")[1:2] == [b"/metrics"]:
+            body, status = render_prometheus().encode(), "200 OK"
+        else:
+            body, status = b"Not found\n", "404 Not Found"
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+    finally:
+        writer.close()
+
+_started = False
+
+async def start_instrumentation(host=METRICS_HOST, port=METRICS_PORT):
+    """Start the loop-lag probe and the local /metrics endpoint, once per process."""
+    global _started
+    if _started:
+        return
+    _started = True
+    asyncio.get_running_loop().create_task(_measure_loop_lag(LOOP_LAG_INTERVAL))
+    if port:
+        await asyncio.start_server(_handle_metrics_request, host, port)
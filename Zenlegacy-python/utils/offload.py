@@ -0,0 +1,61 @@
+import asyncio
+import functools
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.config import load_config
+from utils.metrics import offload_latency
+
+# Offload tier: CPU-bound jobs (metric scoring, cost analysis, the GuardDuty
+# store's JSON) run in a process pool, so they use every core and never stall
+# the event loop. A job is a module-level function plus picklable arguments;
+# large inputs are better read from disk by the job itself than passed in.
+# Workers are spawned rather than forked so they never inherit the AWS thread
+# pool or open connections. process_workers: null for one per core, 0 to run
+# jobs inline.
+bot_cred = load_config("bot_config")
+
+PROCESS_WORKERS = bot_cred.get("process_workers")
+
+_process_pool = None
+
+def get_process_pool():
+    """Return the shared process pool, creating it on first use."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+    return _process_pool
+
+def shutdown_process_pool():
+    """Stop the worker processes (e.g. when the bot closes)."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+async def run_cpu(func, *args, **kwargs):
+    """
+    Run func(*args, **kwargs) in the process pool and return its result.
+
+    Parameters:
+    - func (callable): A module-level function, so that it can be pickled by name.
+    - args, kwargs: Picklable arguments; pickling happens off the event loop.
+    """
+    global _process_pool
+    started = time.perf_counter()
+    try:
+        if PROCESS_WORKERS == 0:
+            return func(*args, **kwargs)
+        pool = get_process_pool()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(func, *args, **kwargs))
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool for the next job.
+            if _process_pool is pool:
+                _process_pool = None
+            raise
+    finally:
+        offload_latency.observe(time.perf_counter() - started, func.__name__)
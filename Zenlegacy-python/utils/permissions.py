@@ -0,0 +1,118 @@
+import os
+import time
+
+from discord.ext import commands
+from discord.ext.commands.view import StringView
+
+from utils.config import load_config, reload_config, CONFIG_DIR
+
+# Role-based permissions from config/permissions.json: {role name: [command, ...]}.
+# An entry is a command name, or "command:action" for invocations whose first or
+# second argument is that action (e.g. "manage_service:bulk_terminate" covers
+# `!manage_service ec2 bulk_terminate ...`). The "user" role applies to every
+# member. Each entry gets a bit; each role compiles to a bitmask, and each
+# member's mask (the OR of their roles) is cached until Discord reports a member
+# or role change, so a check is a dict lookup and a bit test.
+#
+# The default is open: a command (or action) that appears under no role can be
+# run by every member, as every command could before permissions existed. Only
+# what is listed is restricted, so a new destructive command or action must be
+# added to permissions.json under the roles allowed to run it.
+PERMISSIONS_FILE = os.path.join(CONFIG_DIR, "permissions.json")
+PERMISSIONS_CHECK_INTERVAL = 5  # seconds between checks for an edited permissions.json
+ACTION_WORDS = 2  # leading arguments that can name an action
+EVERYONE_ROLE = "user"
+
+class PermissionDenied(commands.CheckFailure):
+    """Raised when a member has no role allowed to run a command."""
+
+def action_words(ctx, count=ACTION_WORDS):
+    """The first `count` arguments of the invocation, split and unquoted the way the command parser does it."""
+    view = StringView(ctx.view.buffer[ctx.view.index:])
+    words = []
+    while len(words) < count:
+        view.skip_ws()
+        if view.eof:
+            break
+        words.append(view.get_quoted_word())
+    return words
+
+class PermissionEngine:
+    def __init__(self):
+        self._bits = {}
+        self._role_masks = {}
+        self._everyone_mask = 0
+        self._members = {}
+        self._mtime = None
+        self._checked_at = float("-inf")
+
+    def compile(self, config):
+        """Assign a bit per entry and a mask per role, and forget every cached member."""
+        bits, role_masks = {}, {}
+        for role, entries in config.items():
+            mask = 0
+            for entry in entries:
+                mask |= 1 << bits.setdefault(entry, len(bits))
+            role_masks[role.lower()] = mask
+        self._bits, self._role_masks = bits, role_masks
+        self._everyone_mask = role_masks.get(EVERYONE_ROLE, 0)
+        self._members.clear()
+
+    def load(self):
+        """Read and compile permissions.json, raising if it is missing or invalid."""
+        mtime = os.stat(PERMISSIONS_FILE).st_mtime_ns
+        reload_config("permissions")
+        self.compile(load_config("permissions"))
+        self._mtime = mtime
+        self._checked_at = time.monotonic()
+
+    def reload_if_changed(self):
+        """Recompile if permissions.json changed, checking at most every PERMISSIONS_CHECK_INTERVAL seconds."""
+        now = time.monotonic()
+        if now - self._checked_at < PERMISSIONS_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            if os.stat(PERMISSIONS_FILE).st_mtime_ns != self._mtime:
+                self.load()
+        except (OSError, ValueError) as e:
+            # A missing, half-saved or invalid file keeps the rules that were already loaded.
+            print(f"Ignoring invalid {PERMISSIONS_FILE}: {e}")
+            if self._mtime is None:
+                raise
+
+    def member_mask(self, member, guild):
+        """OR of the masks of the member's roles and the everyone role, cached per guild member."""
+        if guild is None:
+            return self._everyone_mask
+        members = self._members.setdefault(guild.id, {})
+        mask = members.get(member.id)
+        if mask is None:
+            mask = self._everyone_mask
+            for role in getattr(member, "roles", ()):
+                mask |= self._role_masks.get(role.name.lower(), 0)
+            members[member.id] = mask
+        return mask
+
+    def forget_member(self, member):
+        self._members.get(member.guild.id, {}).pop(member.id, None)
+
+    def forget_guild(self, guild):
+        self._members.pop(guild.id, None)
+
+    def authorize(self, ctx):
+        """Global check: True if the author may run the command, PermissionDenied otherwise."""
+        self.reload_if_changed()
+        name = ctx.command.qualified_name
+        entry, bit = name, self._bits.get(name)
+        for word in action_words(ctx):
+            if f"{name}:{word}" in self._bits:
+                entry = f"{name}:{word}"
+                bit = self._bits[entry]
+                break
+        if bit is None or self.member_mask(ctx.author, ctx.guild) >> bit & 1:
+            return True
+        roles = [role for role, mask in self._role_masks.items() if mask >> bit & 1]
+        raise PermissionDenied(f"🚫 !{entry.replace(':', ' ')} requires the {' or '.join(roles)} role.")
+
+permissions = PermissionEngine()
@@ -0,0 +1,176 @@
+import asyncio
+
+from utils.aws_helpers import aws_settings, get_client, run_aws_call, service_key, chunked
+
+# Bulk S3 work. Listings are fetched one page per run_aws_call, so each page
+# waits its turn on the shared scheduler and the next step can start before
+# the listing ends. Emptying a bucket deletes every object version and delete
+# marker, S3_DELETE_BATCH keys per DeleteObjects call, with up to
+# S3_DELETE_CONCURRENCY calls in flight while the listing continues. Usage
+# reports split the bucket at its "/" prefixes and list the parts in parallel.
+S3_DELETE_BATCH = 1000  # DeleteObjects maximum
+S3_DELETE_CONCURRENCY = aws_settings.get("s3_delete_concurrency", 8)
+S3_LIST_CONCURRENCY = aws_settings.get("s3_list_concurrency", 8)
+S3_DELIMITER = "/"
+# Per-key errors kept for the report; the rest are only counted.
+S3_ERROR_SAMPLE = 10
+
+_bucket_regions = {}
+
+def format_bytes(size):
+    """Human-readable size, e.g. 1536 -> '1.5 KiB'."""
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if size < 1024 or unit == "TiB":
+            return f"{size:,.0f} {unit}" if unit == "B" else f"{size:,.1f} {unit}"
+        size /= 1024
+
+async def bucket_client(bucket, role_arn=None):
+    """Return an S3 client for the bucket's own region, looking the region up once per bucket."""
+    region = _bucket_regions.get(bucket)
+    if region is None:
+        client = get_client("s3", role_arn=role_arn)
+        response = await run_aws_call(service_key("s3", client.meta.region_name), client.get_bucket_location,
+                                      Bucket=bucket)
+        # Buckets in us-east-1 report no location constraint, and old eu-west-1 buckets report "EU".
+        location = response.get("LocationConstraint") or "us-east-1"
+        region = _bucket_regions[bucket] = "eu-west-1" if location == "EU" else location
+    return get_client("s3", region, role_arn)
+
+async def iter_pages(client, operation, **kwargs):
+    """Async iterator over a paginated operation's pages, fetching each page on the AWS thread pool."""
+    key = service_key("s3", client.meta.region_name)
+    pages = iter(client.get_paginator(operation).paginate(**kwargs))
+    while True:
+        page = await run_aws_call(key, next, pages, None)
+        if page is None:
+            return
+        yield page
+
+async def empty_bucket(bucket, progress=None, role_arn=None):
+    """
+    Delete every object version and delete marker in a bucket (versioned or not).
+
+    Parameters:
+    - bucket (str): Bucket name.
+    - progress (coroutine function, optional): awaited as progress(deleted) after each DeleteObjects call.
+    - role_arn (str, optional): Role of the account that owns the bucket.
+
+    Returns (deleted count, failed count, {key: error message}) with up to
+    S3_ERROR_SAMPLE of the keys S3 refused to delete. If a whole DeleteObjects
+    call fails (e.g. access denied), the listing stops there.
+    """
+    client = await bucket_client(bucket, role_arn)
+    key = service_key("s3", client.meta.region_name)
+    slots = asyncio.Semaphore(S3_DELETE_CONCURRENCY)
+    pending = set()
+    deleted, failed, errors = 0, 0, {}
+    stopped = False
+
+    def record(failures):
+        nonlocal failed
+        failed += len(failures)
+        for failed_key, message in failures[:S3_ERROR_SAMPLE - len(errors)]:
+            errors[failed_key] = message
+
+    async def delete_batch(objects):
+        nonlocal deleted, stopped
+        try:
+            response = await run_aws_call(key, client.delete_objects, Bucket=bucket,
+                                          Delete={"Objects": objects, "Quiet": True})
+            refused = response.get("Errors", [])
+            record([(error["Key"], error.get("Message", error.get("Code"))) for error in refused])
+            deleted += len(objects) - len(refused)
+        except Exception as e:
+            # The next batches would most likely fail the same way.
+            stopped = True
+            record([(obj["Key"], str(e)) for obj in objects])
+        finally:
+            slots.release()
+        if progress is not None:
+            await progress(deleted)
+
+    try:
+        async for page in iter_pages(client, "list_object_versions", Bucket=bucket):
+            if stopped:
+                break
+            objects = [{"Key": item["Key"], "VersionId": item["VersionId"]}
+                       for item in page.get("Versions", []) + page.get("DeleteMarkers", [])]
+            for batch in chunked(objects, S3_DELETE_BATCH):
+                # Waiting for a free slot keeps the listing at most S3_DELETE_CONCURRENCY batches ahead.
+                await slots.acquire()
+                if stopped:
+                    slots.release()
+                    break
+                task = asyncio.create_task(delete_batch(batch))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+    finally:
+        if pending:
+            await asyncio.gather(*pending)
+    return deleted, failed, errors
+
+async def delete_bucket(bucket, progress=None, role_arn=None):
+    """Empty a bucket with empty_bucket(), then delete it if nothing was left behind. Same return value."""
+    deleted, failed, errors = await empty_bucket(bucket, progress, role_arn)
+    if not failed:
+        client = await bucket_client(bucket, role_arn)
+        await run_aws_call(service_key("s3", client.meta.region_name), client.delete_bucket, Bucket=bucket)
+        _bucket_regions.pop(bucket, None)
+    return deleted, failed, errors
+
+async def _partition(client, bucket, prefix, depth):
+    """
+    Split a prefix into the sub-prefixes `depth` levels below it.
+
+    Returns (prefixes, loose): loose maps a prefix to the (count, bytes) of
+    objects sitting directly in it above the split level.
+    """
+    prefixes, loose = [prefix], {}
+
+    async def split(parent):
+        children, count, size = [], 0, 0
+        async for page in iter_pages(client, "list_objects_v2", Bucket=bucket, Prefix=parent,
+                                     Delimiter=S3_DELIMITER):
+            children.extend(common["Prefix"] for common in page.get("CommonPrefixes", []))
+            count += len(page.get("Contents", []))
+            size += sum(obj["Size"] for obj in page.get("Contents", []))
+        if count:
+            loose[parent] = (count, size)
+        return children
+
+    for _ in range(depth):
+        levels = await asyncio.gather(*(split(parent) for parent in prefixes))
+        prefixes = [child for children in levels for child in children]
+    return prefixes, loose
+
+async def prefix_usage(bucket, prefix="", depth=1, role_arn=None):
+    """
+    Async iterator of (prefix, object count, bytes) for a bucket, in the order the parts finish.
+
+    The bucket is split at the prefixes `depth` levels below `prefix`, and up
+    to S3_LIST_CONCURRENCY of them are listed at a time. Objects above the
+    split level are reported under their own prefix ('' for the bucket root).
+    Only current object versions are counted.
+    """
+    client = await bucket_client(bucket, role_arn)
+    prefixes, loose = await _partition(client, bucket, prefix, depth)
+    for parent, (count, size) in loose.items():
+        yield parent, count, size
+
+    slots = asyncio.Semaphore(S3_LIST_CONCURRENCY)
+
+    async def measure(part):
+        count, size = 0, 0
+        async with slots:
+            async for page in iter_pages(client, "list_objects_v2", Bucket=bucket, Prefix=part):
+                count += len(page.get("Contents", []))
+                size += sum(obj["Size"] for obj in page.get("Contents", []))
+        return part, count, size
+
+    tasks = [asyncio.create_task(measure(part)) for part in prefixes]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+from collections import namedtuple
+
+from utils.aws_helpers import get_client, run_aws_call, aws_settings, DEFAULT_REGION
+
+# Targets: every (account, region) pair the bot watches. The configured keys
+# are the "default" account; member accounts are reached by assuming
+# target_accounts[].role_arn. Regions are listed in target_regions, or
+# discovered with DescribeRegions when discover_regions is on.
+DEFAULT_ACCOUNT = "default"
+TARGET_REGIONS = aws_settings.get("target_regions", [])
+DISCOVER_REGIONS = aws_settings.get("discover_regions", False)
+TARGET_ACCOUNTS = aws_settings.get("target_accounts", [])
+FANOUT_CONCURRENCY = aws_settings.get("fanout_concurrency", 16)
+
+Target = namedtuple("Target", ["account", "region", "role_arn"])
+
+_targets = None
+_targets_lock = threading.Lock()
+
+def _account_roles():
+    """Map account name to the role assumed for it (None for the default account)."""
+    roles = {DEFAULT_ACCOUNT: None}
+    for account in TARGET_ACCOUNTS:
+        roles[account["name"]] = account["role_arn"]
+    return roles
+
+def default_target():
+    """The configured keys in the configured region: where commands act unless told otherwise."""
+    return Target(DEFAULT_ACCOUNT, DEFAULT_REGION, None)
+
+def get_target(account=None, region=None):
+    """Return the Target for an account name and region, defaulting to the configured ones."""
+    account = account or DEFAULT_ACCOUNT
+    roles = _account_roles()
+    if account not in roles:
+        raise ValueError(f"Unknown account: {account}")
+    return Target(account, region or DEFAULT_REGION, roles[account])
+
+def discover_regions():
+    """List the regions enabled for the default account (blocking)."""
+    response = get_client("ec2").describe_regions()
+    return sorted(region['RegionName'] for region in response['Regions'])
+
+def resolve_targets():
+    """Build the target list once: every configured account in every configured or discovered region (blocking)."""
+    global _targets
+    with _targets_lock:
+        if _targets is None:
+            regions = TARGET_REGIONS or (discover_regions() if DISCOVER_REGIONS else [DEFAULT_REGION])
+            _targets = [Target(account, region, role_arn)
+                        for account, role_arn in _account_roles().items() for region in regions]
+        return _targets
+
+async def get_targets():
+    """Return every target, discovering regions on the AWS thread pool the first time."""
+    if _targets is not None:
+        return _targets
+    return await run_aws_call("ec2", resolve_targets)
+
+def reset_targets():
+    """Forget the target list, e.g. after enabling a region."""
+    global _targets
+    with _targets_lock:
+        _targets = None
+
+async def fan_out(func, targets=None, concurrency=FANOUT_CONCURRENCY):
+    """
+    Await func(target) for every target in parallel, at most `concurrency` at a time.
+
+    Returns (results, errors): {target: result} for the targets that answered
+    and {target: exception} for the ones that failed, so one unreachable region
+    or account does not sink the whole query. Total time is close to that of
+    the slowest target rather than the sum.
+    """
+    if targets is None:
+        targets = await get_targets()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(target):
+        async with semaphore:
+            return await func(target)
+
+    outcomes = await asyncio.gather(*(run(target) for target in targets), return_exceptions=True)
+    results, errors = {}, {}
+    for target, outcome in zip(targets, outcomes):
+        if isinstance(outcome, Exception):
+            errors[target] = outcome
+        else:
+            results[target] = outcome
+    return results, errors
+
+def group_by_target(records):
+    """Group ResourceRecords by the Target they were listed from."""
+    groups = {}
+    for record in records:
+        groups.setdefault(get_target(record.account, record.region), []).append(record)
+    return groups